@@ -17,12 +17,13 @@ from app.db.base_class import Base
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
-safe_url = settings.get_database_url.replace('%', '%%')
+# `config.attributes` lets callers such as app.db.migrations lint render SQL for another database
+safe_url = (config.attributes.get("database_url") or settings.get_database_url).replace('%', '%%')
 config.set_main_option("sqlalchemy.url", safe_url)
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
-if config.config_file_name is not None:
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
     fileConfig(config.config_file_name)
 
 # add your model's MetaData object here
@@ -73,14 +74,22 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        transaction_per_migration=True,
     )
 
     with context.begin_transaction():
+        if context.get_context().dialect.name == "postgresql":
+            context.execute(f"SET lock_timeout = '{settings.MIGRATION_LOCK_TIMEOUT}'")
         context.run_migrations()
 
 
 def do_run_migrations(connection: Connection) -> None:
-    context.configure(connection=connection, target_metadata=target_metadata)
+    if connection.dialect.name == "postgresql":
+        # Session-wide: DDL that can't get its lock quickly fails instead of stalling every query behind it
+        connection.exec_driver_sql(f"SET lock_timeout = '{settings.MIGRATION_LOCK_TIMEOUT}'")
+        connection.commit()
+    # One transaction per revision, so helpers like create_index_concurrently can step outside it
+    context.configure(connection=connection, target_metadata=target_metadata, transaction_per_migration=True)
 
     with context.begin_transaction():
         context.run_migrations()
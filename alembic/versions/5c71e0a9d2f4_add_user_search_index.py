@@ -0,0 +1,44 @@
+"""add user search index
+
+Revision ID: 5c71e0a9d2f4
+Revises: 8d4e1b6f03a2
+Create Date: 2026-10-19 11:48:05.774312
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.db.migrations import create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c71e0a9d2f4'
+down_revision: Union[str, None] = '8d4e1b6f03a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must match CRUDBase.search_text() for User.__searchable__, or the planner won't use the index
+SEARCH_TEXT = (
+    "lower(coalesce(username, '') || ' ' || coalesce(first_name, '') || ' ' || "
+    "coalesce(last_name, '') || ' ' || coalesce(email, ''))"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_context().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # GIN trigram index: serves ILIKE '%...%' substring matches and the %> word-similarity operator
+    create_index_concurrently(
+        'ix_users_search_trgm', 'users', [sa.text(f'({SEARCH_TEXT}) gin_trgm_ops')], postgresql_using='gin',
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_context().dialect.name != 'postgresql':
+        return
+    drop_index_concurrently('ix_users_search_trgm', 'users')
@@ -0,0 +1,28 @@
+"""add user version
+
+Revision ID: 8d4e1b6f03a2
+Revises: 3f9c2a7d41b8
+Create Date: 2026-10-19 11:02:47.519230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d4e1b6f03a2'
+down_revision: Union[str, None] = '3f9c2a7d41b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'version')
@@ -0,0 +1,33 @@
+"""index and backfill user role
+
+Revision ID: b2e7f4c19a06
+Revises: 5c71e0a9d2f4
+Create Date: 2026-10-19 14:02:37.218840
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.db.migrations import backfill, create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2e7f4c19a06'
+down_revision: Union[str, None] = '5c71e0a9d2f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The model declares index=True, but 091b49aa2af8 only added the column
+    create_index_concurrently('ix_users_role', 'users', ['role'])
+    # Rows from before roles existed have NULL, which grants no permissions at all
+    backfill('users', {'role': 'user'}, where='role IS NULL')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    drop_index_concurrently('ix_users_role', 'users')
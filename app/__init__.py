@@ -1,11 +1,7 @@
-from typing import Optional, Type, TypeVar, Generic, List
-from pydantic import BaseModel
+def __getattr__(name: str):
+    # Kept importable from here for existing callers; the model lives with the pagination helpers
+    if name == "PaginatedResponse":
+        from app.utils.pagination import PaginatedResponse
 
-T = TypeVar('T', bound=BaseModel)
-
-
-class PaginatedResponse(BaseModel, Generic[T]):
-    count: int
-    next: Optional[str]
-    previous: Optional[str]
-    results: List[T]
+        return PaginatedResponse
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,14 +1,75 @@
-from fastapi import Header, HTTPException, status, Security
-from fastapi.security.api_key import APIKeyHeader
+import hmac
 import os
+import time
+from typing import Optional
+
+from fastapi import HTTPException, Request, Security, status
+from fastapi.security.api_key import APIKeyHeader
+from limits.storage import MemoryStorage
+from starlette.concurrency import run_in_threadpool
 
+from app.core.api_keys import ApiKeyPrincipal, api_key_store
+from app.core.shared_counters import SharedMemoryStorage
+
+# Single shared key from before per-client keys existed; it keeps working with every scope
 API_KEY = os.getenv("API_KEY", "supersecretkey")
+LEGACY_PRINCIPAL = ApiKeyPrincipal("legacy", "API_KEY", ("*",))
 api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
+# Storages answered from this process's memory; anything else is a network round trip
+LOCAL_STORAGES = (MemoryStorage, SharedMemoryStorage)
+
+
+def _hit(strategy, principal: ApiKeyPrincipal) -> Optional[float]:
+    """Count one request; None if it is allowed, else when the window resets."""
+    if strategy.hit(principal.rate_limit, "api-key", principal.prefix):
+        return None
+    return strategy.get_window_stats(principal.rate_limit, "api-key", principal.prefix)[0]
+
+
+async def _enforce_rate_limit(limiter, principal: ApiKeyPrincipal):
+    # Counted in the app limiter's storage, so workers under `app.server` share the budget
+    if principal.rate_limit is None or limiter is None or not getattr(limiter, "enabled", True):
+        return
+    strategy = limiter.limiter
+    if isinstance(strategy.storage, LOCAL_STORAGES):
+        reset_at = _hit(strategy, principal)
+    else:
+        # slowapi's strategies are synchronous; a network storage (Redis) would block the event loop
+        reset_at = await run_in_threadpool(_hit, strategy, principal)
+    if reset_at is not None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Rate limit exceeded: {principal.rate_limit}",
+            headers={"Retry-After": str(max(1, int(reset_at - time.time())))},
+        )
+
 
-def get_api_key(api_key: str = Security(api_key_header)):
-    if api_key != API_KEY:
+async def authorize_api_key(api_key: Optional[str], scopes: tuple = (), limiter=None) -> ApiKeyPrincipal:
+    if api_key and hmac.compare_digest(api_key.encode(), API_KEY.encode()):
+        principal = LEGACY_PRINCIPAL
+    else:
+        principal = await api_key_store.authenticate(api_key)
+    if principal is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or missing API Key",
         )
-    return api_key
+    if not principal.has_scopes(scopes):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"API key lacks the {', '.join(scopes)} scope",
+        )
+    await _enforce_rate_limit(limiter, principal)
+    return principal
+
+
+async def get_api_key(request: Request, api_key: str = Security(api_key_header)) -> ApiKeyPrincipal:
+    return await authorize_api_key(api_key, limiter=getattr(request.app.state, "limiter", None))
+
+
+def require_scopes(*scopes: str):
+    """Dependency accepting API keys that hold every one of `scopes`; returns the key's principal."""
+
+    async def scope_checker(request: Request, api_key: str = Security(api_key_header)) -> ApiKeyPrincipal:
+        return await authorize_api_key(api_key, scopes, getattr(request.app.state, "limiter", None))
+    return scope_checker
@@ -1,33 +1,49 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.deadline import tighten_deadline
 from app.core.security import verify_token
-from app.db.session import get_db
+from app.core.task_queue import TaskQueue, task_queue
+from app.core.token_store import token_store
 from app.crud.crud_user import crud_user
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/v1/auth/token", scheme_name="bearer")
 
 
-async def get_current_user(
-        db: AsyncSession = Depends(get_db),
-        token: str = Depends(oauth2_scheme)
-):
-    credentials_exception = HTTPException(
+def credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+
+async def get_token_claims(token: str = Depends(oauth2_scheme)) -> dict:
+    """Verified, unrevoked access token claims; no database access."""
     payload = verify_token(token)
-    if not payload:
-        raise credentials_exception
+    if not payload or payload.get("type") == "refresh" or payload.get("sub") is None:
+        raise credentials_exception()
+    if await token_store.is_revoked(payload):
+        raise credentials_exception()
+    return payload
 
-    username: str = payload.get("sub")
-    if username is None:
-        raise credentials_exception
 
-    user = await crud_user.get_by_username(db, username=username)
+async def get_current_user(claims: dict = Depends(get_token_claims)):
+    # Coalesced: concurrent requests for the same user (many tabs, one token) share one query
+    user = await crud_user.load_by_username(claims["sub"])
     if user is None:
-        raise credentials_exception
+        raise credentials_exception()
+
+    return user
+
+
+def request_deadline(seconds: float):
+    """Dependency giving a route at most `seconds`, e.g. `dependencies=[Depends(request_deadline(2))]`."""
+    async def dependency():
+        # Async, so it runs in the request's own context and the endpoint sees the new deadline
+        tighten_deadline(seconds)
+    return dependency
+
 
-    return user
\ No newline at end of file
+def get_task_queue() -> TaskQueue:
+    """Handlers enqueue side effects here and respond without waiting for them."""
+    return task_queue
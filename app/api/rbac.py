@@ -1,12 +1,34 @@
 from fastapi import Depends, HTTPException, status
-from app.api.deps import get_current_user
+from app.api.deps import get_token_claims
+from app.core.permissions import Permission, has_permissions, permission_mask, role_mask
+
+
+def require_permission(*permissions: Permission):
+    """Dependency checking the `perm` bitmask in the access token; returns the token claims."""
+    required = permission_mask(permissions)
+    names = ", ".join(permission.name for permission in permissions)
+
+    def permission_checker(claims: dict = Depends(get_token_claims)):
+        if not has_permissions(claims.get("perm", 0), required):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"You need the {names} permission to access this resource."
+            )
+        return claims
+    return permission_checker
+
 
 def require_role(required_role: str):
-    def role_checker(current_user = Depends(get_current_user)):
-        if getattr(current_user, 'role', None) != required_role:
+    """Roles inherit: any role whose permissions include all of `required_role`'s passes."""
+    required = role_mask(required_role)
+    if not required:
+        raise ValueError(f"Unknown role {required_role!r}")
+
+    def role_checker(claims: dict = Depends(get_token_claims)):
+        if not has_permissions(claims.get("perm", 0), required):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail=f"You need '{required_role}' role to access this resource."
             )
-        return current_user
+        return claims
     return role_checker
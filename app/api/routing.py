@@ -0,0 +1,27 @@
+from typing import Callable
+
+from fastapi.routing import APIRoute
+
+ROUTE_WRAPPERS_ATTR = "__route_wrappers__"
+
+
+def add_route_wrapper(endpoint: Callable, wrapper: Callable) -> Callable:
+    """Attach a handler wrapper to an endpoint; applied by AppRoute when the route is registered."""
+    wrappers = getattr(endpoint, ROUTE_WRAPPERS_ATTR, ())
+    setattr(endpoint, ROUTE_WRAPPERS_ATTR, wrappers + (wrapper,))
+    return endpoint
+
+
+class AppRoute(APIRoute):
+    """
+    APIRoute whose request handler can be wrapped by endpoint decorators.
+
+    The wrappers run around dependency resolution and serialization, so they can
+    answer a request without executing the endpoint and can see the rendered body.
+    """
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        for wrapper in reversed(getattr(self.endpoint, ROUTE_WRAPPERS_ATTR, ())):
+            handler = wrapper(handler)
+        return handler
@@ -0,0 +1,28 @@
+from typing import List
+
+from fastapi import APIRouter, Body, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.rbac import require_permission
+from app.api.routing import AppRoute
+from app.core.api_keys import api_key_store
+from app.core.permissions import Permission
+from app.db.session import get_db
+from app.schemas.api_key import ApiKeyCreate, ApiKeyCreated
+
+router = APIRouter(route_class=AppRoute, dependencies=[Depends(require_permission(Permission.API_KEYS_MANAGE))])
+
+
+@router.post("", response_model=List[ApiKeyCreated], status_code=201)
+async def provision_api_keys(
+        keys: List[ApiKeyCreate] = Body(..., min_length=1, max_length=1000),
+        db: AsyncSession = Depends(get_db)
+):
+    """Create up to 1000 keys in one insert. The response is the only place the keys appear."""
+    return await api_key_store.bulk_provision(db, [key.model_dump() for key in keys])
+
+
+@router.delete("/{prefix}", status_code=204)
+async def revoke_api_key(prefix: str, db: AsyncSession = Depends(get_db)):
+    if not await api_key_store.revoke(db, prefix):
+        raise HTTPException(status_code=404, detail="API key not found")
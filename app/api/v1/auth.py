@@ -3,14 +3,22 @@ from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.responses import JSONResponse
 
-from app.api.deps import get_current_user
-from app.core.security import create_access_token, create_refresh_token, decode_access_token
+from app.api.deps import get_current_user, get_task_queue
+from app.api.routing import AppRoute
+from app.core.config import settings
+from app.core.logger_config import deliver_email
+from app.core.permissions import permission_claims
+from app.core.security import decode_access_token
+from app.core.task_queue import Priority, TaskQueue
+from app.core.token_store import token_store
 from app.db.session import get_db
 from app.schemas.user import Token, UserCreate, User, TokenRefresh
-from app.crud.crud_user import CRUDUser
+from app.crud.crud_user import crud_user
 from app.db.models.user import User as UserModel
+from app.utils.http_cache import cache_response
+from app.utils.idempotency import idempotent
 
-router = APIRouter()
+router = APIRouter(route_class=AppRoute)
 
 
 @router.post("/token", response_model=Token)
@@ -18,54 +26,69 @@ async def login(
         form_data: OAuth2PasswordRequestForm = Depends(),
         db: AsyncSession = Depends(get_db)
 ):
-    user = await CRUDUser().authenticate(db, username=form_data.username, password=form_data.password)
+    user = await crud_user.authenticate(db, username=form_data.username, password=form_data.password)
     if not user:
         raise HTTPException(
             status_code=400, detail="Incorrect username or password"
         )
-    return {
-        "access_token": create_access_token({"sub": user.username}),
-        "refresh_token": create_refresh_token({"sub": user.username}),
-        "token_type": "bearer"
-    }
+    return await token_store.issue(user.username, permission_claims(user.role))
 
 
 @router.post("/token/refresh", response_model=Token)
-def refresh_access_token(refresh_token: TokenRefresh):
+async def refresh_access_token(refresh_token: TokenRefresh, db: AsyncSession = Depends(get_db)):
+    """Rotate a refresh token: the presented one stops working and a new pair is returned."""
+    tokens = None
     payload = decode_access_token(refresh_token.refresh_token)
-    if not payload:
+    if payload and payload.get("sub"):
+        # The role is re-read so a role change reaches the next access token
+        user = await crud_user.get_by_username(db, username=payload["sub"])
+        if user:
+            tokens = await token_store.rotate(refresh_token.refresh_token, permission_claims(user.role))
+    if not tokens:
         raise HTTPException(
             status_code=401,
             detail="Invalid refresh token",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    username = payload.get("sub")
-    if not username:
+    return tokens
+
+
+@router.post("/token/revoke", status_code=204)
+async def revoke_refresh_token(refresh_token: TokenRefresh):
+    """Log out: revoke the token's whole family, including access tokens issued with it."""
+    payload = decode_access_token(refresh_token.refresh_token)
+    if not payload or payload.get("type") != "refresh" or not payload.get("fam"):
         raise HTTPException(
             status_code=401,
             detail="Invalid refresh token",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token = create_access_token(data={"sub": username})
-    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token.refresh_token}
+    await token_store.revoke_family(payload["fam"])
 
 
 @router.post("/register", response_model=User)
+@idempotent()
 async def register(
         user_in: UserCreate,
-        db: AsyncSession = Depends(get_db)
+        db: AsyncSession = Depends(get_db),
+        tasks: TaskQueue = Depends(get_task_queue)
 ):
-    user = await CRUDUser().get_by_username(db, username=user_in.username)
+    user = await crud_user.get_by_username(db, username=user_in.username)
     if user:
         raise HTTPException(status_code=400, detail="Username already registered")
-    user = await CRUDUser().create(db, obj_in=user_in)
+    user = await crud_user.create(db, obj_in=user_in)
+    if settings.EMAIL_HOST:
+        await tasks.enqueue(
+            deliver_email, f"Hi {user.first_name}, your account {user.username} is ready.", "Welcome",
+            user.email, priority=Priority.LOW,
+        )
     return user
 
 
 @router.post("/token/verify")
-def verify_access_token(token: TokenRefresh):
+async def verify_access_token(token: TokenRefresh):
     payload = decode_access_token(token.refresh_token)
-    if not payload:
+    if not payload or await token_store.is_revoked(payload):
         raise HTTPException(
             status_code=401,
             detail="Invalid token",
@@ -78,5 +101,6 @@ def verify_access_token(token: TokenRefresh):
 
 
 @router.get("/users/me", response_model=User)
+@cache_response(max_age=0, private=True, store_ttl=settings.HTTP_CACHE_STORE_TTL)
 def read_users_me(current_user: UserModel = Depends(get_current_user)):
     return current_user
@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from app.api.api_key_auth import require_scopes
+from app.core.config import settings
+from app.core.profiler import loop_monitor, profile_event_loop
+
+router = APIRouter(dependencies=[Depends(require_scopes("debug"))])
+
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def profile(
+        seconds: float = Query(5, gt=0, le=settings.PROFILING_MAX_SECONDS),
+        interval_ms: float = Query(5, ge=1, le=100),
+):
+    """Sample the event loop thread and return collapsed stacks (feed to flamegraph.pl or speedscope)."""
+    collapsed = await profile_event_loop(seconds, interval_ms / 1000)
+    if collapsed is None:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    return PlainTextResponse(collapsed)
+
+
+@router.get("/loop-lag")
+async def loop_lag():
+    return {"running": loop_monitor.running, "last_lag_ms": round(loop_monitor.last_lag * 1000, 3)}
@@ -0,0 +1,52 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import request_deadline
+from app.api.rbac import require_permission
+from app.api.routing import AppRoute
+from app.core.permissions import Permission
+from app.crud.crud_user import crud_user
+from app.db.session import get_db
+from app.schemas.user import User
+from app.utils.pagination import PaginatedResponse, keyset_response
+
+router = APIRouter(route_class=AppRoute)
+
+# Fuzzy matching is the heaviest query we run; a caller won't wait longer for suggestions anyway
+SEARCH_TIMEOUT = 5.0
+
+
+@router.get("/search", response_model=PaginatedResponse[User], dependencies=[
+    Depends(request_deadline(SEARCH_TIMEOUT)), Depends(require_permission(Permission.USERS_READ)),
+])
+async def search_users(
+        request: Request,
+        q: str = Query(..., min_length=2, max_length=100),
+        per_page: int = Query(20, ge=1, le=100),
+        cursor: Optional[str] = None,
+        db: AsyncSession = Depends(get_db)
+):
+    """Substring and fuzzy match on username, names and email, best match first; follow `next` for more."""
+    try:
+        page = await crud_user.search(db, q, per_page=per_page, cursor=cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return keyset_response(request, page)
+
+
+@router.get("", response_model=PaginatedResponse[User], dependencies=[Depends(require_permission(Permission.USERS_READ))])
+async def list_users(
+        request: Request,
+        per_page: int = Query(20, ge=1, le=100),
+        cursor: Optional[str] = None,
+        count: bool = Query(False, description="Include the total number of users (costs an extra query)"),
+        db: AsyncSession = Depends(get_db)
+):
+    """Users in id order; follow `next` for the following page."""
+    try:
+        page = await crud_user.get_keyset_page(db, cursor=cursor, per_page=per_page, with_count=count)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return keyset_response(request, page)
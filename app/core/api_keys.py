@@ -0,0 +1,221 @@
+import hashlib
+import hmac
+import secrets
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Tuple
+
+from limits import parse
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.metrics import registry
+from app.db.models.api_key import ApiKey
+from app.db.session import session_scope
+
+API_KEY_LOOKUPS = registry.counter("api_key_lookups_total", "API key lookups by outcome.", ("result",))
+
+KEY_PREFIX = "sk"
+PREFIX_LENGTH = 12
+MISS = object()
+
+
+def hash_api_key(api_key: str) -> str:
+    # Keys carry 256 random bits, so a keyed SHA-256 is enough; bcrypt would only add latency
+    return hmac.new(settings.API_KEY_HASH_SECRET.encode(), api_key.encode(), hashlib.sha256).hexdigest()
+
+
+def generate_api_key() -> Tuple[str, str]:
+    """Return `(prefix, key)`; keys look like `sk_<prefix>_<secret>` and the prefix is the lookup index."""
+    prefix = secrets.token_hex(PREFIX_LENGTH // 2)
+    return prefix, f"{KEY_PREFIX}_{prefix}_{secrets.token_urlsafe(32)}"
+
+
+def parse_prefix(api_key: str) -> Optional[str]:
+    parts = api_key.split("_", 2)
+    if len(parts) != 3 or parts[0] != KEY_PREFIX or len(parts[1]) != PREFIX_LENGTH:
+        return None
+    return parts[1]
+
+
+def _timestamp(value: Optional[datetime]) -> Optional[float]:
+    if value is None:
+        return None
+    # SQLite hands back naive datetimes; everything is stored in UTC
+    return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).timestamp()
+
+
+class ApiKeyPrincipal:
+    """What a request authenticated with an API key is allowed to do; built once per cache fill."""
+
+    __slots__ = ("prefix", "name", "owner", "scopes", "rate_limit", "expires_at")
+
+    def __init__(self, prefix: str, name: str, scopes: Iterable[str] = (), rate_limit: str = None,
+                 owner: str = None, expires_at: float = None):
+        self.prefix = prefix
+        self.name = name
+        self.owner = owner
+        self.scopes = frozenset(scopes)
+        self.rate_limit = parse(rate_limit) if rate_limit else None
+        self.expires_at = expires_at
+
+    @classmethod
+    def from_row(cls, row: ApiKey) -> "ApiKeyPrincipal":
+        return cls(
+            row.prefix, row.name, row.scopes or (), row.rate_limit or settings.API_KEY_DEFAULT_RATE_LIMIT,
+            row.owner, _timestamp(row.expires_at),
+        )
+
+    @property
+    def expired(self) -> bool:
+        return self.expires_at is not None and self.expires_at <= time.time()
+
+    def has_scopes(self, scopes: Iterable[str]) -> bool:
+        return "*" in self.scopes or self.scopes.issuperset(scopes)
+
+
+class ApiKeyCache:
+    """
+    LRU of key hash -> principal, or None for keys that failed, with a deadline per entry.
+
+    Entries are keyed by the key's HMAC, so plaintext keys are never held in memory. Unknown
+    keys are cached too (for `negative_ttl`), so a client retrying a bad key doesn't cost a
+    query per attempt. Rejections live in their own LRU, so a client spraying well-formed but
+    unknown keys can't evict valid ones. Entries never outlive the key's own expiry.
+    """
+
+    def __init__(self, ttl: float = 60, negative_ttl: float = 5, max_entries: int = 10000):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._rejections = OrderedDict()
+
+    def get(self, key_hash: str):
+        """The cached principal, None for a cached rejection, or `MISS`."""
+        for entries in (self._entries, self._rejections):
+            entry = entries.get(key_hash)
+            if entry is None:
+                continue
+            principal, deadline, _ = entry
+            if deadline <= time.monotonic():
+                del entries[key_hash]
+                return MISS
+            entries.move_to_end(key_hash)
+            return principal
+        return MISS
+
+    def put(self, key_hash: str, prefix: str, principal: Optional[ApiKeyPrincipal]):
+        if self.max_entries <= 0:
+            return
+        ttl = self.ttl if principal is not None else self.negative_ttl
+        if principal is not None and principal.expires_at is not None:
+            ttl = min(ttl, principal.expires_at - time.time())
+        entries = self._entries if principal is not None else self._rejections
+        entries[key_hash] = (principal, time.monotonic() + ttl, prefix)
+        entries.move_to_end(key_hash)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    def invalidate(self, prefix: str):
+        for key_hash in [key_hash for key_hash, entry in self._entries.items() if entry[2] == prefix]:
+            del self._entries[key_hash]
+
+    def clear(self):
+        self._entries.clear()
+        self._rejections.clear()
+
+
+class ApiKeyStore:
+    """
+    Database-backed API keys behind a per-process cache.
+
+    A cached key is checked with one HMAC and one dict lookup; only a miss reads the row by
+    its prefix and compares the hash. Revoking a key clears it from this process's cache at
+    once, other workers stop accepting it within `API_KEY_CACHE_TTL` seconds.
+    """
+
+    def __init__(self, cache: ApiKeyCache):
+        self.cache = cache
+
+    async def authenticate(self, api_key: str) -> Optional[ApiKeyPrincipal]:
+        prefix = parse_prefix(api_key) if api_key else None
+        if prefix is None:
+            # Rejected before the cache, so junk keys can't evict valid entries
+            API_KEY_LOOKUPS.inc("malformed")
+            return None
+        key_hash = hash_api_key(api_key)
+        principal = self.cache.get(key_hash)
+        if principal is not MISS:
+            API_KEY_LOOKUPS.inc("cached")
+            return principal
+        principal = await self._load(prefix, key_hash)
+        API_KEY_LOOKUPS.inc("valid" if principal is not None else "invalid")
+        self.cache.put(key_hash, prefix, principal)
+        return principal
+
+    async def _load(self, prefix: str, key_hash: str) -> Optional[ApiKeyPrincipal]:
+        async with session_scope() as db:
+            result = await db.execute(select(ApiKey).where(ApiKey.prefix == prefix))
+            row = result.scalars().first()
+        if row is None or not row.is_active or not hmac.compare_digest(row.key_hash, key_hash):
+            return None
+        principal = ApiKeyPrincipal.from_row(row)
+        return None if principal.expired else principal
+
+    async def bulk_provision(self, db: AsyncSession, specs: Iterable[dict]) -> List[dict]:
+        """
+        Create keys from dicts with `name` and optional `owner`, `scopes`, `rate_limit` and
+        `expires_at`, in a single INSERT. The plaintext keys are in the result and nowhere else.
+        """
+        now = datetime.now(timezone.utc)
+        rows, created = [], []
+        for spec in specs:
+            if spec.get("rate_limit"):
+                parse(spec["rate_limit"])  # ValueError before anything is written
+            prefix, api_key = generate_api_key()
+            row = {
+                "prefix": prefix,
+                "name": spec["name"],
+                "owner": spec.get("owner"),
+                "scopes": list(spec.get("scopes") or ()),
+                "rate_limit": spec.get("rate_limit"),
+                "expires_at": spec.get("expires_at"),
+                "is_active": True,
+                "created_at": now,
+            }
+            rows.append({**row, "key_hash": hash_api_key(api_key)})
+            created.append({**row, "key": api_key})
+        if not rows:
+            return created
+        try:
+            await db.execute(insert(ApiKey), rows)
+            await db.commit()
+        except Exception as ex:
+            await db.rollback()
+            logger.error(f"Error encountered while provisioning API keys: {str(ex)}")
+            raise
+        return created
+
+    async def revoke(self, db: AsyncSession, prefix: str) -> bool:
+        try:
+            result = await db.execute(
+                update(ApiKey).where(ApiKey.prefix == prefix, ApiKey.is_active.is_(True)).values(is_active=False)
+            )
+            await db.commit()
+        except Exception as ex:
+            await db.rollback()
+            logger.error(f"Error encountered while revoking API key {prefix}: {str(ex)}")
+            raise
+        self.cache.invalidate(prefix)
+        return result.rowcount > 0
+
+
+api_key_store = ApiKeyStore(ApiKeyCache(
+    ttl=settings.API_KEY_CACHE_TTL,
+    negative_ttl=settings.API_KEY_NEGATIVE_CACHE_TTL,
+    max_entries=settings.API_KEY_CACHE_SIZE,
+))
@@ -17,3 +17,13 @@ class CustomException(Exception):
             "detail": self.detail,
             "error_code": self.error_code
         }
+
+
+class NotFoundError(CustomException):
+    def __init__(self, detail: str):
+        super().__init__("NotFound", detail, 404)
+
+
+class ConflictError(CustomException):
+    def __init__(self, detail: str):
+        super().__init__("Conflict", detail, 409)
@@ -0,0 +1,98 @@
+"""
+Per-request deadlines.
+
+`DeadlineMiddleware` records when the current request must be answered by; everything the
+request waits on (pool checkout, SQL statements, Redis, the password-hashing threads) runs
+inside `deadline_stage(...)` and gives up once that time has passed, instead of holding a
+connection for a client that stopped waiting long ago. Outside a request there is no deadline
+and the stages don't time out.
+"""
+import asyncio
+import re
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar, Token
+from typing import Optional
+
+from app.core.custom_exception import CustomException
+from app.core.metrics import registry
+
+DEADLINE_HEADER = "X-Request-Timeout"
+# Scope key set when `X-Request-Timeout` shortened the deadline, so a `504` is the client's choice, not overload
+CLIENT_DEADLINE = "client_deadline"
+
+DEADLINES_EXCEEDED = registry.counter("request_deadline_exceeded_total", "Requests that ran out of time, by stage.", ("stage",))
+
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+_TIMEOUT = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*(ms|s)?\s*$")
+
+
+class DeadlineExceeded(CustomException):
+    def __init__(self, stage: str):
+        self.stage = stage
+        super().__init__("DeadlineExceeded", f"Request deadline exceeded waiting for {stage}", 504)
+
+
+def parse_timeout(value: Optional[str]) -> Optional[float]:
+    """Seconds from a header value such as `2.5`, `2.5s` or `250ms`; None when malformed."""
+    match = _TIMEOUT.match(value or "")
+    if not match:
+        return None
+    seconds = float(match.group(1))
+    return seconds / 1000 if match.group(2) == "ms" else seconds
+
+
+def start_deadline(timeout: float) -> Token:
+    return _deadline.set(time.monotonic() + timeout)
+
+
+def end_deadline(token: Token):
+    _deadline.reset(token)
+
+
+def tighten_deadline(timeout: float):
+    """Shorten the current deadline to `timeout` seconds from now; never extends it."""
+    deadline = time.monotonic() + timeout
+    current = _deadline.get()
+    if current is None or deadline < current:
+        _deadline.set(deadline)
+
+
+def clear_deadline():
+    """Drop the deadline for the rest of this context, e.g. in a task shared by several requests."""
+    _deadline.set(None)
+
+
+def time_remaining() -> Optional[float]:
+    """Seconds left before the deadline (negative once passed), or None without one."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def check_deadline(stage: str):
+    remaining = time_remaining()
+    if remaining is not None and remaining <= 0:
+        DEADLINES_EXCEEDED.inc(stage)
+        raise DeadlineExceeded(stage)
+
+
+@asynccontextmanager
+async def deadline_stage(stage: str):
+    """
+    Cancel the block when the deadline passes and raise `DeadlineExceeded(stage)`.
+    Cancellation only interrupts awaits; work already handed to a thread runs to completion.
+    """
+    check_deadline(stage)
+    deadline = _deadline.get()
+    if deadline is None:
+        yield
+        return
+    timeout = asyncio.timeout_at(asyncio.get_running_loop().time() + (deadline - time.monotonic()))
+    try:
+        async with timeout:
+            yield
+    except TimeoutError:
+        if not timeout.expired():
+            raise  # raised by the block itself, not by the deadline
+        DEADLINES_EXCEEDED.inc(stage)
+        raise DeadlineExceeded(stage) from None
@@ -0,0 +1,154 @@
+import asyncio
+import time
+from typing import Dict, Optional
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.metrics import registry
+from app.core.profiler import loop_monitor
+
+HEALTH_CHECK_UP = registry.gauge("health_check_up", "Result of the last readiness probe per dependency (1 = ok).", ("check",))
+
+
+def redis_required() -> bool:
+    """Redis only matters for readiness when something in this deployment stores state there."""
+    return (
+        settings.TOKEN_STORE_BACKEND == "redis"
+        or settings.TASK_QUEUE_BACKEND == "redis"
+        or settings.HTTP_CACHE_STORE_TTL > 0
+    )
+
+
+async def check_database() -> str:
+    from app.db.session import get_engine
+
+    async with get_engine().connect() as connection:
+        await connection.execute(text("SELECT 1"))
+    return "reachable"
+
+
+async def check_redis() -> str:
+    from app.utils.redis_cache import redis_cache
+
+    await (await redis_cache.get_redis()).ping()
+    return "reachable"
+
+
+class HealthProber:
+    """
+    Probes the worker's dependencies every `interval` seconds in the background and keeps
+    the latest result. Readiness requests read that snapshot, so however often load balancers
+    ask, the database sees one `SELECT 1` per interval per worker.
+
+    A snapshot older than three intervals counts as not ready: the prober itself is stuck,
+    which means the event loop is too.
+    """
+
+    def __init__(self, interval: float = 5.0, timeout: float = 2.0,
+                 max_pool_saturation: float = 0.9, max_loop_lag: float = 0.5):
+        self.interval = interval
+        self.timeout = timeout
+        self.max_pool_saturation = max_pool_saturation
+        self.max_loop_lag = max_loop_lag
+        self.snapshot: Optional[dict] = None
+        self._probed_at = 0.0
+        self._own_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is not None:
+            return
+        # Probe once before serving, so readiness is accurate from the first request
+        await self.probe()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self.snapshot = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            scheduled = loop.time()
+            await asyncio.sleep(self.interval)
+            self._own_lag = max(0.0, loop.time() - scheduled - self.interval)
+            try:
+                await self.probe()
+            except Exception as exc:
+                logger.error(f"Health probe failed: {exc}")
+
+    async def _timed(self, check) -> dict:
+        start = time.perf_counter()
+        try:
+            async with asyncio.timeout(self.timeout):
+                detail = await check()
+            healthy = True
+        except TimeoutError:
+            healthy, detail = False, f"no answer within {self.timeout:g}s"
+        except Exception as exc:
+            healthy, detail = False, f"{type(exc).__name__}: {exc}"
+        return {"healthy": healthy, "detail": detail, "latency_ms": round((time.perf_counter() - start) * 1000, 1)}
+
+    def _pool(self) -> dict:
+        from app.db.session import get_engine
+
+        pool = get_engine().sync_engine.pool
+        size = pool.size() if hasattr(pool, "size") else None
+        max_overflow = getattr(pool, "_max_overflow", 0)
+        if size is None or max_overflow < 0:
+            return {"healthy": True, "detail": f"{type(pool).__name__} has no fixed capacity"}
+        checked_out = pool.checkedout()
+        saturation = checked_out / (size + max_overflow) if size + max_overflow else 0.0
+        return {
+            "healthy": saturation < self.max_pool_saturation,
+            "detail": f"{checked_out} of {size + max_overflow} connections in use",
+            "saturation": round(saturation, 3),
+        }
+
+    def _event_loop(self) -> dict:
+        lag = loop_monitor.last_lag if loop_monitor.running else self._own_lag
+        return {"healthy": lag <= self.max_loop_lag, "detail": f"{lag * 1000:.0f} ms lag", "lag_ms": round(lag * 1000, 1)}
+
+    async def probe(self) -> dict:
+        names = ["database"]
+        checks = [self._timed(check_database)]
+        if redis_required():
+            names.append("redis")
+            checks.append(self._timed(check_redis))
+        results: Dict[str, dict] = dict(zip(names, await asyncio.gather(*checks)))
+        results["pool"] = self._pool()
+        results["event_loop"] = self._event_loop()
+        for name, result in results.items():
+            HEALTH_CHECK_UP.set(1 if result["healthy"] else 0, name)
+        ready = all(result["healthy"] for result in results.values())
+        if self.snapshot is not None and self.snapshot["ready"] and not ready:
+            failing = ", ".join(name for name, result in results.items() if not result["healthy"])
+            logger.warning(f"Worker is no longer ready: {failing}")
+        self.snapshot = {"ready": ready, "checked_at": time.time(), "checks": results}
+        self._probed_at = time.monotonic()
+        return self.snapshot
+
+    def readiness(self) -> dict:
+        if self.snapshot is None:
+            return {"ready": False, "detail": "not probed yet"}
+        age = time.monotonic() - self._probed_at
+        if age > self.interval * 3:
+            return {**self.snapshot, "ready": False, "detail": f"last probe {age:.0f}s ago"}
+        return {**self.snapshot, "age": round(age, 3)}
+
+
+health_prober = HealthProber(
+    interval=settings.HEALTH_PROBE_INTERVAL,
+    timeout=settings.HEALTH_PROBE_TIMEOUT,
+    max_pool_saturation=settings.HEALTH_MAX_POOL_SATURATION,
+    max_loop_lag=settings.HEALTH_MAX_LOOP_LAG_MS / 1000,
+)
@@ -0,0 +1,159 @@
+import json
+import os
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from jose import jwk, jwt
+from jose.exceptions import JWTError
+
+from app.core.config import settings
+
+
+def _pyjwt():
+    # Only EdDSA keys need PyJWT, so it's imported when one is loaded
+    try:
+        import jwt as pyjwt
+    except ImportError:
+        return None
+    return pyjwt
+
+
+def _algorithm_for(public_key) -> str:
+    from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+
+    if isinstance(public_key, rsa.RSAPublicKey):
+        return "RS256"
+    if isinstance(public_key, ec.EllipticCurvePublicKey):
+        return {"secp256r1": "ES256", "secp384r1": "ES384", "secp521r1": "ES512"}[public_key.curve.name]
+    if isinstance(public_key, ed25519.Ed25519PublicKey):
+        return "EdDSA"
+    raise ValueError(f"Unsupported key type {type(public_key).__name__}")
+
+
+class JWTKey:
+    """
+    One parsed signing or verification key.
+
+    PEMs are parsed once here; handing python-jose a raw PEM instead makes it re-parse the
+    key on every call, which for an RSA private key costs tens of milliseconds per token.
+    EdDSA goes through PyJWT because python-jose doesn't implement it.
+    """
+
+    def __init__(self, kid: str, algorithm: str, signing_key, verifying_key):
+        self.kid = kid
+        self.algorithm = algorithm
+        self.signing_key = signing_key
+        self.verifying_key = verifying_key
+
+    @classmethod
+    def from_secret(cls, kid: str, secret: str, algorithm: str = "HS256") -> "JWTKey":
+        key = jwk.construct(secret, algorithm)
+        return cls(kid, algorithm, key, key)
+
+    @classmethod
+    def from_pem(cls, kid: str, pem: bytes) -> "JWTKey":
+        """Load a private key (sign and verify) or a public key (verify only, e.g. a retired key)."""
+        from cryptography.hazmat.primitives import serialization
+
+        try:
+            private_key = serialization.load_pem_private_key(pem, password=None)
+            public_key = private_key.public_key()
+        except ValueError:
+            private_key, public_key = None, serialization.load_pem_public_key(pem)
+        algorithm = _algorithm_for(public_key)
+
+        if algorithm == "EdDSA":
+            if _pyjwt() is None:
+                raise RuntimeError(f"Key {kid} is Ed25519, which needs PyJWT installed")
+            return cls(kid, algorithm, private_key, public_key)
+
+        public_pem = public_key.public_bytes(serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo)
+        signing_key = jwk.construct(pem, algorithm) if private_key is not None else None
+        return cls(kid, algorithm, signing_key, jwk.construct(public_pem, algorithm))
+
+    @property
+    def symmetric(self) -> bool:
+        return self.algorithm.startswith("HS")
+
+    @property
+    def can_sign(self) -> bool:
+        return self.signing_key is not None
+
+    def encode(self, claims: dict) -> str:
+        if self.signing_key is None:
+            raise ValueError(f"Key {self.kid} is verification-only")
+        if self.algorithm == "EdDSA":
+            return _pyjwt().encode(claims, self.signing_key, algorithm="EdDSA", headers={"kid": self.kid})
+        return jwt.encode(claims, self.signing_key, algorithm=self.algorithm, headers={"kid": self.kid})
+
+    def decode(self, token: str) -> dict:
+        if self.algorithm == "EdDSA":
+            pyjwt = _pyjwt()
+            try:
+                return pyjwt.decode(token, self.verifying_key, algorithms=["EdDSA"])
+            except pyjwt.InvalidTokenError as e:
+                raise JWTError(str(e)) from e
+        return jwt.decode(token, self.verifying_key, algorithms=[self.algorithm])
+
+    def public_jwk(self) -> Optional[dict]:
+        if self.symmetric:
+            return None
+        if self.algorithm == "EdDSA":
+            data = json.loads(_pyjwt().algorithms.OKPAlgorithm.to_jwk(self.verifying_key))
+        else:
+            data = self.verifying_key.to_dict()
+        return {**data, "kid": self.kid, "alg": self.algorithm, "use": "sig"}
+
+
+class KeySet:
+    """Keys by `kid`: the active one signs, every key verifies the tokens it signed."""
+
+    def __init__(self, keys: List[JWTKey], active_kid: str):
+        self.keys: Dict[str, JWTKey] = {key.kid: key for key in keys}
+        self.active = self.keys[active_kid]
+        if not self.active.can_sign:
+            raise ValueError(f"Active key {active_kid} has no private key")
+        self._jwks = {"keys": [key.public_jwk() for key in keys if not key.symmetric]}
+
+    def encode(self, claims: dict) -> str:
+        return self.active.encode(claims)
+
+    def decode(self, token: str) -> dict:
+        """Verify with the key named by the token's `kid`; tokens without one predate key ids."""
+        kid = jwt.get_unverified_header(token).get("kid")
+        key = self.keys.get(kid) if kid else self.active
+        if key is None:
+            raise JWTError(f"Unknown key id {kid}")
+        return key.decode(token)
+
+    def jwks(self) -> dict:
+        return self._jwks
+
+
+def load_key_set(keys_dir: str = None, active_kid: str = None) -> KeySet:
+    """
+    Build the key set from `JWT_KEYS_DIR` (one `<kid>.pem` per key, algorithm taken from the
+    key type), or from `SECRET_KEY` when no directory is configured. Without `JWT_ACTIVE_KID`
+    the last private key by file name signs, so date-named kids rotate by adding a file.
+    """
+    if not keys_dir:
+        return KeySet([JWTKey.from_secret("default", settings.SECRET_KEY, settings.ALGORITHM)], "default")
+
+    keys = []
+    for filename in sorted(os.listdir(keys_dir)):
+        if filename.endswith(".pem"):
+            with open(os.path.join(keys_dir, filename), "rb") as pem:
+                keys.append(JWTKey.from_pem(filename[:-4], pem.read()))
+    if not keys:
+        raise ValueError(f"No .pem keys in {keys_dir}")
+    if active_kid is None:
+        signing_kids = [key.kid for key in keys if key.can_sign]
+        if not signing_kids:
+            raise ValueError(f"No private key in {keys_dir}")
+        active_kid = signing_kids[-1]
+    return KeySet(keys, active_kid)
+
+
+@lru_cache
+def get_key_set() -> KeySet:
+    return load_key_set(settings.JWT_KEYS_DIR, settings.JWT_ACTIVE_KID)
@@ -1,4 +1,6 @@
-from app.core.config import settings
-from app.core.logger_config import get_logger
+import logging
 
-logger = get_logger(base_log_dir=settings.LOG_DIR)
+from app.core.logger_config import LOGGER_NAME
+
+# Handlers are attached by setup_logging() during application startup
+logger = logging.getLogger(LOGGER_NAME)
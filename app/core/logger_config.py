@@ -1,19 +1,26 @@
+import atexit
 import logging
+import queue
 import shutil
-from logging.handlers import TimedRotatingFileHandler, WatchedFileHandler
-import smtplib
-from email.message import EmailMessage
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
 from datetime import datetime
 from multiprocessing import Lock as ProcessLock
 import threading
 import os
 import time
 from collections import defaultdict
-from typing import Dict
+from typing import Dict, Optional
 
 from app.core.config import settings
+from app.core.shared_counters import shared_counters
 
 LOGGER_LEVEL = logging.DEBUG
+LOGGER_NAME = 'facebook.scrapper'
+# Longest the shutdown waits for queued records to be handled
+FLUSH_TIMEOUT = 5.0
+
+_listener: Optional[QueueListener] = None
+_log_queue: Optional[queue.Queue] = None
 
 
 class ColoredFormatter(logging.Formatter):
@@ -33,18 +40,26 @@ class ColoredFormatter(logging.Formatter):
         return log_msg
 
 
+def deliver_email(content: str, subject: str, recipient: str = None):
+    """Send one email, raising on failure; run it through the task queue so failures are retried."""
+    import smtplib
+    from email.message import EmailMessage
+
+    msg = EmailMessage()
+    msg.set_content(content)
+    msg['Subject'] = subject
+    msg['From'] = settings.EMAIL_HOST_USER
+    msg['To'] = recipient or settings.EMAIL_RECEIVER
+
+    with smtplib.SMTP(settings.EMAIL_HOST, settings.EMAIL_PORT, timeout=5) as server:
+        server.starttls()
+        server.login(settings.EMAIL_HOST_USER, settings.EMAIL_HOST_PASSWORD)
+        server.send_message(msg)
+
+
 def send_email(content: str, subject: str) -> bool:
     try:
-        msg = EmailMessage()
-        msg.set_content(content)
-        msg['Subject'] = subject
-        msg['From'] = settings.EMAIL_HOST_USER
-        msg['To'] = settings.EMAIL_RECEIVER
-
-        with smtplib.SMTP(settings.EMAIL_HOST, settings.EMAIL_PORT, timeout=5) as server:
-            server.starttls()
-            server.login(settings.EMAIL_HOST_USER, settings.EMAIL_HOST_PASSWORD)
-            server.send_message(msg)
+        deliver_email(content, subject)
         return True
     except Exception as e:
         logging.error(f"Email send failed: {e}")
@@ -90,23 +105,31 @@ class ProcessSafeCriticalHandler(logging.Handler):
             if (current_time - log['time']).total_seconds() <= self.window_hours * 3600
         ]
 
-        if len(self.function_logs[func_name]) >= self.threshold:
-            self._send_alert(func_name, self.function_logs[func_name])
+        # The count is shared between forked workers, so the threshold applies to the whole server
+        count = shared_counters.incr(f"critical-log:{func_name}", self.window_hours * 3600)
+        if count % self.threshold == 0:
+            self._send_alert(func_name, self.function_logs[func_name], count)
             self.function_logs[func_name].clear()
 
-    def _send_alert(self, function_name: str, logs: list):
+    def _send_alert(self, function_name: str, logs: list, total: int = None):
         try:
             log_messages = "\n".join([
                 f"{log['time'].strftime('%Y-%m-%d %H:%M:%S')} - Process:{log['process']} - Thread:{log['thread']}: {log['message']}"
                 for log in logs
             ])
 
-            content = f"""Alert: {len(logs)} critical logs from {function_name} in last {self.window_hours}h
+            content = f"""Alert: {total or len(logs)} critical logs from {function_name} in last {self.window_hours}h
 
 Detailed Logs:
 {log_messages}"""
 
-            send_email(content, f'Critical Log Alert - {function_name} From FaceBookListingScrapper')
+            # Queued so SMTP latency and retries don't hold up the log listener thread
+            from app.core.task_queue import Priority, task_queue
+
+            task_queue.submit(
+                deliver_email, content, f'Critical Log Alert - {function_name} From FaceBookListingScrapper',
+                priority=Priority.HIGH,
+            )
         except Exception as e:
             logging.error(f"Error sending alert: {e}")
 
@@ -260,60 +283,94 @@ class LogRotationManager:
             logging.error(f"Error cleaning up archived logs: {e}")
 
 
-def get_logger(base_log_dir: str = settings.LOG_DIR) -> logging.Logger:
-    try:
-        logger = logging.getLogger(f'facebook.scrapper')
-        logger.propagate = False
-        if logger.handlers:
-            return logger
-
-        logger.setLevel(LOGGER_LEVEL)
-
-        # Create log directory with proper permissions
-        log_dir = os.path.join(base_log_dir, 'logs')
-        os.makedirs(log_dir, exist_ok=True)
-        os.chmod(log_dir, 0o777)
-
-        # File handler
-        # file_handler = WatchedFileHandler(
-        #     )
-        # )
-        file_handler = TimedRotatingFileHandler(
-            os.path.join(log_dir, f'app_{datetime.now().strftime("%Y_%m_%d")}.log'), when="midnight", interval=1, backupCount=7
-        )
-        file_handler.setFormatter(logging.Formatter(
-            '%(asctime)s - %(levelname)s - %(processName)s - %(threadName)s - %(funcName)s - %(message)s'
-        ))
-
-        # Console handler
-        console_handler = logging.StreamHandler()
-        console_handler.setFormatter(ColoredFormatter(
-            '%(asctime)s - %(levelname)s - %(processName)s - %(threadName)s - %(funcName)s - %(message)s'
-        ))
-
-        # Critical handler
-        critical_handler = ProcessSafeCriticalHandler(threshold=10, window_hours=1)
-
-        # Add handlers
-        logger.addHandler(file_handler)
-        logger.addHandler(console_handler)
-        logger.addHandler(critical_handler)
-
-        def cleanup():
-            """Cleanup function to properly close handlers"""
-            for handler in logger.handlers[:]:
-                try:
-                    handler.close()
-                    logger.removeHandler(handler)
-                except Exception as e:
-                    print(f"Error closing handler: {e}")
+def _build_handlers(log_dir: str) -> list:
+    file_handler = TimedRotatingFileHandler(
+        os.path.join(log_dir, f'app_{datetime.now().strftime("%Y_%m_%d")}.log'), when="midnight", interval=1, backupCount=7
+    )
+    file_handler.setFormatter(logging.Formatter(
+        '%(asctime)s - %(levelname)s - %(processName)s - %(threadName)s - %(funcName)s - %(message)s'
+    ))
+
+    # Console handler
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(ColoredFormatter(
+        '%(asctime)s - %(levelname)s - %(processName)s - %(threadName)s - %(funcName)s - %(message)s'
+    ))
+
+    # Critical handler
+    critical_handler = ProcessSafeCriticalHandler(threshold=10, window_hours=1)
+
+    return [file_handler, console_handler, critical_handler]
 
-        # Register cleanup function
-        import atexit
-        atexit.register(cleanup)
 
+def setup_logging(base_log_dir: str = None) -> logging.Logger:
+    """
+    Configure the app logger; called from the application lifespan rather than at import.
+
+    Records go through a QueueHandler, and a QueueListener thread does the file,
+    console and alert-email I/O, so logging never blocks the event loop.
+    """
+    global _listener, _log_queue
+    logger = logging.getLogger(LOGGER_NAME)
+    if _listener is not None:
         return logger
 
+    logger.setLevel(LOGGER_LEVEL)
+    logger.propagate = False
+
+    log_dir = os.path.join(base_log_dir or settings.LOG_DIR, 'logs')
+    os.makedirs(log_dir, exist_ok=True)
+
+    # A Queue rather than a SimpleQueue: the listener marks records done, which flush_logging() waits on
+    _log_queue = queue.Queue()
+    queue_handler = QueueHandler(_log_queue)
+    logger.addHandler(queue_handler)
+    _listener = QueueListener(_log_queue, *_build_handlers(log_dir), respect_handler_level=True)
+    _listener.start()
+
+    atexit.register(shutdown_logging)
+    return logger
+
+
+def flush_logging(timeout: float = FLUSH_TIMEOUT) -> bool:
+    """
+    Block until the listener has handled every record queued so far (so critical-log alerts
+    are handed to the task queue while it still runs), or `timeout` seconds pass.
+    """
+    log_queue = _log_queue
+    if _listener is None or log_queue is None:
+        return True
+    deadline = time.monotonic() + timeout
+    while log_queue.unfinished_tasks:
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def shutdown_logging():
+    """Flush queued records, then close the handlers. Safe to call more than once."""
+    global _listener, _log_queue
+    if _listener is None:
+        return
+    listener, _listener, _log_queue = _listener, None, None
+
+    logger = logging.getLogger(LOGGER_NAME)
+    for handler in logger.handlers[:]:
+        if isinstance(handler, QueueHandler):
+            logger.removeHandler(handler)
+
+    listener.stop()
+    for handler in listener.handlers:
+        try:
+            handler.close()
+        except Exception as e:
+            print(f"Error closing handler: {e}")
+
+
+def get_logger(base_log_dir: str = None) -> logging.Logger:
+    try:
+        return setup_logging(base_log_dir)
     except Exception as e:
         print(f"Logger initialization failed: {e}")
         return logging.getLogger()
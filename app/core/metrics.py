@@ -0,0 +1,209 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}" for labels, value in items]
+
+
+class Gauge(Metric):
+    metric_type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[tuple, float] = {}
+        self._functions: Dict[tuple, Callable[[], float]] = {}
+
+    def set(self, value: float, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set_function(self, function: Callable[[], Optional[float]], *labels):
+        """Compute the value at scrape time instead of on every change."""
+        with self._lock:
+            self._functions[labels] = function
+
+    def value(self, *labels) -> float:
+        if labels in self._functions:
+            return self._functions[labels]()
+        return self._values.get(labels, 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+            functions = list(self._functions.items())
+        for labels, function in functions:
+            try:
+                value = function()
+            except Exception:
+                value = None
+            if value is not None:
+                items.append((labels, value))
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}" for labels, value in items]
+
+
+class Histogram(Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # labels -> [per-bucket counts..., sum, count]
+        self._values: Dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [0] * len(self.buckets) + [0.0, 0]
+            state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def count(self, *labels) -> int:
+        state = self._values.get(labels)
+        return state[-1] if state else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(labels, list(state)) for labels, state in self._values.items()]
+        lines = []
+        for labels, state in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, state):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_str} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{label_str} {state[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+HTTP_REQUESTS = registry.counter("http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+HTTP_REQUEST_DURATION = registry.histogram("http_request_duration_seconds", "HTTP request latency by route.", ("method", "route"))
+HTTP_REQUESTS_IN_PROGRESS = registry.gauge("http_requests_in_progress", "HTTP requests currently being served.")
+
+DB_QUERY_DURATION = registry.histogram("db_query_duration_seconds", "Duration of individual SQL statements.", ("operation",))
+DB_QUERIES_PER_REQUEST = registry.histogram(
+    "db_queries_per_request", "SQL statements executed per HTTP request.", ("route",), buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100)
+)
+DB_TIME_PER_REQUEST = registry.histogram("db_time_per_request_seconds", "Total SQL time per HTTP request.", ("route",))
+DB_POOL_CONNECTIONS = registry.gauge("db_pool_connections", "Database pool connections by state.", ("state",))
+
+PASSWORD_HASH_DURATION = registry.histogram(
+    "password_hash_duration_seconds", "bcrypt hash and verify latency.", ("operation",), buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.0)
+)
+JWT_DURATION = registry.histogram(
+    "jwt_duration_seconds", "JWT encode and decode latency.", ("operation",), buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.005, 0.01)
+)
@@ -0,0 +1,66 @@
+from enum import IntFlag, auto
+from typing import Dict, Iterable
+
+
+class Permission(IntFlag):
+    PROFILE_READ = auto()
+    PROFILE_WRITE = auto()
+    USERS_READ = auto()
+    USERS_WRITE = auto()
+    USERS_DELETE = auto()
+    ROLES_ASSIGN = auto()
+    TOKENS_REVOKE = auto()
+    API_KEYS_MANAGE = auto()
+    DEBUG = auto()
+
+
+# role -> (roles it inherits from, permissions it adds)
+ROLE_DEFINITIONS: Dict[str, tuple] = {
+    "user": ((), Permission.PROFILE_READ | Permission.PROFILE_WRITE),
+    "staff": (("user",), Permission.USERS_READ),
+    "admin": (("staff",), Permission.USERS_WRITE | Permission.USERS_DELETE | Permission.ROLES_ASSIGN | Permission.TOKENS_REVOKE | Permission.API_KEYS_MANAGE),
+    "superuser": (("admin",), Permission.DEBUG),
+}
+
+
+def compile_roles(definitions: Dict[str, tuple]) -> Dict[str, int]:
+    """Flatten the role hierarchy into one permission bitmask per role."""
+    masks: Dict[str, int] = {}
+
+    def resolve(role: str, path: tuple) -> int:
+        if role in path:
+            raise ValueError(f"Role hierarchy cycle: {' -> '.join(path + (role,))}")
+        if role not in masks:
+            parents, permissions = definitions[role]
+            mask = int(permissions)
+            for parent in parents:
+                mask |= resolve(parent, path + (role,))
+            masks[role] = mask
+        return masks[role]
+
+    for role in definitions:
+        resolve(role, ())
+    return masks
+
+
+ROLE_MASKS = compile_roles(ROLE_DEFINITIONS)
+
+
+def role_mask(role: str) -> int:
+    return ROLE_MASKS.get(role, 0)
+
+
+def permission_mask(permissions: Iterable[Permission]) -> int:
+    mask = 0
+    for permission in permissions:
+        mask |= permission
+    return int(mask)
+
+
+def has_permissions(granted: int, required: int) -> bool:
+    return granted & required == required
+
+
+def permission_claims(role: str) -> dict:
+    """Claims embedded in access tokens so authorization needs no database lookup."""
+    return {"role": role, "perm": role_mask(role)}
@@ -0,0 +1,158 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.metrics import registry
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+EVENT_LOOP_LAG = registry.histogram(
+    "event_loop_lag_seconds", "Delay between a scheduled event loop wake-up and when it ran.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+EVENT_LOOP_STALLS = registry.counter("event_loop_stalls_total", "Event loop stalls longer than LOOP_LAG_THRESHOLD_MS.")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    if filename.startswith(PROJECT_DIR):
+        filename = os.path.relpath(filename, PROJECT_DIR)
+    else:
+        filename = os.path.basename(filename)
+    return f"{filename}:{code.co_qualname}"
+
+
+def collapse_stack(frame) -> str:
+    """Render a frame chain root-first, ';'-separated, as used by flamegraph.pl and speedscope."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class SamplingProfiler:
+    """Samples one thread's stack from a background thread; overhead is bounded by the interval."""
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"SamplingProfiler-{self.thread_id}", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> str:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+        return self.collapsed()
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common())
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples[collapse_stack(frame)] += 1
+
+
+_profile_lock = asyncio.Lock()
+
+
+async def profile_event_loop(seconds: float, interval: float = 0.005) -> Optional[str]:
+    """Profile the event loop thread for a while; returns None if a profile is already running."""
+    if _profile_lock.locked():
+        return None
+    async with _profile_lock:
+        profiler = SamplingProfiler(threading.get_ident(), interval)
+        profiler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            collapsed = profiler.stop()
+        return collapsed
+
+
+class EventLoopLagMonitor:
+    """
+    Measures event loop lag and reports what blocked it.
+
+    A heartbeat task records how late each wake-up is. A watchdog thread notices when
+    the heartbeat stalls past the threshold and logs the loop thread's stack at that
+    moment, which points straight at blocking calls (bcrypt, synchronous I/O, logging).
+    """
+
+    def __init__(self, interval: float = 0.5, threshold: float = 0.1):
+        self.interval = interval
+        self.threshold = threshold
+        self.last_lag = 0.0
+        self._last_beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if self.running:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="EventLoopWatchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=self.interval * 2)
+            self._watchdog = None
+
+    async def _heartbeat(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            scheduled = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - scheduled - self.interval)
+            self.last_lag = lag
+            self._last_beat = time.monotonic()
+            EVENT_LOOP_LAG.observe(lag)
+
+    def _watch(self):
+        reported_beat = None
+        while not self._stop.wait(self.interval / 2):
+            beat = self._last_beat
+            stalled_for = time.monotonic() - beat - self.interval
+            if stalled_for < self.threshold or beat == reported_beat:
+                continue
+            reported_beat = beat
+            EVENT_LOOP_STALLS.inc()
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = collapse_stack(frame).replace(";", "\n  ") if frame is not None else "unavailable"
+            logger.warning(f"Event loop blocked for over {stalled_for * 1000:.0f} ms, loop thread stack:\n  {stack}")
+
+
+loop_monitor = EventLoopLagMonitor(interval=settings.LOOP_LAG_INTERVAL, threshold=settings.LOOP_LAG_THRESHOLD_MS / 1000)
@@ -1,33 +1,56 @@
+import math
+import uuid
 from datetime import datetime, timedelta, UTC
-from jose import JWTError, jwt
+from jose import JWTError
 from passlib.context import CryptContext
 from app.core.config import settings
+from app.core.keys import get_key_set
+from app.core.metrics import JWT_DURATION, PASSWORD_HASH_DURATION
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
+def _issued_at(now: datetime) -> float:
+    """
+    Fractional iat so a token issued right after a subject revocation isn't caught by it.
+    Truncated to the millisecond, never rounded up, so a token issued before a revocation
+    can't be dated after it.
+    """
+    return math.floor(now.timestamp() * 1000) / 1000
+
+
 def create_access_token(data: dict):
     to_encode = data.copy()
-    expire = datetime.now(tz=UTC) + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    now = datetime.now(tz=UTC)
+    to_encode.update({"iat": _issued_at(now), "exp": now + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES), "type": "access"})
+    to_encode.setdefault("jti", uuid.uuid4().hex)
+    with JWT_DURATION.time("encode"):
+        return get_key_set().encode(to_encode)
 
 
 def verify_token(token: str):
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        with JWT_DURATION.time("decode"):
+            payload = get_key_set().decode(token)
         return payload
     except JWTError:
         return None
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    with PASSWORD_HASH_DURATION.time("verify"):
+        return pwd_context.verify(plain_password, hashed_password)
+
+
+def get_password_hash(password: str) -> str:
+    with PASSWORD_HASH_DURATION.time("hash"):
+        return pwd_context.hash(password)
 
 
 def decode_access_token(token: str):
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        with JWT_DURATION.time("decode"):
+            payload = get_key_set().decode(token)
         return payload
     except JWTError:
         return None
@@ -35,7 +58,9 @@ def decode_access_token(token: str):
 
 def create_refresh_token(data: dict) -> str:
     to_encode = data.copy()
-    expire = datetime.now(tz=UTC) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    now = datetime.now(tz=UTC)
+    to_encode.update({"iat": _issued_at(now), "exp": now + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS), "type": "refresh"})
+    to_encode.setdefault("jti", uuid.uuid4().hex)
+    with JWT_DURATION.time("encode"):
+        encoded_jwt = get_key_set().encode(to_encode)
     return encoded_jwt
@@ -0,0 +1,135 @@
+import hashlib
+import mmap
+import struct
+import time
+from multiprocessing import Lock as ProcessLock
+
+from limits.storage import Storage
+
+# key hash, expiry timestamp, value
+SLOT = struct.Struct("<Qdq")
+MAX_PROBE = 32
+
+
+class SharedCounters:
+    """
+    Expiring integer counters in an anonymous shared mmap, visible to every process forked
+    after it was created.
+
+    A fixed-size open-addressing table guarded by one process-shared lock; critical sections
+    are a few struct reads and writes. When a probe run is full the entry closest to expiry
+    is evicted, so the table degrades to approximate counts instead of failing.
+    """
+
+    def __init__(self, slots: int = 4096):
+        self.slots = slots
+        self._buffer = mmap.mmap(-1, slots * SLOT.size)
+        self._lock = ProcessLock()
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+
+    def _find(self, key_hash: int, now: float, insert: bool):
+        """Return (offset, expires_at, value) for the key's slot, or None if absent and not inserting."""
+        start = key_hash % self.slots
+        reusable = None
+        for probe in range(min(MAX_PROBE, self.slots)):
+            offset = ((start + probe) % self.slots) * SLOT.size
+            slot_hash, expires_at, value = SLOT.unpack_from(self._buffer, offset)
+            if slot_hash == key_hash:
+                if expires_at <= now:
+                    return offset, 0.0, 0
+                return offset, expires_at, value
+            if slot_hash == 0:
+                if reusable is None or reusable[1] > now:
+                    reusable = (offset, 0.0)
+                break
+            # Expired slots sort first; otherwise evict whichever live entry expires soonest
+            if reusable is None or expires_at < reusable[1]:
+                reusable = (offset, expires_at)
+        if not insert:
+            return None
+        return reusable[0], 0.0, 0
+
+    def incr(self, key: str, expiry: float, amount: int = 1) -> int:
+        """Add `amount` and return the new value; a missing or expired key starts a new `expiry`-second window."""
+        key_hash = self._hash(key)
+        with self._lock:
+            now = time.time()
+            offset, expires_at, value = self._find(key_hash, now, insert=True)
+            if expires_at <= now:
+                expires_at, value = now + expiry, 0
+            value += amount
+            SLOT.pack_into(self._buffer, offset, key_hash, expires_at, value)
+            return value
+
+    def get(self, key: str) -> int:
+        with self._lock:
+            found = self._find(self._hash(key), time.time(), insert=False)
+        return found[2] if found else 0
+
+    def get_expiry(self, key: str) -> float:
+        now = time.time()
+        with self._lock:
+            found = self._find(self._hash(key), now, insert=False)
+        return found[1] if found and found[1] else now
+
+    def clear(self, key: str):
+        key_hash = self._hash(key)
+        with self._lock:
+            found = self._find(key_hash, time.time(), insert=False)
+            if found:
+                SLOT.pack_into(self._buffer, found[0], key_hash, 0.0, 0)
+
+    def reset(self) -> int:
+        """Drop every counter and return how many were live."""
+        with self._lock:
+            now = time.time()
+            live = sum(
+                1 for slot_hash, expires_at, _ in SLOT.iter_unpack(self._buffer)
+                if slot_hash and expires_at > now
+            )
+            self._buffer[:] = bytes(len(self._buffer))
+        return live
+
+
+class SharedMemoryStorage(Storage):
+    """
+    `limits` storage over `SharedCounters`, selected with ``RATELIMIT_STORAGE_URL=shm://``.
+
+    Supports the fixed-window strategy. The limiter must be created before workers are forked
+    (importing `app.main` does that), which `app.server` guarantees.
+    """
+
+    STORAGE_SCHEME = ["shm"]
+
+    def __init__(self, uri: str = None, wrap_exceptions: bool = False, slots: int = 65536, **options):
+        self.counters = SharedCounters(int(slots))
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self):
+        return ValueError
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        return self.counters.incr(key, expiry, amount)
+
+    def get(self, key: str) -> int:
+        return self.counters.get(key)
+
+    def get_expiry(self, key: str) -> float:
+        return self.counters.get_expiry(key)
+
+    def check(self) -> bool:
+        return True
+
+    def reset(self) -> int:
+        return self.counters.reset()
+
+    def clear(self, key: str):
+        self.counters.clear(key)
+
+
+# Process-wide counters for things like critical-log alert thresholds
+shared_counters = SharedCounters()
@@ -0,0 +1,65 @@
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from app.core.logger import logger
+from app.core.metrics import registry
+
+SHUTDOWN_PHASE_SECONDS = registry.gauge("shutdown_phase_seconds", "Time the last shutdown spent in each phase.", ("phase",))
+
+
+class ShutdownCoordinator:
+    """
+    Sequences the worker's shutdown.
+
+    Once *draining* (the server got SIGTERM) readiness fails. With `SHUTDOWN_DRAIN_DELAY` the
+    worker keeps serving for that long so load balancers can notice; then uvicorn closes the
+    socket and waits up to `SHUTDOWN_TIMEOUT` for in-flight requests before the lifespan
+    shutdown starts. By then no request is left, and the lifespan releases each resource in
+    its own timed phase.
+    """
+
+    def __init__(self):
+        self.draining = False
+        self.phases: Dict[str, float] = {}
+        self._started_at: Optional[float] = None
+
+    def reset(self):
+        """Back to serving; the lifespan calls this on startup."""
+        self.draining = False
+        self.phases = {}
+        self._started_at = None
+
+    def begin_drain(self):
+        """Fail readiness from now on. Safe to call from a signal handler, and more than once."""
+        if not self.draining:
+            self.draining = True
+            self._started_at = time.monotonic()
+
+    @asynccontextmanager
+    async def phase(self, name: str):
+        """Time one shutdown step. Errors are logged, not raised, so later steps still release their resources."""
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as exc:
+            logger.error(f"Shutdown phase {name} failed: {type(exc).__name__}: {exc}")
+        finally:
+            self.phases[name] = time.perf_counter() - start
+            SHUTDOWN_PHASE_SECONDS.set(self.phases[name], name)
+
+    def finish(self):
+        """Shutdown is over. Clear the flag (keeping `phases`) so an app used without its lifespan, as in tests, serves again."""
+        self.draining = False
+        self._started_at = None
+
+    def report(self) -> float:
+        """Log how long the shutdown took, from the first drain signal (so connection draining is included), and return it."""
+        total = time.monotonic() - self._started_at if self._started_at is not None else sum(self.phases.values())
+        SHUTDOWN_PHASE_SECONDS.set(total, "total")
+        steps = ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.phases.items())
+        logger.info(f"Shut down in {total:.2f}s ({steps})")
+        return total
+
+
+shutdown = ShutdownCoordinator()
@@ -0,0 +1,403 @@
+import asyncio
+import importlib
+import inspect
+import itertools
+import json
+import random
+import time
+import uuid
+from enum import IntEnum
+from typing import Callable, Optional, Union
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.metrics import registry
+
+TASKS = registry.counter("background_tasks_total", "Background tasks by outcome.", ("outcome",))
+TASK_DURATION = registry.histogram("background_task_duration_seconds", "Background task run time by task.", ("task",))
+TASKS_RUNNING = registry.gauge("background_tasks_running", "Background tasks currently running.")
+
+# How long an idle worker waits for a job before checking again
+POLL_INTERVAL = 0.5
+
+
+class Priority(IntEnum):
+    HIGH = 0
+    NORMAL = 5
+    LOW = 9
+
+
+class QueueFull(Exception):
+    pass
+
+
+def task_name(func: Callable) -> str:
+    return f"{func.__module__}:{func.__qualname__}"
+
+
+def resolve_task(name: str) -> Callable:
+    module, qualname = name.split(":", 1)
+    target = importlib.import_module(module)
+    for part in qualname.split("."):
+        target = getattr(target, part)
+    return target
+
+
+class Job:
+    __slots__ = ("id", "name", "func", "args", "kwargs", "priority", "retries", "attempts")
+
+    def __init__(self, name: str, args: tuple, kwargs: dict, priority: Priority, retries: int,
+                 func: Callable = None, id: str = None, attempts: int = 0):
+        self.id = id or uuid.uuid4().hex
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = Priority(priority)
+        self.retries = retries
+        self.attempts = attempts
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "id": self.id, "name": self.name, "args": list(self.args), "kwargs": self.kwargs,
+            "priority": int(self.priority), "retries": self.retries, "attempts": self.attempts,
+        })
+
+    @classmethod
+    def from_json(cls, payload: str) -> "Job":
+        data = json.loads(payload)
+        return cls(data["name"], tuple(data["args"]), data["kwargs"], data["priority"], data["retries"],
+                   id=data["id"], attempts=data["attempts"])
+
+
+class MemoryTaskBackend:
+    """Per-process queue: fast and dependency-free, but queued jobs die with the process."""
+
+    durable = False
+
+    def __init__(self):
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._order = itertools.count()
+        self._delayed = set()
+
+    @property
+    def queue(self) -> asyncio.PriorityQueue:
+        # Created on first use so it belongs to the loop that runs the workers
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue()
+        return self._queue
+
+    def pending(self) -> int:
+        return self.queue.qsize() + len(self._delayed)
+
+    async def push(self, job: Job):
+        self.queue.put_nowait((job.priority, next(self._order), job))
+
+    async def pop(self, timeout: float) -> Optional[Job]:
+        try:
+            return (await asyncio.wait_for(self.queue.get(), timeout))[2]
+        except asyncio.TimeoutError:
+            return None
+
+    async def ack(self, job: Job):
+        pass
+
+    async def retry(self, job: Job, delay: float):
+        handle = None
+
+        def release():
+            self._delayed.discard(handle)
+            self.queue.put_nowait((job.priority, next(self._order), job))
+
+        handle = asyncio.get_running_loop().call_later(delay, release)
+        self._delayed.add(handle)
+
+    async def close(self):
+        for handle in self._delayed:
+            handle.cancel()
+        self._delayed.clear()
+        self._queue = None
+
+
+class RedisTaskBackend:
+    """
+    Durable queue shared by every worker process: one list per priority, a sorted set of
+    retries waiting for their backoff, and a hash of the jobs being run.
+
+    Delivery is at-least-once. A job whose worker died is put back on its list once it has
+    been in progress for `visibility_timeout` seconds, so tasks should be idempotent.
+
+    Idle workers block on a wake-up list that every push appends to instead of polling, so
+    retries whose backoff has passed are picked up at most `block_timeout` seconds late.
+    All keys share the `{task-queue}` hash tag, so the script also runs on Redis Cluster.
+    """
+
+    durable = True
+    PREFIX = "{task-queue}"
+    # Each token only makes one idle worker look again, so a few are plenty
+    MAX_WAKE_TOKENS = 100
+    # Move due retries back to their lists, then take the most urgent job and mark it in progress.
+    # KEYS: delayed, processing, then the ready lists by priority; ARGV: now, then the priority
+    # of each ready list in the same order
+    POP_SCRIPT = """
+    local ready = {}
+    for index = 3, #KEYS do
+        ready[ARGV[index - 1]] = KEYS[index]
+    end
+    local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, 100)
+    for _, payload in ipairs(due) do
+        redis.call('ZREM', KEYS[1], payload)
+        redis.call('LPUSH', ready[tostring(cjson.decode(payload)['priority'])], payload)
+    end
+    for index = 3, #KEYS do
+        local payload = redis.call('RPOP', KEYS[index])
+        if payload then
+            redis.call('HSET', KEYS[2], cjson.decode(payload)['id'], ARGV[1] .. '|' .. payload)
+            return payload
+        end
+    end
+    return false
+    """
+
+    def __init__(self, visibility_timeout: float = 300, block_timeout: float = 5.0):
+        self.visibility_timeout = visibility_timeout
+        self.block_timeout = block_timeout
+        self.delayed = f"{self.PREFIX}:delayed"
+        self.processing = f"{self.PREFIX}:processing"
+        self.wake = f"{self.PREFIX}:wake"
+        self.ready_prefix = f"{self.PREFIX}:ready:"
+        self.priorities = [str(int(priority)) for priority in sorted(Priority)]
+        self.ready_keys = [f"{self.ready_prefix}{priority}" for priority in self.priorities]
+        self._recovered_at = 0.0
+
+    async def _redis(self):
+        from app.utils.redis_cache import redis_cache
+
+        return await redis_cache.get_redis()
+
+    def pending(self) -> int:
+        # Queued jobs survive shutdown, so draining only waits for the running ones
+        return 0
+
+    async def push(self, job: Job):
+        redis = await self._redis()
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.lpush(f"{self.ready_prefix}{int(job.priority)}", job.to_json())
+            pipe.lpush(self.wake, "1")
+            pipe.ltrim(self.wake, 0, self.MAX_WAKE_TOKENS - 1)
+            await pipe.execute()
+
+    async def pop(self, timeout: float) -> Optional[Job]:
+        """The most urgent job; when there is none, blocks up to `block_timeout` (not `timeout`) for a push."""
+        redis = await self._redis()
+        now = time.time()
+        if now - self._recovered_at > self.visibility_timeout / 2:
+            self._recovered_at = now
+            await self.recover()
+        payload = await redis.eval(
+            self.POP_SCRIPT, 2 + len(self.ready_keys), self.delayed, self.processing, *self.ready_keys,
+            repr(now), *self.priorities,
+        )
+        if payload is None:
+            await redis.blpop([self.wake], timeout=self.block_timeout)
+            return None
+        return Job.from_json(payload)
+
+    async def ack(self, job: Job):
+        redis = await self._redis()
+        await redis.hdel(self.processing, job.id)
+
+    async def retry(self, job: Job, delay: float):
+        redis = await self._redis()
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.hdel(self.processing, job.id)
+            pipe.zadd(self.delayed, {job.to_json(): time.time() + delay})
+            await pipe.execute()
+
+    async def recover(self):
+        """Requeue jobs left in progress by a worker that is gone."""
+        redis = await self._redis()
+        cutoff = time.time() - self.visibility_timeout
+        for job_id, entry in (await redis.hgetall(self.processing)).items():
+            started, payload = entry.split("|", 1)
+            # HDEL decides which process requeues it when several recover at once
+            if float(started) < cutoff and await redis.hdel(self.processing, job_id):
+                logger.warning(f"Requeueing background task {job_id} abandoned by its worker")
+                await redis.lpush(f"{self.ready_prefix}{json.loads(payload)['priority']}", payload)
+
+    async def close(self):
+        pass
+
+
+class TaskQueue:
+    """
+    Runs side effects (emails, notifications, slow I/O) on background workers so handlers can
+    return first. Any module-level function or coroutine function can be a task; sync ones
+    run in the threadpool. Failures are retried with exponential backoff and jitter.
+
+    With the Redis backend jobs are stored as JSON, so arguments must be JSON-serializable
+    and the task importable by name; with the memory backend anything goes.
+    """
+
+    def __init__(self, backend=None, concurrency: int = 4, max_size: int = 10000, retries: int = 3,
+                 backoff: float = 1.0, max_backoff: float = 300):
+        self._backend = backend
+        self.concurrency = concurrency
+        self.max_size = max_size
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._workers = []
+        self._running = 0
+        self._accepting = False
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            if settings.TASK_QUEUE_BACKEND == "redis":
+                self._backend = RedisTaskBackend()
+            else:
+                self._backend = MemoryTaskBackend()
+        return self._backend
+
+    @property
+    def running(self) -> bool:
+        return self._accepting
+
+    async def start(self):
+        if self._accepting:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._accepting = True
+        self._workers = [self._loop.create_task(self._work()) for _ in range(self.concurrency)]
+
+    async def stop(self, timeout: float = 10):
+        """Stop taking new jobs and give queued and running ones `timeout` seconds to finish."""
+        if not self._accepting:
+            return
+        self._accepting = False
+        deadline = time.monotonic() + timeout
+        while (self._running or self.backend.pending()) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        left = self._running + self.backend.pending()
+        if left:
+            logger.warning(f"Task queue stopped with {left} unfinished background tasks")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        await self.backend.close()
+        self._workers = []
+        self._loop = None
+
+    async def enqueue(self, func: Union[Callable, str], *args, priority: Priority = Priority.NORMAL,
+                      retries: int = None, **kwargs) -> str:
+        """Queue `func(*args, **kwargs)` and return the job id. `priority` and `retries` are reserved names."""
+        if not self._accepting:
+            raise RuntimeError("Task queue is not running")
+        job = self._job(func, args, kwargs, priority, retries)
+        await self._push(job)
+        return job.id
+
+    def submit(self, func: Union[Callable, str], *args, priority: Priority = Priority.NORMAL,
+               retries: int = None, **kwargs) -> Optional[str]:
+        """
+        Fire-and-forget `enqueue` that is safe to call from any thread, e.g. a logging handler.
+        Outside a running app (scripts, the CLI) the task runs inline instead.
+        """
+        job = self._job(func, args, kwargs, priority, retries)
+        loop = self._loop
+        if not self._accepting or loop is None or loop.is_closed():
+            self._run_inline(job)
+            return None
+
+        def schedule():
+            task = loop.create_task(self._push(job))
+            task.add_done_callback(self._log_submit_failure)
+
+        loop.call_soon_threadsafe(schedule)
+        return job.id
+
+    async def _push(self, job: Job):
+        if not self.backend.durable and self.backend.pending() >= self.max_size:
+            TASKS.inc("rejected")
+            raise QueueFull(f"{self.max_size} background tasks already queued")
+        await self.backend.push(job)
+        TASKS.inc("enqueued")
+
+    def _job(self, func, args: tuple, kwargs: dict, priority: Priority, retries: Optional[int]) -> Job:
+        name = func if isinstance(func, str) else task_name(func)
+        if self.backend.durable and "<" in name:
+            raise ValueError(f"{name} can't be stored: durable tasks must be module-level functions")
+        return Job(name, args, kwargs, priority, self.retries if retries is None else retries,
+                   func=None if isinstance(func, str) or self.backend.durable else func)
+
+    @staticmethod
+    def _log_submit_failure(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Could not queue background task: {task.exception()}")
+
+    def _run_inline(self, job: Job):
+        func = job.func or resolve_task(job.name)
+        try:
+            result = func(*job.args, **job.kwargs)
+            if inspect.iscoroutine(result):
+                asyncio.run(result)
+        except Exception as e:
+            logger.error(f"Background task {job.name} failed: {e}")
+
+    def backoff_delay(self, attempts: int) -> float:
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempts - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    async def _work(self):
+        while True:
+            try:
+                job = await self.backend.pop(POLL_INTERVAL)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Task queue fetch failed: {e}")
+                await asyncio.sleep(POLL_INTERVAL)
+                continue
+            if job is None:
+                continue
+            self._running += 1
+            TASKS_RUNNING.inc()
+            try:
+                await self._run(job)
+            finally:
+                self._running -= 1
+                TASKS_RUNNING.dec()
+
+    async def _run(self, job: Job):
+        try:
+            func = job.func or resolve_task(job.name)
+            with TASK_DURATION.time(job.name):
+                if inspect.iscoroutinefunction(func):
+                    await func(*job.args, **job.kwargs)
+                else:
+                    await run_in_threadpool(func, *job.args, **job.kwargs)
+        except Exception as e:
+            job.attempts += 1
+            if job.attempts <= job.retries:
+                TASKS.inc("retried")
+                delay = self.backoff_delay(job.attempts)
+                logger.warning(f"Background task {job.name} failed ({e}), retry {job.attempts}/{job.retries} in {delay:.1f}s")
+                await self.backend.retry(job, delay)
+            else:
+                TASKS.inc("failed")
+                logger.error(f"Background task {job.name} failed after {job.attempts} attempts: {e}")
+                await self.backend.ack(job)
+        else:
+            TASKS.inc("succeeded")
+            await self.backend.ack(job)
+
+
+task_queue = TaskQueue(
+    concurrency=settings.TASK_QUEUE_CONCURRENCY,
+    max_size=settings.TASK_QUEUE_MAX_SIZE,
+    retries=settings.TASK_QUEUE_MAX_RETRIES,
+)
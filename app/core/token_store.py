@@ -0,0 +1,298 @@
+import asyncio
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.deadline import deadline_stage
+from app.core.logger import logger
+from app.core.metrics import registry
+from app.core.security import create_access_token, create_refresh_token, decode_access_token
+from app.utils.bloom import BloomFilter
+
+REFRESH_REUSE = registry.counter("refresh_token_reuse_total", "Rotated-away refresh tokens presented again.")
+REVOCATION_CHECKS = registry.counter("token_revocation_checks_total", "Revocation checks by outcome.", ("result",))
+
+# Rebuild the filter from the store now and then, so revocations that expired stop costing bits
+REBUILD_INTERVAL = 3600
+
+
+def new_token_id() -> str:
+    return uuid.uuid4().hex
+
+
+class MemoryTokenBackend:
+    """Per-process backend for development, tests and single-worker deployments."""
+
+    def __init__(self):
+        self._revoked: Dict[str, Tuple[float, float]] = {}  # identifier -> (revoked_at, expires_at)
+        self._log: List[Tuple[str, float]] = []
+        self._families: Dict[str, Tuple[str, float]] = {}
+
+    async def revoke(self, identifier: str, expires_at: float, revoked_at: float = None):
+        self._revoked[identifier] = (revoked_at or time.time(), expires_at)
+        self._log.append((identifier, expires_at))
+
+    async def revoked_at(self, identifier: str) -> Optional[float]:
+        revoked_at, expires_at = self._revoked.get(identifier, (None, 0))
+        return revoked_at if expires_at > time.time() else None
+
+    async def revocations_since(self, cursor: Optional[int]) -> Tuple[List[Tuple[str, float]], int]:
+        now = time.time()
+        if cursor is None:
+            # Full rebuilds are a good moment to forget what has expired
+            self._log = [entry for entry in self._log if entry[1] > now]
+            self._revoked = {identifier: entry for identifier, entry in self._revoked.items() if entry[1] > now}
+            cursor = 0
+        return self._log[cursor:], len(self._log)
+
+    async def set_family(self, family: str, jti: str, ttl: int):
+        self._families[family] = (jti, time.time() + ttl)
+
+    async def rotate_family(self, family: str, current_jti: str, new_jti: str, ttl: int) -> Optional[bool]:
+        """True if rotated, False if `current_jti` is stale (reuse), None if the family is unknown or expired."""
+        jti, expires_at = self._families.get(family, (None, 0))
+        if jti is None or expires_at <= time.time():
+            return None
+        if jti != current_jti:
+            return False
+        self._families[family] = (new_jti, time.time() + ttl)
+        return True
+
+    async def delete_family(self, family: str):
+        self._families.pop(family, None)
+
+
+class RedisTokenBackend:
+    """
+    Shared backend: revocations are exact keys with a TTL plus an append-only stream that
+    every process tails to keep its bloom filter current.
+    """
+
+    PREFIX = "token-store"
+    # Swap the family's current refresh jti only if the presented one is still current;
+    # -1 tells an unknown (expired or deleted) family apart from a stale jti
+    ROTATE_SCRIPT = """
+    local current = redis.call('GET', KEYS[1])
+    if not current then
+        return -1
+    end
+    if current == ARGV[1] then
+        redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+        return 1
+    end
+    return 0
+    """
+
+    def __init__(self, max_lifetime: int):
+        self.max_lifetime = max_lifetime
+        self.stream = f"{self.PREFIX}:revocations"
+
+    async def _redis(self):
+        from app.utils.redis_cache import redis_cache
+
+        return await redis_cache.get_redis()
+
+    async def revoke(self, identifier: str, expires_at: float, revoked_at: float = None):
+        redis = await self._redis()
+        ttl = max(1, int(expires_at - time.time()))
+        oldest = int((time.time() - self.max_lifetime) * 1000)
+        await redis.set(f"{self.PREFIX}:revoked:{identifier}", str(revoked_at or time.time()), ex=ttl)
+        await redis.xadd(self.stream, {"id": identifier, "exp": str(expires_at)}, minid=oldest, approximate=True)
+
+    async def revoked_at(self, identifier: str) -> Optional[float]:
+        async with deadline_stage("redis"):
+            redis = await self._redis()
+            revoked_at = await redis.get(f"{self.PREFIX}:revoked:{identifier}")
+        return float(revoked_at) if revoked_at is not None else None
+
+    async def revocations_since(self, cursor: Optional[str]) -> Tuple[List[Tuple[str, float]], str]:
+        redis = await self._redis()
+        entries = await redis.xrange(self.stream, min=f"({cursor}" if cursor else "-", max="+")
+        if not entries:
+            return [], cursor
+        return [(fields["id"], float(fields["exp"])) for _, fields in entries], entries[-1][0]
+
+    async def set_family(self, family: str, jti: str, ttl: int):
+        redis = await self._redis()
+        await redis.set(f"{self.PREFIX}:family:{family}", jti, ex=ttl)
+
+    async def rotate_family(self, family: str, current_jti: str, new_jti: str, ttl: int) -> Optional[bool]:
+        async with deadline_stage("redis"):
+            redis = await self._redis()
+            result = int(await redis.eval(self.ROTATE_SCRIPT, 1, f"{self.PREFIX}:family:{family}", current_jti, new_jti, ttl))
+        return None if result < 0 else bool(result)
+
+    async def delete_family(self, family: str):
+        redis = await self._redis()
+        await redis.delete(f"{self.PREFIX}:family:{family}")
+
+
+class TokenStore:
+    """
+    Issues token pairs, rotates refresh tokens and answers revocation checks.
+
+    Every refresh token belongs to a family started at login; the store remembers only the
+    family's current refresh `jti`. Presenting an older one means the token was copied, so the
+    whole family (including access tokens carrying its `fam` claim) is revoked. Revoking a
+    subject rejects that user's access tokens issued up to that moment, e.g. after a role change.
+
+    Revocation checks consult an in-process bloom filter first and only ask the backend about
+    the rare hits, so a valid token costs no network round trip. The filter is refreshed from
+    the backend every `sync_interval` seconds; that is how long another process may take to
+    notice a revocation.
+    """
+
+    def __init__(self, backend=None, sync_interval: float = 2.0, capacity: int = 100_000, error_rate: float = 0.001):
+        self._backend = backend
+        self.sync_interval = sync_interval
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._cursor = None
+        self._built_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._pending = set()
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            if settings.TOKEN_STORE_BACKEND == "redis":
+                self._backend = RedisTokenBackend(max_lifetime=self.refresh_lifetime)
+            else:
+                self._backend = MemoryTokenBackend()
+        return self._backend
+
+    @property
+    def refresh_lifetime(self) -> int:
+        return settings.REFRESH_TOKEN_EXPIRE_DAYS * 86400
+
+    async def issue(self, subject: str, claims: dict = None) -> dict:
+        """Start a new refresh family (at login) and return its first token pair."""
+        family, jti = new_token_id(), new_token_id()
+        await self.backend.set_family(family, jti, self.refresh_lifetime)
+        return self._token_pair(subject, family, jti, claims)
+
+    async def rotate(self, refresh_token: str, claims: dict = None) -> Optional[dict]:
+        """
+        Exchange a current refresh token for a new pair; None if it's invalid, revoked or reused.
+        `claims` are added to the new access token.
+        """
+        payload = decode_access_token(refresh_token)
+        if not payload or payload.get("type") != "refresh" or not payload.get("sub"):
+            return None
+        family, jti = payload.get("fam"), payload.get("jti")
+        if not family or not jti or await self.is_revoked(payload):
+            return None
+
+        new_jti = new_token_id()
+        rotated = await self.backend.rotate_family(family, jti, new_jti, self.refresh_lifetime)
+        if rotated is None:
+            # Never issued by this store, logged out or expired: invalid, but not evidence of theft
+            return None
+        if not rotated:
+            REFRESH_REUSE.inc()
+            logger.warning(f"Refresh token reuse for {payload['sub']}, revoking token family {family}")
+            await self.revoke_family(family)
+            return None
+        return self._token_pair(payload["sub"], family, new_jti, claims)
+
+    async def revoke_family(self, family: str):
+        await self.backend.delete_family(family)
+        await self.revoke(family, time.time() + self.refresh_lifetime)
+
+    async def revoke_subject(self, subject: str, revoked_at: float = None):
+        """Reject the subject's access tokens issued up to `revoked_at` (default: now); later ones (and refreshes) still work."""
+        revoked_at = revoked_at or time.time()
+        await self.revoke(f"sub:{subject}", revoked_at + settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60, revoked_at)
+
+    def revoke_subject_soon(self, subject: str):
+        """
+        `revoke_subject` for synchronous callers such as ORM events: the local filter is updated
+        now, the store write is scheduled. The cut-off is taken now, so a token issued before the
+        write runs isn't caught by it.
+        """
+        revoked_at = time.time()
+        self._bloom.add(f"sub:{subject}")
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            asyncio.run(self.revoke_subject(subject, revoked_at))
+            return
+        task = loop.create_task(self.revoke_subject(subject, revoked_at))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def revoke(self, identifier: str, expires_at: float, revoked_at: float = None):
+        """Revoke tokens carrying `identifier` and issued up to `revoked_at`, until `expires_at` (the longest they could live)."""
+        self._bloom.add(identifier)
+        await self.backend.revoke(identifier, expires_at, revoked_at)
+
+    async def is_revoked(self, payload: dict) -> bool:
+        identifiers = [payload.get("jti"), payload.get("fam")]
+        if payload.get("type") != "refresh":
+            identifiers.append(f"sub:{payload.get('sub')}")
+        candidates = [identifier for identifier in identifiers if identifier and identifier in self._bloom]
+        if not candidates:
+            REVOCATION_CHECKS.inc("filtered")
+            return False
+        issued_at = payload.get("iat", 0)
+        for identifier in candidates:
+            revoked_at = await self.backend.revoked_at(identifier)
+            if revoked_at is not None and issued_at <= revoked_at:
+                REVOCATION_CHECKS.inc("revoked")
+                return True
+        REVOCATION_CHECKS.inc("false_positive")
+        return False
+
+    async def sync(self):
+        """Pull revocations made by other processes into the local filter."""
+        now = time.time()
+        if self._cursor is None or self._bloom.saturated or now - self._built_at > REBUILD_INTERVAL:
+            entries, cursor = await self.backend.revocations_since(None)
+            bloom = BloomFilter(max(self.capacity, len(entries) * 2), self.error_rate)
+            self._built_at = now
+        else:
+            entries, cursor = await self.backend.revocations_since(self._cursor)
+            bloom = self._bloom
+        for identifier, expires_at in entries:
+            if expires_at > now:
+                bloom.add(identifier)
+        self._bloom, self._cursor = bloom, cursor
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self.running:
+            return
+        await self.sync()
+        self._task = asyncio.get_running_loop().create_task(self._sync_forever())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _sync_forever(self):
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.error(f"Token revocation sync failed: {e}")
+
+    def _token_pair(self, subject: str, family: str, refresh_jti: str, claims: dict = None) -> dict:
+        return {
+            "access_token": create_access_token({**(claims or {}), "sub": subject, "fam": family}),
+            "refresh_token": create_refresh_token({"sub": subject, "fam": family, "jti": refresh_jti}),
+            "token_type": "bearer",
+        }
+
+
+token_store = TokenStore(sync_interval=settings.TOKEN_REVOCATION_SYNC_INTERVAL)
@@ -0,0 +1,282 @@
+from functools import lru_cache
+from typing import Any, Dict, Generic, Iterable, List, Optional, Sequence, Tuple, Type, TypeVar, Union
+
+from pydantic import BaseModel
+from sqlalchemy import JSON, and_, asc, delete, desc, func, inspect, literal, literal_column, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.core.custom_exception import ConflictError, NotFoundError
+from app.db.base_class import Base
+from app.utils.pagination import Page, decode_keyset, encode_keyset, fetch_keyset_page, fetch_page
+from app.utils.search import TrigramIndex
+
+ModelT = TypeVar("ModelT", bound=Base)
+CreateT = TypeVar("CreateT", bound=BaseModel)
+UpdateT = TypeVar("UpdateT", bound=BaseModel)
+
+
+class ModelInfo:
+    """Column metadata read from the mapper once per model instead of on every call."""
+
+    __slots__ = ("columns", "filterable", "primary_key", "version_key", "writable")
+
+    def __init__(self, model: Type[Base]):
+        mapper = inspect(model)
+        self.columns = frozenset(attribute.key for attribute in mapper.column_attrs)
+        # JSON can't be compared portably, so filters on JSON columns are ignored
+        self.filterable = frozenset(
+            attribute.key for attribute in mapper.column_attrs if not isinstance(attribute.columns[0].type, JSON)
+        )
+        self.primary_key = mapper.get_property_by_column(mapper.primary_key[0]).key
+        version_col = mapper.version_id_col
+        self.version_key = mapper.get_property_by_column(version_col).key if version_col is not None else None
+        self.writable = self.columns - {self.primary_key, self.version_key}
+
+
+@lru_cache(maxsize=None)
+def model_info(model: Type[Base]) -> ModelInfo:
+    return ModelInfo(model)
+
+
+# One in-process search index per model, shared by every CRUDBase over it: (table fingerprint, index)
+_fallback_indexes: Dict[Type[Base], Tuple[tuple, TrigramIndex]] = {}
+
+
+class CRUDBase(Generic[ModelT, CreateT, UpdateT]):
+    """
+    Queries shared by every resource. Subclass with the model and its schemas:
+
+        class CRUDItem(CRUDBase[Item, ItemCreate, ItemUpdate]):
+            ...
+
+        crud_item = CRUDItem(Item)
+
+    Updates go through the ORM, so model events fire and, when the model maps a
+    `version_id_col`, a concurrent change raises `ConflictError` instead of being lost.
+    The `*_many` methods are single statements and skip ORM events.
+    """
+
+    def __init__(self, model: Type[ModelT]):
+        self.model = model
+        self.info = model_info(model)
+        self.primary_key = getattr(model, self.info.primary_key)
+
+    def _filter(self, query, filters: Dict[str, Any]):
+        for key, value in filters.items():
+            if key not in self.info.columns:
+                raise ValueError(f"{self.model.__name__} has no column {key!r}")
+            if key in self.info.filterable:
+                query = query.where(getattr(self.model, key) == value)
+        return query
+
+    @staticmethod
+    def _order(query, order_by: Optional[Sequence[Tuple[Any, bool]]]):
+        for field, ascending in order_by or ():
+            query = query.order_by(asc(field) if ascending else desc(field))
+        return query
+
+    def _values(self, obj_in: Union[BaseModel, dict], exclude_unset: bool = False) -> dict:
+        data = obj_in.model_dump(exclude_unset=exclude_unset) if isinstance(obj_in, BaseModel) else obj_in
+        return {key: value for key, value in data.items() if key in self.info.writable}
+
+    async def get(self, db: AsyncSession, id: Any) -> Optional[ModelT]:
+        # Served from the session's identity map when the row is already loaded
+        return await db.get(self.model, id)
+
+    async def get_by(self, db: AsyncSession, **filters) -> Optional[ModelT]:
+        result = await db.execute(self._filter(select(self.model), filters).limit(1))
+        return result.scalars().first()
+
+    async def get_multi(self, db: AsyncSession, *, order_by: Sequence[Tuple[Any, bool]] = None,
+                        limit: int = None, offset: int = None, **filters) -> List[ModelT]:
+        query = self._order(self._filter(select(self.model), filters), order_by)
+        if limit is not None:
+            query = query.limit(limit)
+        if offset:
+            query = query.offset(offset)
+        result = await db.execute(query)
+        return list(result.scalars().all())
+
+    async def get_many_by(self, db: AsyncSession, key: str, values: Iterable) -> Dict[Any, ModelT]:
+        """Rows whose `key` column is in `values`, in one `IN (...)` query, keyed by that column."""
+        values = list(set(values))
+        if not values:
+            return {}
+        result = await db.execute(select(self.model).where(getattr(self.model, key).in_(values)))
+        return {getattr(obj, key): obj for obj in result.scalars()}
+
+    async def get_page(self, db: AsyncSession, page: int = 1, per_page: int = 10,
+                       order_by: Sequence[Tuple[Any, bool]] = None, **filters) -> Tuple[List[ModelT], int]:
+        result = await fetch_page(db, self._order(self._filter(select(self.model), filters), order_by),
+                                  page, per_page, with_count=True)
+        return result.items, result.count
+
+    async def get_keyset_page(self, db: AsyncSession, cursor: str = None, per_page: int = 10,
+                              order_by: Sequence[Tuple[Any, bool]] = None, with_count: bool = False,
+                              **filters) -> Page:
+        """
+        Rows after `cursor`, for list endpoints. Ordered by `order_by` (default: primary key); the
+        primary key is appended when missing, so every row has a distinct position.
+        """
+        order_by = list(order_by or ())
+        if not any(field is self.primary_key for field, _ in order_by):
+            order_by.append((self.primary_key, True))
+        return await fetch_keyset_page(db, self._filter(select(self.model), filters), order_by,
+                                       cursor=cursor, per_page=per_page, with_count=with_count)
+
+    async def exists(self, db: AsyncSession, **filters) -> bool:
+        result = await db.execute(self._filter(select(literal(1)).select_from(self.model), filters).limit(1))
+        return result.scalar() is not None
+
+    async def create(self, db: AsyncSession, obj_in: Union[CreateT, dict]) -> ModelT:
+        obj = self.model(**self._values(obj_in))
+        db.add(obj)
+        try:
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        await db.refresh(obj)
+        return obj
+
+    async def create_many(self, db: AsyncSession, objs_in: Iterable[Union[CreateT, dict]]) -> List[ModelT]:
+        """Insert all rows in one flush; SQLAlchemy batches them into multi-row INSERTs."""
+        objs = [self.model(**self._values(obj_in)) for obj_in in objs_in]
+        db.add_all(objs)
+        try:
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        return objs
+
+    async def update(self, db: AsyncSession, obj: Union[ModelT, Any], obj_in: Union[UpdateT, dict],
+                     expected_version: int = None) -> ModelT:
+        """
+        Apply the fields set on `obj_in` (a partial update). `obj` is a loaded row or a
+        primary key. With `expected_version`, a row changed since the client read it is a conflict.
+        """
+        if not isinstance(obj, self.model):
+            obj = await self.get(db, obj)
+            if obj is None:
+                raise NotFoundError(f"{self.model.__name__} not found")
+        if expected_version is not None and self.info.version_key is not None:
+            if getattr(obj, self.info.version_key) != expected_version:
+                raise ConflictError(f"{self.model.__name__} was modified by someone else")
+        for key, value in self._values(obj_in, exclude_unset=True).items():
+            setattr(obj, key, value)
+        try:
+            await db.commit()
+        except StaleDataError:
+            await db.rollback()
+            raise ConflictError(f"{self.model.__name__} was modified by someone else")
+        except Exception:
+            await db.rollback()
+            raise
+        return obj
+
+    async def update_many(self, db: AsyncSession, values: dict, **filters) -> int:
+        """One UPDATE for every matching row; returns the row count. ORM events don't fire, see the class docstring."""
+        values = {key: value for key, value in values.items() if key in self.info.writable}
+        if self.info.version_key is not None:
+            version = getattr(self.model, self.info.version_key)
+            values[self.info.version_key] = version + 1
+        try:
+            result = await db.execute(self._filter(update(self.model), filters).values(**values))
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        return result.rowcount
+
+    async def delete(self, db: AsyncSession, id: Any):
+        obj = await self.get(db, id)
+        if obj is None:
+            raise NotFoundError(f"{self.model.__name__} not found")
+        await db.delete(obj)
+        try:
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+
+    async def delete_many(self, db: AsyncSession, ids: Iterable[Any]) -> int:
+        ids = list(ids)
+        if not ids:
+            return 0
+        try:
+            result = await db.execute(delete(self.model).where(self.primary_key.in_(ids)))
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        return result.rowcount
+
+    def search_text(self):
+        """
+        `lower(coalesce(a, '') || ' ' || coalesce(b, '') ...)` over the model's `__searchable__`
+        columns. The trigram index is built on exactly this expression, so keep them in sync.
+        """
+        columns = getattr(self.model, "__searchable__", ())
+        if not columns:
+            raise ValueError(f"{self.model.__name__} declares no __searchable__ columns")
+        # Inlined literals: a bound parameter would stop Postgres from matching the index expression
+        space, empty = literal_column("' '"), literal_column("''")
+        text = func.coalesce(getattr(self.model, columns[0]), empty)
+        for column in columns[1:]:
+            text = text.op("||")(space).op("||")(func.coalesce(getattr(self.model, column), empty))
+        return func.lower(text)
+
+    async def search(self, db: AsyncSession, query: str, per_page: int = 20, cursor: str = None) -> Page:
+        """
+        Rows containing `query` or similar to it (trigram word similarity), best match first.
+        Paging is by keyset on (rank, primary key), so deep pages cost the same as the first;
+        pass the page to `app.utils.pagination.keyset_response` for the usual envelope.
+        """
+        position = None
+        if cursor:
+            rank, id = decode_keyset(cursor, 2)
+            if (isinstance(rank, bool) or not isinstance(rank, (int, float))
+                    or not isinstance(id, self.primary_key.type.python_type)):
+                raise ValueError("Invalid cursor")
+            position = (float(rank), id)
+        # One extra hit tells whether another page follows
+        if db.get_bind().dialect.name == "postgresql":
+            hits = await self._search_trigram_index(db, query, per_page + 1, position)
+        else:
+            hits = await self._search_fallback_index(db, query, per_page + 1, position)
+        has_next = len(hits) > per_page
+        hits = hits[:per_page]
+        next_cursor = None
+        if has_next:
+            rank, obj = hits[-1]
+            next_cursor = encode_keyset([rank, getattr(obj, self.info.primary_key)])
+        return Page([obj for _, obj in hits], has_next=has_next, has_previous=bool(cursor), next_cursor=next_cursor)
+
+    async def _search_trigram_index(self, db: AsyncSession, query: str, limit: int, position) -> list:
+        text = self.search_text()
+        rank = func.word_similarity(query, text)
+        statement = select(self.model, rank).where(or_(
+            text.contains(query.lower(), autoescape=True),
+            text.op("%>")(query),  # word_similarity(query, text) >= pg_trgm.word_similarity_threshold
+        ))
+        if position is not None:
+            statement = statement.where(or_(rank < position[0], and_(rank == position[0], self.primary_key > position[1])))
+        result = await db.execute(statement.order_by(rank.desc(), self.primary_key).limit(limit))
+        return [(hit_rank, obj) for obj, hit_rank in result.all()]
+
+    async def _search_fallback_index(self, db: AsyncSession, query: str, limit: int, position) -> list:
+        version = getattr(self.model, self.info.version_key) if self.info.version_key else literal(0)
+        fingerprint = tuple((await db.execute(
+            select(func.count(), func.max(self.primary_key), func.sum(version)).select_from(self.model)
+        )).one())
+        cached = _fallback_indexes.get(self.model)
+        if cached is None or cached[0] != fingerprint:
+            columns = [getattr(self.model, column) for column in self.model.__searchable__]
+            rows = await db.execute(select(self.primary_key, *columns))
+            index = TrigramIndex((row[0], " ".join(value or "" for value in row[1:])) for row in rows)
+            cached = _fallback_indexes[self.model] = (fingerprint, index)
+        hits = cached[1].search(query, limit, position)
+        objs = await self.get_many_by(db, self.info.primary_key, [id for _, id in hits])
+        return [(rank, objs[id]) for rank, id in hits if id in objs]
@@ -1,31 +1,75 @@
-from typing import Optional
+from typing import Dict, Iterable, Optional
 
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.deadline import clear_deadline, deadline_stage
+from app.crud.base import CRUDBase
 from app.db.models.user import User
-from app.schemas.user import UserCreate
-from passlib.context import CryptContext
+from app.db.session import session_scope
+from app.schemas.user import UserCreate, UserUpdate
+from app.core.security import get_password_hash, verify_password
+from app.utils.dataloader import DataLoader
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
+    def __init__(self, model=User):
+        super().__init__(model)
+        window = settings.USER_LOADER_WINDOW_MS / 1000
+        self.username_loader = DataLoader(self._load_by_usernames, name="users_by_username", window=window)
+        self.id_loader = DataLoader(self._load_by_ids, name="users_by_id", window=window)
 
-class CRUDUser:
     async def get_by_username(self, db: AsyncSession, username: str) -> Optional[User]:
-        result = await db.execute(select(User).where(User.username == username))
-        return result.scalars().first()
+        return await self.get_by(db, username=username)
+
+    async def get_many_by_username(self, db: AsyncSession, usernames: Iterable[str]) -> Dict[str, User]:
+        return await self.get_many_by(db, "username", usernames)
+
+    async def get_many_by_id(self, db: AsyncSession, ids: Iterable[int]) -> Dict[int, User]:
+        return await self.get_many_by(db, "id", ids)
+
+    async def load_by_username(self, username: str) -> Optional[User]:
+        """
+        Coalesced lookup: concurrent calls share one `IN (...)` query in a session of its own.
+        The returned user may be shared with other requests, so treat it as read-only.
+        """
+        # The wait is bounded by this request's deadline; the shared batch keeps going for the others
+        async with deadline_stage("loader"):
+            return await self.username_loader.load(username)
+
+    async def load_by_id(self, id: int) -> Optional[User]:
+        async with deadline_stage("loader"):
+            return await self.id_loader.load(id)
+
+    async def _load_by_usernames(self, usernames: list) -> Dict[str, User]:
+        # The batch task inherited whichever request created it; one short deadline mustn't fail the rest
+        clear_deadline()
+        async with session_scope() as db:
+            return await self.get_many_by_username(db, usernames)
+
+    async def _load_by_ids(self, ids: list) -> Dict[int, User]:
+        clear_deadline()
+        async with session_scope() as db:
+            return await self.get_many_by_id(db, ids)
+
+    async def update_many(self, db: AsyncSession, values: dict, **filters) -> int:
+        if "role" in values:
+            # A bulk UPDATE skips the after_update hook, so record the role changes it makes
+            # for the after_commit hook that revokes those users' tokens
+            query = self._filter(select(User.username), filters).where(User.role.is_distinct_from(values["role"]))
+            usernames = (await db.execute(query)).scalars().all()
+            db.info.setdefault("role_changes", set()).update(usernames)
+        return await super().update_many(db, values, **filters)
 
     async def create(self, db: AsyncSession, obj_in: UserCreate) -> User:
-        hashed_password = pwd_context.hash(obj_in.password)
-        db_user = User(
-            username=obj_in.username,
-            hashed_password=hashed_password,
-            first_name=obj_in.first_name,
-            last_name=obj_in.last_name,
-            email=obj_in.email,
-        )
-        db.add(db_user)
-        await db.commit()
-        await db.refresh(db_user)
-        return db_user
+        # bcrypt takes ~100-300ms of CPU; the threadpool keeps the event loop serving meanwhile
+        async with deadline_stage("threadpool"):
+            hashed_password = await run_in_threadpool(get_password_hash, obj_in.password)
+        # The role is assigned by admins, never taken from the sign-up payload
+        return await super().create(db, {
+            **obj_in.model_dump(exclude={"password", "role"}),
+            "hashed_password": hashed_password,
+        })
 
     async def authenticate(
         self, db: AsyncSession, *, username: str, password: str
@@ -33,8 +77,10 @@ class CRUDUser:
         user = await self.get_by_username(db, username=username)
         if not user:
             return None
-        if not pwd_context.verify(password, user.hashed_password):
+        async with deadline_stage("threadpool"):
+            verified = await run_in_threadpool(verify_password, password, user.hashed_password)
+        if not verified:
             return None
         return user
 
-crud_user = CRUDUser()
\ No newline at end of file
+crud_user = CRUDUser()
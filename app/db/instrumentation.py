@@ -0,0 +1,83 @@
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+from app.core.metrics import DB_POOL_CONNECTIONS, DB_QUERY_DURATION
+from app.db.query_inspector import detect_n_plus_one, is_explaining, report_slow_query, statement_shape
+
+
+class RequestQueryStats:
+    """Statements executed while serving a single request."""
+
+    __slots__ = ("count", "duration", "statements")
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = {}
+
+    def finish(self, route: str):
+        shapes = {}
+        for statement, count in self.statements.items():
+            shape = statement_shape(statement)
+            shapes[shape] = shapes.get(shape, 0) + count
+        detect_n_plus_one(shapes, route)
+
+
+_request_query_stats: ContextVar[Optional[RequestQueryStats]] = ContextVar("request_query_stats", default=None)
+
+
+def start_request_stats() -> RequestQueryStats:
+    stats = RequestQueryStats()
+    _request_query_stats.set(stats)
+    return stats
+
+
+def current_request_stats() -> Optional[RequestQueryStats]:
+    return _request_query_stats.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_start_time = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - context._query_start_time
+    operation = statement.lstrip()[:6].upper()
+    DB_QUERY_DURATION.observe(duration, operation if operation in ("SELECT", "INSERT", "UPDATE", "DELETE") else "OTHER")
+
+    if is_explaining():
+        return
+
+    stats = _request_query_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.duration += duration
+        stats.statements[statement] = stats.statements.get(statement, 0) + 1
+
+    if duration * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS:
+        report_slow_query(conn, statement, parameters, duration)
+
+
+def _pool_stat(engine: AsyncEngine, name: str):
+    def read():
+        function = getattr(engine.sync_engine.pool, name, None)
+        return function() if callable(function) else None
+    return read
+
+
+def instrument_engine(engine: AsyncEngine):
+    sync_engine = engine.sync_engine
+    if event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+    DB_POOL_CONNECTIONS.set_function(_pool_stat(engine, "checkedout"), "checked_out")
+    DB_POOL_CONNECTIONS.set_function(_pool_stat(engine, "checkedin"), "checked_in")
+    DB_POOL_CONNECTIONS.set_function(_pool_stat(engine, "overflow"), "overflow")
+    DB_POOL_CONNECTIONS.set_function(_pool_stat(engine, "size"), "size")
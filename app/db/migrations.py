@@ -0,0 +1,339 @@
+"""
+Helpers for migrations that must not block a busy table.
+
+Postgres takes an ACCESS EXCLUSIVE lock for most DDL, and a statement waiting for that lock
+queues every later query on the table behind it. Migrations therefore run with a short
+`lock_timeout` (see alembic/env.py), build indexes `CONCURRENTLY` outside the migration
+transaction, and backfill data in small committed batches:
+
+    from app.db.migrations import backfill, create_index_concurrently, with_lock_retries
+
+    def upgrade():
+        create_index_concurrently("ix_orders_customer_id", "orders", ["customer_id"])
+        with_lock_retries(lambda: op.add_column("orders", sa.Column("note", sa.Text())))
+        backfill("orders", {"status": "open"}, where="status IS NULL")
+
+Everything here also works in offline (`alembic upgrade --sql`) mode. `lint_sql` reviews the
+offline script for operations that rewrite or lock a whole table:
+
+    python -m app.db.migrations lint --range head-1:head
+"""
+import argparse
+import io
+import logging
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.exc import DBAPIError
+
+from app.core.config import settings
+
+# Alembic's CLI only configures its own loggers; progress lines show up next to "Running upgrade ..."
+logger = logging.getLogger("alembic.runtime.migration")
+
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+# Offline mode never connects, so any Postgres URL selects the dialect the script is rendered for
+LINT_DATABASE_URL = "postgresql+asyncpg://lint@localhost/lint"
+
+LOCK_NOT_AVAILABLE = "55P03"
+_TIMEOUT = re.compile(r"^\d+\s*(us|ms|s|min|h)?$")
+# Marks the single UPDATE backfill() renders offline for databases without DO blocks, so the linter lets it through
+BACKFILL_MARKER = "/* backfill() */"
+
+
+def _is_postgres() -> bool:
+    return op.get_context().dialect.name == "postgresql"
+
+
+def _is_offline() -> bool:
+    return op.get_context().as_sql
+
+
+def _check_timeout(timeout: str) -> str:
+    if not _TIMEOUT.match(timeout):
+        raise ValueError(f"Invalid lock timeout {timeout!r}, expected e.g. '500ms' or '5s'")
+    return timeout
+
+
+@contextmanager
+def lock_timeout(timeout: str):
+    """Run the block with a different `lock_timeout`, then restore the configured one."""
+    if not _is_postgres():
+        yield
+        return
+    op.execute(f"SET lock_timeout = '{_check_timeout(timeout)}'")
+    try:
+        yield
+    finally:
+        op.execute(f"SET lock_timeout = '{_check_timeout(settings.MIGRATION_LOCK_TIMEOUT)}'")
+
+
+def _lock_timed_out(error: DBAPIError) -> bool:
+    code = getattr(error.orig, "pgcode", None) or getattr(error.orig, "sqlstate", None)
+    return code == LOCK_NOT_AVAILABLE or "lock timeout" in str(error.orig).lower()
+
+
+def with_lock_retries(operation: Callable[[], Any], attempts: int = 5, timeout: str = "2s", delay: float = 1.0):
+    """
+    Run `operation` (DDL that needs a brief exclusive lock) giving up on the lock after
+    `timeout` rather than stalling traffic, and retry with a growing pause in between.
+    Each attempt runs in a savepoint, so earlier steps of the migration are kept.
+    """
+    if not _is_postgres() or _is_offline():
+        with lock_timeout(timeout):
+            operation()
+        return
+    _check_timeout(timeout)
+    bind = op.get_bind()
+    for attempt in range(1, attempts + 1):
+        try:
+            with bind.begin_nested():
+                bind.exec_driver_sql(f"SET LOCAL lock_timeout = '{timeout}'")
+                operation()
+            break
+        except DBAPIError as error:
+            if not _lock_timed_out(error) or attempt == attempts:
+                raise
+            logger.warning(f"Lock not acquired within {timeout} (attempt {attempt}/{attempts}), retrying")
+            time.sleep(delay * attempt)
+    bind.exec_driver_sql(f"SET LOCAL lock_timeout = '{_check_timeout(settings.MIGRATION_LOCK_TIMEOUT)}'")
+
+
+def create_index_concurrently(name: str, table: str, columns: Sequence, **kwargs):
+    """
+    `CREATE INDEX CONCURRENTLY` on Postgres: reads and writes continue while the index builds.
+    It can't run inside a transaction, so the migration's transaction is committed first.
+    A build that failed half-way leaves an INVALID index behind, which is dropped and rebuilt.
+    Elsewhere this is a plain `op.create_index`.
+    """
+    if not _is_postgres():
+        op.create_index(name, table, columns, **kwargs)
+        return
+    with op.get_context().autocommit_block():
+        if not _is_offline():
+            invalid = op.get_bind().execute(sa.text(
+                "SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid "
+                "WHERE pg_class.relname = :name AND NOT pg_index.indisvalid"
+            ), {"name": name}).first()
+            if invalid:
+                logger.warning(f"Dropping invalid index {name} left by an interrupted build")
+                op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+        op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True, **kwargs)
+
+
+def drop_index_concurrently(name: str, table: str):
+    if not _is_postgres():
+        op.drop_index(name, table_name=table)
+        return
+    with op.get_context().autocommit_block():
+        op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+
+
+def _backfill_statement(table: str, values: Dict[str, Any], where: Optional[str], key: str, lower=None, upper=None):
+    target = sa.table(table, sa.column(key), *(sa.column(column) for column in values))
+    # sa.literal() types plain values, so they can be rendered inline in offline mode
+    statement = sa.update(target).values({
+        column: value if isinstance(value, sa.ClauseElement) else sa.literal(value) for column, value in values.items()
+    })
+    if lower is not None:
+        statement = statement.where(target.c[key] >= lower, target.c[key] < upper)
+    if where is not None:
+        statement = statement.where(sa.text(f"({where})"))
+    return statement
+
+
+def backfill(table: str, values: Dict[str, Any], where: str = None, key: str = "id",
+             batch_size: int = 5000, pause: float = 0.05):
+    """
+    `UPDATE table SET values [WHERE where]` in batches of `batch_size` rows by `key` (an
+    integer, indexed column), each committed on its own so row locks are held briefly and
+    autovacuum keeps up. `pause` seconds between batches leaves room for replicas and
+    regular traffic. Values may be Python literals or `sa.text(...)` expressions.
+    """
+    context = op.get_context()
+    if _is_offline():
+        if not _is_postgres():
+            sql = _backfill_statement(table, values, where, key).compile(
+                dialect=context.dialect, compile_kwargs={"literal_binds": True})
+            op.execute(f"{BACKFILL_MARKER} {sql}")
+            return
+        statement = _backfill_statement(table, values, where, key, sa.literal_column("lower_key"),
+                                        sa.literal_column("lower_key + batch_size"))
+        sql = statement.compile(dialect=context.dialect, compile_kwargs={"literal_binds": True})
+        with context.autocommit_block():
+            # A top-level DO block may COMMIT (Postgres 11+), so each batch is its own transaction
+            op.execute(
+                f"DO $$\n"
+                f"DECLARE lower_key bigint; upper_key bigint; batch_size bigint := {int(batch_size)};\n"
+                f"BEGIN\n"
+                f"  SELECT min({key}), max({key}) INTO lower_key, upper_key FROM {table};\n"
+                f"  WHILE lower_key <= upper_key LOOP\n"
+                f"    {sql};\n"
+                f"    COMMIT;\n"
+                f"    RAISE NOTICE 'backfill {table}: % of %', lower_key, upper_key;\n"
+                f"    PERFORM pg_sleep({float(pause)});\n"
+                f"    lower_key := lower_key + batch_size;\n"
+                f"  END LOOP;\n"
+                f"END $$"
+            )
+        return
+
+    with context.autocommit_block():
+        bind = op.get_bind()
+        target = sa.table(table, sa.column(key))
+        first, last = bind.execute(sa.select(sa.func.min(target.c[key]), sa.func.max(target.c[key]))).one()
+        if first is None:
+            return
+        started = reported = time.monotonic()
+        updated, lower = 0, first
+        while lower <= last:
+            upper = lower + batch_size
+            updated += bind.execute(_backfill_statement(table, values, where, key, lower, upper)).rowcount
+            lower = upper
+            now = time.monotonic()
+            if now - reported >= 5 or lower > last:
+                done = min(lower, last + 1) - first
+                elapsed = now - started
+                logger.info(
+                    f"Backfill {table}: {done / (last + 1 - first):.0%} of key range, "
+                    f"{updated} rows updated, {updated / elapsed if elapsed else 0:.0f} rows/s"
+                )
+                reported = now
+            if pause and lower <= last:
+                time.sleep(pause)
+
+
+class Finding:
+    """An operation in the offline migration script that locks or rewrites an existing table."""
+
+    __slots__ = ("revision", "rule", "statement")
+
+    def __init__(self, revision: Optional[str], rule: str, statement: str):
+        self.revision = revision
+        self.rule = rule
+        self.statement = statement
+
+    def __str__(self) -> str:
+        statement = self.statement if len(self.statement) <= 120 else f"{self.statement[:117]}..."
+        return f"{self.revision or '-'}: {self.rule}: {statement}"
+
+
+_REVISION = re.compile(r"^-- Running (?:upgrade|downgrade) \S* -> (\S+)")
+_CREATE_TABLE = re.compile(r"^CREATE TABLE (?:IF NOT EXISTS )?(\S+)", re.I)
+_TABLE_OF = re.compile(
+    r"^(?:ALTER TABLE (?:IF EXISTS )?(?:ONLY )?|CREATE (?:UNIQUE )?INDEX .*? ON (?:ONLY )?|"
+    r"(?:UPDATE|DELETE FROM|VACUUM FULL|CLUSTER|LOCK TABLE) )(\S+)", re.I,
+)
+_VOLATILE_DEFAULT = re.compile(r"DEFAULT\s+(?:now|clock_timestamp|random|gen_random_uuid|uuid_generate_v\d|nextval)\s*\(", re.I)
+
+# (rule, pattern that triggers it, pattern that makes it safe)
+RULES = [
+    ("index-without-concurrently", re.compile(r"^(CREATE (UNIQUE )?|DROP )INDEX\b", re.I), re.compile(r"\bCONCURRENTLY\b", re.I)),
+    ("add-not-null-column-without-default", re.compile(r"\bADD COLUMN\b.*\bNOT NULL\b", re.I), re.compile(r"\bDEFAULT\b", re.I)),
+    ("add-column-volatile-default", re.compile(r"\bADD COLUMN\b.*(\bSERIAL\b|\bBIGSERIAL\b|" + _VOLATILE_DEFAULT.pattern + ")", re.I), None),
+    ("alter-column-type", re.compile(r"\bALTER COLUMN \S+ (SET DATA )?TYPE\b", re.I), None),
+    ("set-not-null", re.compile(r"\bALTER COLUMN \S+ SET NOT NULL\b", re.I), None),
+    ("constraint-without-not-valid", re.compile(r"\bADD (CONSTRAINT \S+ )?(FOREIGN KEY|CHECK)\b", re.I), re.compile(r"\bNOT VALID\b", re.I)),
+    ("constraint-without-index", re.compile(r"\bADD (CONSTRAINT \S+ )?(UNIQUE|PRIMARY KEY)\b", re.I), re.compile(r"\bUSING INDEX\b", re.I)),
+    ("table-rewrite", re.compile(r"^(VACUUM FULL|CLUSTER)\b", re.I), None),
+    ("explicit-lock", re.compile(r"^LOCK TABLE\b", re.I), None),
+    ("unbatched-dml", re.compile(r"^(UPDATE|DELETE FROM)\b", re.I), None),
+]
+
+
+def split_statements(sql: str):
+    """`(revision, statement)` pairs from an offline script; `$$` bodies are kept whole."""
+    revision, current, quoted = None, [], False
+    for line in sql.splitlines():
+        if not quoted and not current:
+            match = _REVISION.match(line)
+            if match:
+                revision = match.group(1)
+            if not line.strip() or line.lstrip().startswith("--"):
+                continue
+        current.append(line)
+        if line.count("$$") % 2:
+            quoted = not quoted
+        if not quoted and line.rstrip().endswith(";"):
+            yield revision, " ".join(part.strip() for part in current).rstrip(";").strip()
+            current = []
+    if current:
+        yield revision, " ".join(part.strip() for part in current).strip()
+
+
+def lint_sql(sql: str) -> List[Finding]:
+    """
+    Flag statements in an offline migration script that rewrite a table or hold a lock
+    on it for longer than a moment. Tables created in the same revision are empty and
+    unused, so anything done to them is fine.
+    """
+    findings, created, current_revision = [], set(), None
+    for revision, statement in split_statements(sql):
+        if revision != current_revision:
+            current_revision, created = revision, set()
+        if statement.startswith(BACKFILL_MARKER):
+            continue
+        match = _CREATE_TABLE.match(statement)
+        if match:
+            created.add(match.group(1).strip('"').lower())
+            continue
+        match = _TABLE_OF.match(statement)
+        table = match.group(1).strip('"').lower() if match else None
+        if table is None or table in created or table == "alembic_version":
+            continue
+        for rule, trigger, safe in RULES:
+            if trigger.search(statement) and not (safe and safe.search(statement)):
+                findings.append(Finding(revision, rule, statement))
+    return findings
+
+
+def render_sql(revision_range: str = "base:heads", url: str = LINT_DATABASE_URL) -> str:
+    """The offline (`--sql`) script alembic would run for `revision_range`."""
+    from alembic import command
+    from alembic.config import Config
+
+    buffer = io.StringIO()
+    config = Config(str(ALEMBIC_INI), output_buffer=buffer)
+    config.set_main_option("script_location", str(ALEMBIC_INI.parent / "alembic"))
+    config.attributes["database_url"] = url
+    config.attributes["configure_logger"] = False
+    command.upgrade(config, revision_range, sql=True)
+    return buffer.getvalue()
+
+
+def lint_revisions(revision_range: str = "base:heads", url: str = LINT_DATABASE_URL) -> List[Finding]:
+    return lint_sql(render_sql(revision_range, url))
+
+
+def main(argv: Sequence[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.db.migrations")
+    commands = parser.add_subparsers(dest="command", required=True)
+    lint = commands.add_parser("lint", help="Dry-run migrations offline and flag table-locking operations")
+    lint.add_argument("--range", default=os.getenv("MIGRATION_LINT_RANGE", "base:heads"),
+                      help="Alembic revision range, e.g. head-1:head")
+    lint.add_argument("--url", default=LINT_DATABASE_URL, help="Database URL; only its dialect is used")
+    lint.add_argument("--show-sql", action="store_true", help="Print the rendered script too")
+    args = parser.parse_args(argv)
+
+    sql = render_sql(args.range, args.url)
+    if args.show_sql:
+        print(sql)
+    findings = lint_sql(sql)
+    for finding in findings:
+        print(finding)
+    if findings:
+        print(f"{len(findings)} operation(s) would lock or rewrite an existing table")
+        return 1
+    print("No table-locking operations found.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
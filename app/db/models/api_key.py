@@ -0,0 +1,21 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import JSON, Boolean, Column, DateTime, Integer, String
+from app.db.base_class import Base
+from app.db.base import Model
+
+
+class ApiKey(Base, Model):
+    __tablename__ = "api_keys"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # Public part of the key; lookups go through this index, the secret is only stored hashed
+    prefix = Column(String(16), unique=True, index=True, nullable=False)
+    key_hash = Column(String(64), nullable=False)
+    name = Column(String(255), nullable=False)
+    owner = Column(String(255), index=True)
+    scopes = Column(JSON, default=list)
+    rate_limit = Column(String(50))  # e.g. "100/minute"; empty means the default limit
+    is_active = Column(Boolean, default=True, nullable=False)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    expires_at = Column(DateTime(timezone=True))
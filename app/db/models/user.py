@@ -1,4 +1,5 @@
-from sqlalchemy import Column, String, Integer
+from sqlalchemy import Column, String, Integer, event, inspect
+from sqlalchemy.orm import Session
 from app.db.base_class import Base
 from app.db.base import Model
 
@@ -12,4 +13,32 @@ class User(Base, Model):
     last_name = Column(String(255), index=True)
     email = Column(String(255), index=True)
     hashed_password = Column(String(255))
-    role = Column(String(50), default="user", index=True)  # Added for RBAC
\ No newline at end of file
+    role = Column(String(50), default="user", index=True)  # Added for RBAC
+    # Bumped on every UPDATE; the ORM adds `WHERE version = <loaded>` so concurrent writes conflict
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
+    # Matched by CRUDBase.search; the trigram index in migration 5c71e0a9d2f4 covers these columns
+    __searchable__ = ("username", "first_name", "last_name", "email")
+
+
+@event.listens_for(User, "after_update")
+def _remember_role_change(mapper, connection, target):
+    if inspect(target).attrs.role.history.has_changes():
+        inspect(target).session.info.setdefault("role_changes", set()).add(target.username)
+
+
+@event.listens_for(Session, "after_commit")
+def _revoke_tokens_after_role_change(session):
+    # Access tokens embed the role's permission mask, so tokens issued before the change must stop working
+    usernames = session.info.pop("role_changes", None)
+    if usernames:
+        from app.core.token_store import token_store
+
+        for username in usernames:
+            token_store.revoke_subject_soon(username)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_role_changes(session):
+    session.info.pop("role_changes", None)
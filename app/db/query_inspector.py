@@ -0,0 +1,109 @@
+import os
+import re
+import sys
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Optional
+
+import greenlet
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.metrics import registry
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INTERNAL_FILES = (os.path.abspath(__file__), os.path.join(APP_DIR, "db", "instrumentation.py"))
+
+MAX_PARAMETERS_LENGTH = 500
+
+SLOW_QUERIES = registry.counter("db_slow_queries_total", "Statements slower than SLOW_QUERY_THRESHOLD_MS.", ("caller",))
+N_PLUS_ONE = registry.counter("db_n_plus_one_total", "Requests that repeated one statement shape N_PLUS_ONE_THRESHOLD times.", ("route",))
+
+# Collapses expanded IN lists / VALUES tuples so "IN (?, ?)" and "IN (?, ?, ?)" share a shape.
+_PLACEHOLDER_LIST = re.compile(r"\(\s*(?:\?|\$\d+|%s|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|\$\d+|%s|%\(\w+\)s|:\w+))+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+_explaining: ContextVar[bool] = ContextVar("query_inspector_explaining", default=False)
+
+
+@lru_cache(maxsize=1024)
+def statement_shape(statement: str) -> str:
+    return _PLACEHOLDER_LIST.sub("(?)", _WHITESPACE.sub(" ", statement.strip()))
+
+
+def find_caller() -> str:
+    """
+    Innermost app-level frame awaiting the statement (e.g. Model.get_single_object).
+
+    Async statements run inside a greenlet whose own frames stop at SQLAlchemy's
+    greenlet_spawn, so the walk starts from the suspended parent greenlet, whose
+    frame chain leads back through the awaiting coroutines. Only used for slow statements.
+    """
+    parent = greenlet.getcurrent().parent
+    frame = parent.gr_frame if parent is not None else sys._getframe(1)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename.startswith(APP_DIR) and filename not in INTERNAL_FILES:
+            return f"{os.path.relpath(filename, os.path.dirname(APP_DIR))}:{frame.f_code.co_qualname}"
+        frame = frame.f_back
+    return "unknown"
+
+
+def _format_parameters(parameters) -> str:
+    text = repr(parameters)
+    if len(text) > MAX_PARAMETERS_LENGTH:
+        text = text[:MAX_PARAMETERS_LENGTH] + "..."
+    return text
+
+
+def is_explaining() -> bool:
+    return _explaining.get()
+
+
+def explain(conn, statement: str, parameters) -> Optional[str]:
+    """Capture a plan for a slow SELECT; EXPLAIN ANALYZE executes it again, so this is dev-only."""
+    if _explaining.get() or not statement.lstrip().upper().startswith("SELECT"):
+        return None
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        prefix = "EXPLAIN (ANALYZE, BUFFERS) "
+    elif dialect == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN "
+    else:
+        return None
+
+    token = _explaining.set(True)
+    try:
+        rows = conn.exec_driver_sql(prefix + statement, parameters).fetchall()
+        return "\n".join(" ".join(str(column) for column in row) for row in rows)
+    except Exception as ex:
+        logger.warning(f"Could not capture plan for slow query: {str(ex)}")
+        return None
+    finally:
+        _explaining.reset(token)
+
+
+def report_slow_query(conn, statement: str, parameters, duration: float):
+    if _explaining.get():
+        return
+    caller = find_caller()
+    SLOW_QUERIES.inc(caller)
+    message = (
+        f"Slow query ({duration * 1000:.1f} ms) from {caller}: {statement_shape(statement)} "
+        f"parameters={_format_parameters(parameters)}"
+    )
+    if settings.QUERY_EXPLAIN_SLOW:
+        plan = explain(conn, statement, parameters)
+        if plan:
+            message += f"\nPlan:\n{plan}"
+    logger.warning(message)
+
+
+def detect_n_plus_one(shapes: dict, route: str):
+    threshold = settings.N_PLUS_ONE_THRESHOLD
+    if threshold <= 0:
+        return
+    for shape, count in shapes.items():
+        if count >= threshold:
+            N_PLUS_ONE.inc(route)
+            logger.warning(f"Possible N+1 on {route}: statement executed {count} times: {shape}")
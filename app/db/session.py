@@ -1,10 +1,95 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.orm import Session
 from app.core.config import settings
+from app.core.deadline import DEADLINES_EXCEEDED, DeadlineExceeded, check_deadline, deadline_stage, time_remaining
+from app.db.instrumentation import instrument_engine
+
+QUERY_CANCELED = "57014"
+
+_engine: Optional[AsyncEngine] = None
+_session_factory: Optional[async_sessionmaker] = None
+
+
+def get_engine() -> AsyncEngine:
+    """Create the engine on first use, so importing the app (or forking workers) opens nothing."""
+    global _engine
+    if _engine is None:
+        _engine = create_async_engine(settings.get_database_url, future=True)
+        instrument_engine(_engine)
+        event.listen(_engine.sync_engine, "handle_error", _statement_timed_out)
+    return _engine
+
+
+class DeadlineSession(Session):
+    """Session whose transactions can't run past the request deadline (see `app.core.deadline`)."""
+
+
+@event.listens_for(DeadlineSession, "after_begin")
+def _apply_statement_timeout(session, transaction, connection):
+    remaining = time_remaining()
+    if remaining is None:
+        return
+    check_deadline("transaction")
+    if connection.dialect.name == "postgresql":
+        # Enforced by the server, which cancels the statement and leaves the connection reusable
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {max(1, int(remaining * 1000))}")
+
 
-engine = create_async_engine(settings.get_database_url, future=True)
-async_session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+def _statement_timed_out(context):
+    code = getattr(context.original_exception, "pgcode", None) or getattr(context.original_exception, "sqlstate", None)
+    if code == QUERY_CANCELED and time_remaining() is not None:
+        DEADLINES_EXCEEDED.inc("statement")
+        raise DeadlineExceeded("statement") from context.sqlalchemy_exception
+
+
+def get_sessionmaker() -> async_sessionmaker:
+    global _session_factory
+    if _session_factory is None:
+        _session_factory = async_sessionmaker(
+            get_engine(), expire_on_commit=False, class_=AsyncSession, sync_session_class=DeadlineSession,
+        )
+    return _session_factory
+
+
+async def dispose_engine():
+    global _engine, _session_factory
+    if _engine is not None:
+        await _engine.dispose()
+    _engine = None
+    _session_factory = None
+
+
+def __getattr__(name: str):
+    # Backwards-compatible lazy aliases for the former module-level objects
+    if name == "engine":
+        return get_engine()
+    if name == "async_session":
+        return get_sessionmaker()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+@asynccontextmanager
+async def session_scope():
+    """
+    A session holding its connection for the whole block. The pool checkout happens up front,
+    bounded by the request deadline, so a request doesn't wait on an exhausted pool after
+    its client has given up.
+    """
+    session = get_sessionmaker()()
+    try:
+        async with deadline_stage("pool"):
+            await session.connection()
+        yield session
+    finally:
+        # Shielded so a cancelled request still returns its connection to the pool
+        await asyncio.shield(session.close())
 
 
 async def get_db():
-    async with async_session() as session:
+    async with session_scope() as session:
         yield session
@@ -1,5 +1,6 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from fastapi.security import OAuth2PasswordBearer
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError, ResponseValidationError
 from fastapi.responses import PlainTextResponse
@@ -8,38 +9,98 @@ from fastapi.responses import JSONResponse
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
+from starlette.concurrency import run_in_threadpool
 from app.core.custom_exception import CustomException
-from app.core.config import settings
-from app.api.v1 import auth
+from app.core.health import health_prober
+from app.core.keys import get_key_set
+from app.core.config import Settings, get_settings
+from app.core.logger_config import flush_logging, setup_logging, shutdown_logging
+from app.core.metrics import PROMETHEUS_CONTENT_TYPE, registry
+from app.core.profiler import loop_monitor
+from app.core.shutdown import shutdown
+from app.core.shared_counters import SharedMemoryStorage  # noqa: F401 - registers the shm:// limiter storage
+from app.core.task_queue import task_queue
+from app.core.token_store import token_store
+from app.db.session import dispose_engine, get_engine
+from app.middleware.compression import CompressionMiddleware
+from app.middleware.deadline import DeadlineMiddleware
+from app.middleware.load_shedding import AdaptiveConcurrencyLimit, LoadSheddingMiddleware
+from app.middleware.metrics import MetricsMiddleware
+from app.api.v1 import api_keys, auth, users
+from app.utils.redis_cache import redis_cache
 from fastapi.responses import FileResponse
 import os
 
+INDEX_HTML = os.path.join("app/api/templates", "index.html")
+
+# Storage comes from RATELIMIT_STORAGE_URL; `app.server` selects shm:// so workers share counters
 limiter = Limiter(key_func=get_remote_address)
 
-app = FastAPI(title="Smart Valuation", description="Async FastAPI Starter Kit with JWT, Alembic, SQLAlchemy, Email, Logging, Rate Limiting, and more.")
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=settings.CORS_ALLOW_ORIGINS,
-    allow_credentials=settings.CORS_ALLOW_CREDENTIALS,
-    allow_methods=settings.CORS_ALLOW_METHODS,
-    allow_headers=settings.CORS_ALLOW_HEADERS,
-)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings = app.state.settings
+    setup_logging(settings.LOG_DIR)
+    shutdown.reset()
+    get_engine()
+    if settings.LOOP_LAG_MONITOR_ENABLED:
+        loop_monitor.start()
+    await token_store.start()
+    await task_queue.start()
+    await health_prober.start()
+    try:
+        yield
+    finally:
+        # uvicorn has already drained the connections. Logs first (critical records queue alert
+        # emails), then the task queue, and only then the pools everything above was using
+        shutdown.begin_drain()
+        async with shutdown.phase("logs"):
+            await run_in_threadpool(flush_logging)
+        async with shutdown.phase("health_prober"):
+            await health_prober.stop()
+        async with shutdown.phase("tasks"):
+            await task_queue.stop(settings.TASK_QUEUE_DRAIN_TIMEOUT)
+        async with shutdown.phase("token_store"):
+            await token_store.stop()
+        async with shutdown.phase("loop_monitor"):
+            await loop_monitor.stop()
+        async with shutdown.phase("redis"):
+            await redis_cache.close()
+        async with shutdown.phase("database"):
+            await dispose_engine()
+        shutdown.report()
+        shutdown.finish()
+        shutdown_logging()
 
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
-@app.get("/", response_class=FileResponse, include_in_schema=False)
 async def read_root():
-    return FileResponse(os.path.join("app/api/templates", "index.html"))
+    return FileResponse(INDEX_HTML)
+
 
-@app.get("/health", tags=["Health"], summary="Health Check", description="Returns API health status.")
 async def health_check():
     return {"status": "healthy"}
 
-app.include_router(auth.router, prefix="/v1/auth", tags=["auth"])
 
-@app.exception_handler(CustomException)
+async def liveness():
+    # Only says the process still serves requests; restarting it won't fix a broken dependency
+    return {"status": "alive"}
+
+
+async def readiness():
+    # Served from the prober's last snapshot, so probe traffic never reaches the database
+    snapshot = {"ready": False, "detail": "shutting down"} if shutdown.draining else health_prober.readiness()
+    return JSONResponse(snapshot, status_code=200 if snapshot["ready"] else 503, headers={"Cache-Control": "no-store"})
+
+
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+async def jwks():
+    # Public keys only; edge services cache this and verify tokens without calling us
+    return JSONResponse(get_key_set().jwks(), headers={"Cache-Control": "public, max-age=300"})
+
+
 async def custom_exception_handler(request, exc: CustomException):
     return JSONResponse(
         status_code=exc.error_code,
@@ -47,16 +108,96 @@ async def custom_exception_handler(request, exc: CustomException):
     )
 
 
-@app.exception_handler(StarletteHTTPException)
 async def http_exception_handler(request, exc):
     return PlainTextResponse(str(exc.detail), status_code=exc.status_code)
 
 
-@app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request, exc):
     return PlainTextResponse(str(exc), status_code=400)
 
 
-@app.exception_handler(ResponseValidationError)
-async def validation_exception_handler(request, exc):
-    return PlainTextResponse(str(exc), status_code=400)
+def create_app(settings: Settings = None) -> FastAPI:
+    """
+    Build the application. Nothing here opens connections, files or threads; engines,
+    the Redis pool, log listeners and monitors are created and released by `lifespan`.
+    """
+    settings = settings or get_settings()
+    app = FastAPI(title="Smart Valuation", description="Async FastAPI Starter Kit with JWT, Alembic, SQLAlchemy, Email, Logging, Rate Limiting, and more.", lifespan=lifespan)
+    app.state.settings = settings
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=settings.CORS_ALLOW_ORIGINS,
+        allow_credentials=settings.CORS_ALLOW_CREDENTIALS,
+        allow_methods=settings.CORS_ALLOW_METHODS,
+        allow_headers=settings.CORS_ALLOW_HEADERS,
+    )
+
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+        threadpool_threshold=settings.COMPRESSION_THREADPOOL_THRESHOLD,
+        encodings=settings.COMPRESSION_ENCODINGS,
+    )
+
+    if settings.PROFILING_ENABLED:
+        from app.middleware.profiling import ProfilingMiddleware
+        app.add_middleware(ProfilingMiddleware)
+
+    if settings.METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware)
+
+    app.add_middleware(
+        DeadlineMiddleware, default_timeout=settings.REQUEST_TIMEOUT, min_timeout=settings.REQUEST_TIMEOUT_MIN,
+    )
+
+    if settings.LOAD_SHEDDING_ENABLED:
+        # Outermost, so a shed request costs as little as possible
+        app.add_middleware(
+            LoadSheddingMiddleware,
+            limiter=AdaptiveConcurrencyLimit(
+                initial=settings.LOAD_SHEDDING_INITIAL_LIMIT,
+                min_limit=settings.LOAD_SHEDDING_MIN_LIMIT,
+                max_limit=settings.LOAD_SHEDDING_MAX_LIMIT,
+                tolerance=settings.LOAD_SHEDDING_LATENCY_TOLERANCE,
+                backoff=settings.LOAD_SHEDDING_BACKOFF,
+            ),
+            exempt_paths=settings.LOAD_SHEDDING_EXEMPT_PATHS,
+            expensive_paths=settings.LOAD_SHEDDING_EXPENSIVE_PATHS,
+            low_priority_share=settings.LOAD_SHEDDING_LOW_PRIORITY_SHARE,
+            retry_after=settings.LOAD_SHEDDING_RETRY_AFTER,
+        )
+
+    app.state.limiter = limiter
+    app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+
+    app.get("/", response_class=FileResponse, include_in_schema=False)(read_root)
+    app.get("/health", tags=["Health"], summary="Health Check", description="Returns API health status.")(health_check)
+    app.get("/health/live", tags=["Health"], summary="Liveness", description="200 while the process is serving requests.")(liveness)
+    app.get(
+        "/health/ready", tags=["Health"], summary="Readiness",
+        description="200 when the database, Redis (if used), the connection pool and the event loop are healthy, else 503.",
+    )(readiness)
+
+    if settings.METRICS_ENABLED:
+        app.get("/metrics", include_in_schema=False)(metrics)
+
+    app.get("/.well-known/jwks.json", include_in_schema=False)(jwks)
+
+    app.include_router(auth.router, prefix="/v1/auth", tags=["auth"])
+    app.include_router(api_keys.router, prefix="/v1/api-keys", tags=["api-keys"])
+    app.include_router(users.router, prefix="/v1/users", tags=["users"])
+
+    if settings.PROFILING_ENABLED:
+        from app.api.v1 import debug
+        app.include_router(debug.router, prefix="/v1/debug", tags=["debug"])
+
+    app.add_exception_handler(CustomException, custom_exception_handler)
+    app.add_exception_handler(StarletteHTTPException, http_exception_handler)
+    app.add_exception_handler(RequestValidationError, validation_exception_handler)
+    app.add_exception_handler(ResponseValidationError, validation_exception_handler)
+
+    return app
+
+
+app = create_app()
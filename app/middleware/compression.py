@@ -0,0 +1,324 @@
+import gzip
+import threading
+import zlib
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+ZSTD_LEVEL = 3
+
+# Server-side preference when the client weighs several encodings equally.
+SUPPORTED_ENCODINGS = ("br", "zstd", "gzip")
+
+# Content that is already compressed gains nothing from another pass.
+EXCLUDED_CONTENT_TYPES = (
+    "image/",
+    "video/",
+    "audio/",
+    "font/woff",
+    "application/zip",
+    "application/gzip",
+    "application/x-gzip",
+    "application/x-bzip2",
+    "application/x-7z-compressed",
+    "application/x-rar-compressed",
+    "application/zstd",
+    "application/pdf",
+    "application/octet-stream",
+)
+COMPRESSIBLE_IMAGE_TYPES = ("image/svg+xml",)
+
+SKIP_STATUS_CODES = {204, 206, 304}
+
+
+def available_encodings() -> tuple:
+    encodings = ["gzip"]
+    if brotli is not None:
+        encodings.append("br")
+    if zstandard is not None:
+        encodings.append("zstd")
+    return tuple(encoding for encoding in SUPPORTED_ENCODINGS if encoding in encodings)
+
+
+@lru_cache(maxsize=256)
+def select_encoding(accept_encoding: str, offered: tuple) -> Optional[str]:
+    """Pick the best encoding from an Accept-Encoding header, honouring q-values."""
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip()
+        if not token:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[token] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in offered:
+        quality = weights.get(encoding, weights.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def is_compressible(content_type: str) -> bool:
+    content_type = content_type.lower()
+    if content_type.startswith(COMPRESSIBLE_IMAGE_TYPES):
+        return True
+    return not content_type.startswith(EXCLUDED_CONTENT_TYPES)
+
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class StreamEncoder:
+    """Incremental encoder that flushes after every chunk so streamed data reaches the client promptly."""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        elif encoding == "zstd":
+            self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, chunk: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(chunk) + self._compressor.flush()
+        if self.encoding == "zstd":
+            return self._compressor.compress(chunk) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+class CompressedBodyCache:
+    """
+    LRU of compressed bodies, so unchanged static payloads are compressed once.
+
+    ETags are only unique per URL (FileResponse builds them from mtime and size), so entries
+    are keyed by method, path, query, ETag and encoding. Responses marked `private` or
+    `no-store` are never cached, since their body can differ per caller under the same URL.
+    """
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(method: str, path: str, query: bytes, etag: str) -> tuple:
+        return method, path, query, etag
+
+    def get(self, key: tuple, encoding: str) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get((key, encoding))
+            if body is not None:
+                self._entries.move_to_end((key, encoding))
+            return body
+
+    def put(self, key: tuple, encoding: str, body: bytes):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[(key, encoding)] = body
+            self._entries.move_to_end((key, encoding))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def precompress(self, path: str, etag: str, body: bytes, encodings: tuple = None):
+        """Compress a static asset served by `GET path` ahead of its first request."""
+        key = self.key("GET", path, b"", etag)
+        for encoding in encodings or available_encodings():
+            if self.get(key, encoding) is None:
+                self.put(key, encoding, compress_body(body, encoding))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+compressed_cache = CompressedBodyCache(max_entries=settings.COMPRESSION_CACHE_SIZE)
+
+
+class CompressionMiddleware:
+    def __init__(
+            self,
+            app: ASGIApp,
+            minimum_size: int = 500,
+            threadpool_threshold: int = 256 * 1024,
+            encodings: list = None,
+            cache: CompressedBodyCache = compressed_cache,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.threadpool_threshold = threadpool_threshold
+        offered = available_encodings()
+        if encodings:
+            offered = tuple(encoding for encoding in offered if encoding in encodings)
+        self.encodings = offered
+        self.cache = cache
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = Headers(scope=scope).get("accept-encoding", "")
+        encoding = select_encoding(accept_encoding, self.encodings) if accept_encoding else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = CompressionResponder(self, encoding, send, scope)
+        await self.app(scope, receive, responder.send)
+
+
+class CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send, scope: Scope = None):
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self.scope = scope or {}
+        self.start_message: Optional[Message] = None
+        self.passthrough = False
+        self.started = False
+        self.buffer = []
+        self.buffered_size = 0
+        self.encoder: Optional[StreamEncoder] = None
+
+    async def send(self, message: Message):
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            self.start_message = message
+            headers = Headers(raw=message["headers"])
+            self.passthrough = (
+                    message["status"] in SKIP_STATUS_CODES
+                    or "content-encoding" in headers
+                    or not is_compressible(headers.get("content-type", ""))
+            )
+            return
+
+        if message_type != "http.response.body":
+            await self._flush_start()
+            await self._send(message)
+            return
+
+        if self.passthrough:
+            await self._flush_start()
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.encoder is not None:
+            await self._send_stream_chunk(body, more_body)
+            return
+
+        self.buffer.append(body)
+        self.buffered_size += len(body)
+        if more_body and self.buffered_size < self.middleware.minimum_size:
+            return
+
+        body = b"".join(self.buffer)
+        self.buffer = []
+        if not more_body:
+            await self._send_whole(body)
+        else:
+            self.encoder = StreamEncoder(self.encoding)
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            self._mark_encoded(headers)
+            del headers["content-length"]
+            await self._flush_start()
+            await self._send_stream_chunk(body, more_body)
+
+    async def _send_whole(self, body: bytes):
+        if len(body) < self.middleware.minimum_size:
+            await self._flush_start()
+            await self._send({"type": "http.response.body", "body": body})
+            return
+
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        key = self._cache_key(headers)
+        compressed = self.middleware.cache.get(key, self.encoding) if key else None
+        if compressed is None:
+            compressed = await self._compress(body)
+            if key:
+                self.middleware.cache.put(key, self.encoding, compressed)
+
+        self._mark_encoded(headers)
+        headers["content-length"] = str(len(compressed))
+        await self._flush_start()
+        await self._send({"type": "http.response.body", "body": compressed})
+
+    def _cache_key(self, headers: MutableHeaders) -> Optional[tuple]:
+        etag = headers.get("etag")
+        cache_control = headers.get("cache-control", "").lower()
+        if not etag or "private" in cache_control or "no-store" in cache_control:
+            return None
+        return CompressedBodyCache.key(
+            self.scope.get("method", "GET"), self.scope.get("path", ""), self.scope.get("query_string", b""), etag,
+        )
+
+    async def _send_stream_chunk(self, body: bytes, more_body: bool):
+        if len(body) >= self.middleware.threadpool_threshold:
+            chunk = await run_in_threadpool(self.encoder.compress, body)
+        else:
+            chunk = self.encoder.compress(body)
+        if not more_body:
+            chunk += self.encoder.finish()
+        await self._send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+    async def _compress(self, body: bytes) -> bytes:
+        if len(body) >= self.middleware.threadpool_threshold:
+            return await run_in_threadpool(compress_body, body, self.encoding)
+        return compress_body(body, self.encoding)
+
+    def _mark_encoded(self, headers: MutableHeaders):
+        headers["content-encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            # The representation differs from the identity one, so a strong validator no longer applies.
+            headers["etag"] = f"W/{etag}"
+
+    async def _flush_start(self):
+        if not self.started:
+            self.started = True
+            await self._send(self.start_message)
@@ -0,0 +1,35 @@
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.deadline import CLIENT_DEADLINE, DEADLINE_HEADER, end_deadline, parse_timeout, start_deadline
+
+
+class DeadlineMiddleware:
+    """
+    Gives each request `default_timeout` seconds. Callers that will give up sooner say so in
+    the `X-Request-Timeout` header (e.g. `1.5` or `1500ms`); the header can only shorten the
+    deadline, and not below `min_timeout`. Routes tighten it further with
+    `Depends(request_deadline(seconds))`. A shortened deadline is flagged in the scope under
+    `CLIENT_DEADLINE`, so load shedding doesn't read the resulting `504`s as overload.
+    """
+
+    def __init__(self, app: ASGIApp, default_timeout: float = 10.0, min_timeout: float = 0.1):
+        self.app = app
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timeout = parse_timeout(Headers(scope=scope).get(DEADLINE_HEADER))
+        if timeout is not None and timeout < self.default_timeout:
+            timeout = max(timeout, min(self.min_timeout, self.default_timeout))
+            scope[CLIENT_DEADLINE] = True
+        else:
+            timeout = self.default_timeout
+        token = start_deadline(timeout)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            end_deadline(token)
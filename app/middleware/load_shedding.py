@@ -0,0 +1,146 @@
+import time
+from typing import Dict, Iterable, Optional
+
+from starlette.responses import PlainTextResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.deadline import CLIENT_DEADLINE
+from app.core.metrics import registry
+from app.middleware.metrics import route_template
+
+REQUESTS_SHED = registry.counter("http_requests_shed_total", "Requests rejected with 503 by load shedding.", ("priority",))
+CONCURRENCY_LIMIT = registry.gauge("http_concurrency_limit", "Current adaptive limit on in-flight requests.")
+REQUESTS_ADMITTED = registry.gauge("http_requests_admitted", "Requests currently counted against the concurrency limit.")
+
+EXEMPT = "exempt"
+NORMAL = "normal"
+LOW = "low"
+
+# Statuses that mean a dependency (DB pool, upstream) is already saturated
+OVERLOAD_STATUSES = frozenset({503, 504})
+
+
+class AdaptiveConcurrencyLimit:
+    """
+    AIMD limit on in-flight requests, driven by latency.
+
+    Each route keeps a baseline (its fastest recent latency, drifting up slowly so it follows
+    real changes in cost) and a smoothed current latency. Comparing the two per route means a
+    bcrypt-bound login and a cached read are judged against themselves. While latency stays
+    within `tolerance` times the baseline and the limit is in use, the limit grows by about one
+    per round trip; once requests start queueing it is cut by `backoff`, at most once per round
+    trip so a single slow burst doesn't collapse it.
+    """
+
+    BASELINE_DRIFT = 0.01
+    SMOOTHING = 0.2
+
+    def __init__(self, initial: int = 50, min_limit: int = 8, max_limit: int = 1000,
+                 tolerance: float = 2.0, backoff: float = 0.9):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.in_flight = 0
+        self._baselines: Dict[str, float] = {}
+        self._latencies: Dict[str, float] = {}
+        self._last_decrease = 0.0
+
+    def try_acquire(self, share: float = 1.0) -> bool:
+        """Admit a request if fewer than `share` of the limit are in flight."""
+        if self.in_flight >= max(1, int(self.limit * share)):
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self, route: str, latency: Optional[float], overloaded: bool = False):
+        """Count a finished request; with `latency` None it isn't used as a sample at all."""
+        self.in_flight -= 1
+        if latency is None:
+            return
+        baseline = self._baselines.get(route)
+        if baseline is None or latency < baseline:
+            baseline = latency
+        else:
+            baseline += (latency - baseline) * self.BASELINE_DRIFT
+        self._baselines[route] = baseline
+        smoothed = self._latencies.get(route, latency)
+        smoothed += (latency - smoothed) * self.SMOOTHING
+        self._latencies[route] = smoothed
+
+        if overloaded or smoothed > baseline * self.tolerance:
+            now = time.monotonic()
+            if now - self._last_decrease >= smoothed:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._last_decrease = now
+        elif (self.in_flight + 1) * 2 >= self.limit:
+            # Only grow while the limit is actually being used, or it drifts up unchecked when idle
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+
+class LoadSheddingMiddleware:
+    """
+    Rejects requests beyond the adaptive concurrency limit with an immediate `503` and
+    `Retry-After`, instead of letting them queue on the DB pool and the password-hashing
+    threads until every request is slow.
+
+    `exempt_paths` (and anything below them) bypass the limit: health checks and metrics
+    must answer precisely when the service is struggling. `expensive_paths` (login and
+    registration, which hash passwords) may only use `low_priority_share` of the limit, so
+    they are shed first and cheap requests such as token verification keep flowing.
+    """
+
+    def __init__(self, app: ASGIApp, limiter: AdaptiveConcurrencyLimit = None,
+                 exempt_paths: Iterable[str] = ("/health", "/metrics", "/.well-known/jwks.json"),
+                 expensive_paths: Iterable[str] = ("/v1/auth/token", "/v1/auth/register"),
+                 low_priority_share: float = 0.5, retry_after: int = 1):
+        self.app = app
+        self.limiter = limiter or AdaptiveConcurrencyLimit()
+        self.exempt_paths = tuple(path.rstrip("/") for path in exempt_paths if path)
+        self.expensive_paths = frozenset(path.rstrip("/") for path in expensive_paths if path)
+        self.low_priority_share = low_priority_share
+        self.retry_after = retry_after
+        CONCURRENCY_LIMIT.set_function(lambda: self.limiter.limit)
+        REQUESTS_ADMITTED.set_function(lambda: self.limiter.in_flight)
+
+    def priority(self, path: str) -> str:
+        path = path.rstrip("/") or "/"
+        if any(path == exempt or path.startswith(exempt + "/") for exempt in self.exempt_paths):
+            return EXEMPT
+        return LOW if path in self.expensive_paths else NORMAL
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        priority = self.priority(scope["path"])
+        if priority == EXEMPT:
+            await self.app(scope, receive, send)
+            return
+        if not self.limiter.try_acquire(self.low_priority_share if priority == LOW else 1.0):
+            REQUESTS_SHED.inc(priority)
+            response = PlainTextResponse(
+                "Server is overloaded, retry later", status_code=503, headers={"Retry-After": str(self.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if status_code == 504 and scope.get(CLIENT_DEADLINE):
+                # Timed out on a deadline the client shortened: says nothing about our capacity or latency
+                self.limiter.release(route_template(scope), None)
+            else:
+                latency = time.perf_counter() - start
+                self.limiter.release(route_template(scope), latency, status_code in OVERLOAD_STATUSES)
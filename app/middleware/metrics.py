@@ -0,0 +1,55 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.metrics import (
+    DB_QUERIES_PER_REQUEST,
+    DB_TIME_PER_REQUEST,
+    HTTP_REQUEST_DURATION,
+    HTTP_REQUESTS,
+    HTTP_REQUESTS_IN_PROGRESS,
+)
+from app.db.instrumentation import start_request_stats
+
+UNMATCHED_ROUTE = "unmatched"
+
+
+def route_template(scope: Scope) -> str:
+    """Route path template (e.g. /items/{id}) so label cardinality stays bounded."""
+    route = scope.get("route")
+    return getattr(route, "path", UNMATCHED_ROUTE)
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        stats = start_request_stats()
+        HTTP_REQUESTS_IN_PROGRESS.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            HTTP_REQUESTS_IN_PROGRESS.dec()
+            route = route_template(scope)
+            method = scope["method"]
+            HTTP_REQUEST_DURATION.observe(duration, method, route)
+            HTTP_REQUESTS.inc(method, route, str(status_code))
+            DB_QUERIES_PER_REQUEST.observe(stats.count, route)
+            if stats.count:
+                DB_TIME_PER_REQUEST.observe(stats.duration, route)
+                stats.finish(route)
@@ -0,0 +1,59 @@
+import threading
+
+from fastapi import HTTPException
+from starlette.datastructures import Headers
+from starlette.responses import PlainTextResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.api.api_key_auth import authorize_api_key
+from app.core.profiler import SamplingProfiler
+
+PROFILE_HEADER = "x-profile"
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a single request when it carries `X-Profile: 1` and an `X-API-Key` with the
+    `debug` scope.
+
+    The collapsed stacks replace the response body; the original status is kept in
+    `X-Profile-Status`. Samples cover the whole event loop thread, so concurrent
+    requests show up too — profile against a quiet worker.
+    """
+
+    def __init__(self, app: ASGIApp, interval: float = 0.001):
+        self.app = app
+        self.interval = interval
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        if headers.get(PROFILE_HEADER) not in ("1", "true"):
+            await self.app(scope, receive, send)
+            return
+        try:
+            app = scope.get("app")
+            limiter = getattr(app.state, "limiter", None) if app is not None else None
+            await authorize_api_key(headers.get("x-api-key"), ("debug",), limiter)
+        except HTTPException as exc:
+            await PlainTextResponse(str(exc.detail), status_code=exc.status_code)(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def discard(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+
+        profiler = SamplingProfiler(threading.get_ident(), self.interval)
+        profiler.start()
+        try:
+            await self.app(scope, receive, discard)
+        finally:
+            collapsed = profiler.stop()
+
+        response = PlainTextResponse(collapsed, headers={"X-Profile-Status": str(status_code)})
+        await response(scope, receive, send)
@@ -0,0 +1,25 @@
+from datetime import datetime
+from typing import List, Optional
+
+from limits import parse
+from pydantic import BaseModel, Field, field_validator
+
+
+class ApiKeyCreate(BaseModel):
+    name: str = Field(max_length=255)
+    owner: Optional[str] = Field(default=None, max_length=255)
+    scopes: List[str] = []
+    rate_limit: Optional[str] = None  # limits notation, e.g. "100/minute"
+    expires_at: Optional[datetime] = None
+
+    @field_validator("rate_limit")
+    @classmethod
+    def check_rate_limit(cls, value: Optional[str]) -> Optional[str]:
+        if value:
+            parse(value)
+        return value
+
+
+class ApiKeyCreated(ApiKeyCreate):
+    prefix: str
+    key: str  # shown once; only its hash is stored
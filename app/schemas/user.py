@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic import BaseModel, ConfigDict
 
 
@@ -14,6 +16,13 @@ class UserCreate(UserBase):
     role: str = "user"  # Added for RBAC
 
 
+class UserUpdate(BaseModel):
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    email: Optional[str] = None
+    role: Optional[str] = None
+
+
 class User(UserBase):
     model_config = ConfigDict(from_attributes=True, extra='ignore')
     id: int
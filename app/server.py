@@ -0,0 +1,299 @@
+"""
+Pre-fork server: import and warm the application once, then fork workers that share the
+warmed memory copy-on-write and accept connections from one listening socket.
+
+    python -m app.server --workers 4 --host 0.0.0.0 --port 8000
+
+Workers that die are replaced (with backoff if they crash on boot). SIGTERM/SIGINT are
+forwarded so every worker drains and runs its lifespan shutdown; a second signal kills them.
+With `--drain-delay`, workers first fail readiness and keep serving for that many seconds.
+Workers still running once the drain delay, `--graceful-timeout` and the lifespan shutdown's
+own budget have passed are killed.
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import sys
+import time
+import traceback
+from typing import Dict, List, Optional
+
+import uvicorn
+
+logger = logging.getLogger("uvicorn.error")
+
+MIN_WORKER_UPTIME = 1.0
+MAX_RESTART_DELAY = 30.0
+KILL_MARGIN = 5.0
+
+
+def default_workers() -> int:
+    if os.getenv("WEB_CONCURRENCY"):
+        return int(os.getenv("WEB_CONCURRENCY"))
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def warm_up(app) -> Dict[str, float]:
+    """
+    Do the lazy, once-per-process work up front so each worker inherits it instead of paying
+    for it on its first requests. Opens no connections, files or threads.
+
+    Returns the time spent per step in milliseconds.
+    """
+    from sqlalchemy import select
+    from sqlalchemy.engine import make_url
+    from sqlalchemy.orm import configure_mappers
+    from starlette.responses import FileResponse
+
+    from app.core.keys import get_key_set
+    from app.core.security import pwd_context
+    from app.db.base_class import Base
+    from app.main import INDEX_HTML
+    from app.middleware.compression import available_encodings, compressed_cache
+
+    settings = app.state.settings
+    timings = {}
+
+    start = time.perf_counter()
+    configure_mappers()
+    dialect = make_url(settings.get_database_url).get_dialect()()
+    for mapper in Base.registry.mappers:
+        select(mapper.class_).compile(dialect=dialect)
+    timings["statements"] = time.perf_counter() - start
+
+    # Builds the pydantic schemas for every route model and caches the OpenAPI document
+    start = time.perf_counter()
+    app.openapi()
+    timings["openapi"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pwd_context.handler("bcrypt").get_backend()
+    timings["password_backend"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    get_key_set()
+    timings["signing_keys"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if os.path.exists(INDEX_HTML):
+        etag = FileResponse(INDEX_HTML, stat_result=os.stat(INDEX_HTML)).headers["etag"]
+        with open(INDEX_HTML, "rb") as index:
+            body = index.read()
+        encodings = tuple(e for e in available_encodings() if e in settings.COMPRESSION_ENCODINGS)
+        compressed_cache.precompress("/", etag, body, encodings)
+    timings["static_assets"] = time.perf_counter() - start
+
+    return {step: round(seconds * 1000, 2) for step, seconds in timings.items()}
+
+
+class WorkerServer(uvicorn.Server):
+    """
+    A uvicorn server that also shuts down when the supervising parent goes away.
+
+    With a `drain_delay`, the first SIGTERM only fails readiness: the worker keeps serving for
+    that long so load balancers stop routing to it before its socket closes. A second signal
+    stops it right away.
+    """
+
+    def __init__(self, config: uvicorn.Config, parent_pid: int, drain_delay: float = 0.0):
+        super().__init__(config)
+        self.parent_pid = parent_pid
+        self.drain_delay = drain_delay
+        self.drain_until: Optional[float] = None
+
+    def handle_exit(self, sig: int, frame) -> None:
+        from app.core.shutdown import shutdown
+
+        shutdown.begin_drain()
+        if self.drain_delay > 0 and self.drain_until is None and not self.should_exit:
+            self.drain_until = time.monotonic() + self.drain_delay
+            # uvicorn re-raises captured signals once it has stopped, as it would without the delay
+            self._captured_signals.append(sig)
+            return
+        super().handle_exit(sig, frame)
+
+    async def on_tick(self, counter: int) -> bool:
+        if counter % 10 == 0 and os.getppid() != self.parent_pid:
+            self.should_exit = True
+        if self.drain_until is not None and time.monotonic() >= self.drain_until:
+            self.should_exit = True
+        return await super().on_tick(counter)
+
+
+class Supervisor:
+    def __init__(self, config: uvicorn.Config, sockets: List, workers: int, graceful_timeout: float,
+                 drain_delay: float = 0.0, lifespan_timeout: float = 0.0):
+        self.config = config
+        self.sockets = sockets
+        self.size = workers
+        self.graceful_timeout = graceful_timeout
+        self.drain_delay = drain_delay
+        self.lifespan_timeout = lifespan_timeout
+        self.workers: Dict[int, float] = {}  # pid -> start time
+        self.pid = os.getpid()
+        self.stopping = False
+        self.kill_deadline = 0.0
+        self.restart_delay = 0.0
+        self.next_spawn = 0.0
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                WorkerServer(self.config, self.pid, self.drain_delay).run(sockets=self.sockets)
+            except BaseException:
+                traceback.print_exc()
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+        self.workers[pid] = time.monotonic()
+        logger.info(f"Started worker {pid}")
+
+    def handle_exit(self, signum, frame):
+        if self.stopping:
+            self.signal_all(signal.SIGKILL)
+            return
+        logger.info(f"Received {signal.Signals(signum).name}, stopping {len(self.workers)} workers")
+        self.stopping = True
+        # uvicorn drains connections for graceful_timeout, and only then runs the lifespan shutdown
+        self.kill_deadline = (
+            time.monotonic() + self.drain_delay + self.graceful_timeout + self.lifespan_timeout + KILL_MARGIN
+        )
+        self.signal_all(signal.SIGTERM)
+
+    def signal_all(self, signum: int):
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            started = self.workers.pop(pid, None)
+            if started is None or self.stopping:
+                continue
+            logger.warning(f"Worker {pid} exited ({describe_status(status)}), starting a replacement")
+            if time.monotonic() - started < MIN_WORKER_UPTIME:
+                self.restart_delay = min(max(self.restart_delay * 2, 0.5), MAX_RESTART_DELAY)
+            else:
+                self.restart_delay = 0.0
+            self.next_spawn = time.monotonic() + self.restart_delay
+
+    def run(self) -> int:
+        signal.signal(signal.SIGTERM, self.handle_exit)
+        signal.signal(signal.SIGINT, self.handle_exit)
+        for _ in range(self.size):
+            self.spawn()
+
+        while self.workers or not self.stopping:
+            self.reap()
+            now = time.monotonic()
+            if self.stopping:
+                if now > self.kill_deadline:
+                    logger.warning(f"Killing {len(self.workers)} workers that did not stop in time")
+                    self.signal_all(signal.SIGKILL)
+                    self.kill_deadline = float("inf")
+            elif len(self.workers) < self.size and now >= self.next_spawn:
+                self.spawn()
+            time.sleep(0.1)
+        logger.info("All workers stopped")
+        return 0
+
+
+def describe_status(status: int) -> str:
+    if os.WIFSIGNALED(status):
+        return f"signal {signal.Signals(os.WTERMSIG(status)).name}"
+    return f"exit code {os.waitstatus_to_exitcode(status)}"
+
+
+def per_worker_backends(settings) -> List[str]:
+    """Settings whose `memory` backend breaks when requests are spread over several workers."""
+    # A refresh reaching another worker than the login would be rejected, and revocations
+    # (logout, role changes) would only apply on the worker that handled them. A retry with an
+    # Idempotency-Key reaching another worker would run a second time.
+    names = ("TOKEN_STORE_BACKEND", "IDEMPOTENCY_BACKEND")
+    return [name for name in names if getattr(settings, name) == "memory"]
+
+
+def lifespan_shutdown_timeout(settings) -> float:
+    """Longest the lifespan shutdown waits on its own: the log flush, then the task queue drain."""
+    from app.core.logger_config import FLUSH_TIMEOUT
+
+    return FLUSH_TIMEOUT + settings.TASK_QUEUE_DRAIN_TIMEOUT
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the API with pre-forked uvicorn workers.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=default_workers(), help="Defaults to WEB_CONCURRENCY or the usable CPU count")
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument(
+        "--graceful-timeout", type=float, default=None,
+        help="Seconds a worker waits for in-flight requests on shutdown (default: SHUTDOWN_TIMEOUT)",
+    )
+    parser.add_argument(
+        "--drain-delay", type=float, default=None,
+        help="Seconds workers keep serving with readiness failing after SIGTERM (default: SHUTDOWN_DRAIN_DELAY)",
+    )
+    parser.add_argument(
+        "--allow-per-worker-state", action="store_true",
+        help="Start several workers even with memory backends (benchmarks and tests only)",
+    )
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--proxy-headers", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    # Must be chosen before the limiter is built so its counters live in shared memory
+    os.environ.setdefault("RATELIMIT_STORAGE_URL", "shm://")
+
+    from app.main import app
+
+    settings = app.state.settings
+    graceful_timeout = args.graceful_timeout if args.graceful_timeout is not None else settings.SHUTDOWN_TIMEOUT
+    config = uvicorn.Config(
+        app, host=args.host, port=args.port, backlog=args.backlog, log_level=args.log_level,
+        proxy_headers=args.proxy_headers, timeout_graceful_shutdown=graceful_timeout,
+    )
+    per_worker = per_worker_backends(settings)
+    if args.workers > 1 and per_worker:
+        if not args.allow_per_worker_state:
+            logger.error(
+                f"{', '.join(per_worker)} keep state in each worker, so requests would see a different store depending "
+                f"on which worker they reach; set them to redis or run with --workers 1"
+            )
+            return 2
+        logger.warning(f"{', '.join(per_worker)} keep state per worker (--allow-per-worker-state)")
+    timings = warm_up(app)
+    logger.info(f"Warmed up in {sum(timings.values()):.1f} ms {timings}")
+
+    sock = config.bind_socket()
+    # Keep the warmed objects out of the workers' GC passes, which would otherwise touch
+    # (and so copy) every page they live on
+    gc.collect()
+    gc.freeze()
+    drain_delay = args.drain_delay if args.drain_delay is not None else settings.SHUTDOWN_DRAIN_DELAY
+    return Supervisor(
+        config, [sock], args.workers, graceful_timeout, drain_delay, lifespan_shutdown_timeout(settings),
+    ).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+import hashlib
+import math
+
+
+class BloomFilter:
+    """
+    Fixed-size bloom filter over strings: membership tests cost k bit lookups regardless of how
+    many items were added, with no false negatives and roughly `error_rate` false positives
+    while fewer than `capacity` items are stored.
+    """
+
+    def __init__(self, capacity: int = 100_000, error_rate: float = 0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        # Kirsch-Mitzenmacher: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        for index in range(self.hash_count):
+            yield (first + index * second) % self.size
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def saturated(self) -> bool:
+        return self.count > self.capacity
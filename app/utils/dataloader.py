@@ -0,0 +1,82 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, Iterable, List, Optional
+
+from app.core.metrics import registry
+
+LOADER_BATCH_SIZE = registry.histogram(
+    "dataloader_batch_size", "Keys fetched per batched query.", ("loader",), buckets=(1, 2, 5, 10, 20, 50, 100, 200)
+)
+LOADER_LOADS = registry.counter("dataloader_loads_total", "Loader lookups by how they were served.", ("loader", "result"))
+
+
+class DataLoader:
+    """
+    Coalesces concurrent single-key lookups into one batched query.
+
+    Keys requested within `window` seconds (by default: the same event loop iteration) are
+    fetched together by `batch_fn`, which takes a list of keys and returns a dict of the ones
+    it found. A key already being fetched is not fetched again; its callers share the result.
+    Nothing is cached once a batch completes, so results are never staler than the query.
+    """
+
+    def __init__(self, batch_fn: Callable[[List[Hashable]], Awaitable[Dict]], name: str = "default",
+                 window: float = 0.0, max_batch_size: int = 100):
+        self.batch_fn = batch_fn
+        self.name = name
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self._pending: Dict[Hashable, asyncio.Future] = {}
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._timer: Optional[asyncio.Handle] = None
+
+    async def load(self, key: Hashable):
+        future = self._inflight.get(key) or self._pending.get(key)
+        if future is not None:
+            LOADER_LOADS.inc(self.name, "coalesced")
+        else:
+            LOADER_LOADS.inc(self.name, "batched")
+            future = self._enqueue(key)
+        # Shielded: one caller giving up must not cancel the lookup for the others
+        return await asyncio.shield(future)
+
+    async def load_many(self, keys: Iterable[Hashable]) -> List:
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def _enqueue(self, key: Hashable) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending[key] = future
+        if len(self._pending) >= self.max_batch_size:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._dispatch) if self.window > 0 else loop.call_soon(self._dispatch)
+        return future
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            self._inflight.update(batch)
+            asyncio.get_running_loop().create_task(self._run(batch))
+
+    async def _run(self, batch: Dict[Hashable, asyncio.Future]):
+        LOADER_BATCH_SIZE.observe(len(batch), self.name)
+        try:
+            results = await self.batch_fn(list(batch))
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for key, future in batch.items():
+                if not future.done():
+                    future.set_result(results.get(key))
+        finally:
+            for key, future in batch.items():
+                if self._inflight.get(key) is future:
+                    del self._inflight[key]
+                # Nobody awaited it (all callers cancelled): don't log "exception never retrieved"
+                if future.done() and not future.cancelled():
+                    future.exception()
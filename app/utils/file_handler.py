@@ -1,9 +1,10 @@
 import os
 import uuid
 from fastapi import UploadFile
-import aiofiles
 
 async def save_upload_file(upload_file: UploadFile, destination_dir: str) -> str:
+    import aiofiles
+
     os.makedirs(destination_dir, exist_ok=True)
     filename = f"{uuid.uuid4()}_{upload_file.filename}"
     file_path = os.path.join(destination_dir, filename)
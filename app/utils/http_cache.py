@@ -0,0 +1,199 @@
+import hashlib
+import hmac
+import json
+from typing import Callable, Optional
+
+from fastapi import Request, Response
+from starlette.responses import StreamingResponse
+
+from app.api.routing import add_route_wrapper
+from app.core.logger import logger
+
+CACHE_KEY_PREFIX = "http_cache"
+
+
+def make_etag(body: bytes) -> str:
+    return f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_from_version(resource: str, *parts) -> str:
+    """
+    Build a weak ETag from row version columns without hashing the body, e.g.
+    `etag_from_version("users", user.id, user.version)`. `resource` keeps rows of different
+    tables that share an id and version from getting the same validator.
+    """
+    return make_etag(":".join(str(part) for part in (resource, *parts)).encode())
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+
+def not_modified_since(request: Request, etag: str) -> Optional[Response]:
+    """
+    A `304` for handlers that know their ETag before building the body, e.g. from
+    `etag_from_version`; return it straight away when not None. `cache_response` adds its
+    Cache-Control to it.
+    """
+    if not etag_matches(request.headers.get("if-none-match", ""), etag):
+        return None
+    return Response(status_code=304, headers={"etag": etag})
+
+
+def principal_of(request: Request) -> str:
+    credentials = request.headers.get("authorization") or request.headers.get("x-api-key") or ""
+    if not credentials:
+        return "anonymous"
+    return hashlib.blake2b(credentials.encode(), digest_size=16).hexdigest()
+
+
+class CachePolicy:
+    def __init__(self, max_age: int = 0, private: bool = True, must_revalidate: bool = True, store_ttl: int = 0):
+        """
+        Args:
+            max_age: Seconds a client may reuse the response without revalidating
+            private: Mark the response as user-specific so shared caches don't store it
+            must_revalidate: Require revalidation with the ETag once max_age has passed
+            store_ttl: Seconds to keep the rendered body in Redis (0 disables the server-side store)
+        """
+        self.max_age = max_age
+        self.private = private
+        self.store_ttl = store_ttl
+        directives = ["private" if private else "public", f"max-age={max_age}"]
+        if must_revalidate:
+            directives.append("must-revalidate")
+        self.cache_control = ", ".join(directives)
+
+    def cache_key(self, request: Request) -> str:
+        query = "&".join(sorted(request.url.query.split("&"))) if request.url.query else ""
+        return f"{CACHE_KEY_PREFIX}:{principal_of(request)}:{request.url.path}?{query}"
+
+    def apply_headers(self, response: Response, etag: str):
+        response.headers["etag"] = etag
+        response.headers["cache-control"] = self.cache_control
+        if self.private:
+            response.headers.add_vary_header("Authorization")
+
+    def not_modified(self, etag: str) -> Response:
+        response = Response(status_code=304)
+        self.apply_headers(response, etag)
+        return response
+
+
+async def credentials_still_valid(request: Request) -> bool:
+    """
+    Stored bodies are replayed without running the endpoint's dependencies, so check what
+    they would have: the bearer token is unexpired and not revoked, or the API key is active.
+    """
+    from app.api.api_key_auth import API_KEY
+    from app.core.api_keys import api_key_store
+    from app.core.security import verify_token
+    from app.core.token_store import token_store
+
+    authorization = request.headers.get("authorization")
+    if authorization:
+        scheme, _, token = authorization.partition(" ")
+        payload = verify_token(token) if scheme.lower() == "bearer" else None
+        if not payload or payload.get("type") == "refresh" or payload.get("sub") is None:
+            return False
+        return not await token_store.is_revoked(payload)
+    api_key = request.headers.get("x-api-key")
+    if api_key:
+        if hmac.compare_digest(api_key.encode(), API_KEY.encode()):
+            return True
+        return await api_key_store.authenticate(api_key) is not None
+    return True
+
+
+async def _load_entry(key: str) -> Optional[dict]:
+    from app.utils.redis_cache import redis_cache
+
+    try:
+        raw = await redis_cache.get(key)
+    except Exception as ex:
+        logger.warning(f"Response cache lookup failed for {key}: {str(ex)}")
+        return None
+    return json.loads(raw) if raw else None
+
+
+async def _store_entry(key: str, response: Response, etag: str, ttl: int):
+    from app.utils.redis_cache import redis_cache
+
+    entry = {
+        "etag": etag,
+        "status": response.status_code,
+        "media_type": response.media_type,
+        "body": response.body.decode("latin-1"),
+    }
+    try:
+        await redis_cache.set(key, json.dumps(entry), expire=ttl)
+    except Exception as ex:
+        logger.warning(f"Response cache store failed for {key}: {str(ex)}")
+
+
+def cache_response(max_age: int = 0, private: bool = True, must_revalidate: bool = True, store_ttl: int = 0):
+    """
+    Endpoint decorator adding ETag/conditional GET handling (requires a router using AppRoute).
+
+    A handler may set its own ETag (e.g. from etag_from_version) through an injected
+    Response; otherwise a weak ETag is computed from the rendered body. Either way the
+    If-None-Match check happens after the handler has run and its body is serialized, so
+    a `304` saves bandwidth but not the rendering, unless the handler returns
+    `not_modified_since(request, etag)` before building the body. With store_ttl,
+    rendered bodies are kept in Redis keyed by principal + path + query, so a repeat
+    request is answered without running the endpoint or its dependencies. The token's
+    signature, expiry and revocation (or the API key) are still checked first, but nothing
+    else the dependencies look at, such as the user's current role, so keep `store_ttl` short.
+    """
+    policy = CachePolicy(max_age=max_age, private=private, must_revalidate=must_revalidate, store_ttl=store_ttl)
+
+    def wrap(handler: Callable) -> Callable:
+        async def cached_handler(request: Request) -> Response:
+            if request.method != "GET":
+                return await handler(request)
+
+            if_none_match = request.headers.get("if-none-match", "")
+            key = policy.cache_key(request) if policy.store_ttl else None
+            if key and not await credentials_still_valid(request):
+                # Let the endpoint's own dependencies reject the request
+                key = None
+            if key:
+                entry = await _load_entry(key)
+                if entry:
+                    if etag_matches(if_none_match, entry["etag"]):
+                        return policy.not_modified(entry["etag"])
+                    response = Response(
+                        content=entry["body"].encode("latin-1"),
+                        status_code=entry["status"],
+                        media_type=entry["media_type"],
+                    )
+                    policy.apply_headers(response, entry["etag"])
+                    return response
+
+            response = await handler(request)
+            if response.status_code == 304 and "etag" in response.headers:
+                # The handler answered from its own version ETag via not_modified_since
+                policy.apply_headers(response, response.headers["etag"])
+                return response
+            if response.status_code != 200 or isinstance(response, StreamingResponse):
+                return response
+
+            etag = response.headers.get("etag") or make_etag(response.body)
+            if key:
+                await _store_entry(key, response, etag, policy.store_ttl)
+            if etag_matches(if_none_match, etag):
+                return policy.not_modified(etag)
+            policy.apply_headers(response, etag)
+            return response
+
+        return cached_handler
+
+    def decorator(endpoint: Callable) -> Callable:
+        return add_route_wrapper(endpoint, wrap)
+
+    return decorator
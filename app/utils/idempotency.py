@@ -0,0 +1,274 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.responses import PlainTextResponse
+from starlette.responses import StreamingResponse
+
+from app.api.routing import add_route_wrapper
+from app.core.config import settings
+from app.core.deadline import deadline_stage
+from app.core.logger import logger
+from app.core.metrics import registry
+from app.utils.http_cache import principal_of
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+KEY_PREFIX = "idempotency"
+MAX_KEY_LENGTH = 255
+# Recomputed when the body is replayed
+_SKIPPED_HEADERS = frozenset({"content-length"})
+
+IDEMPOTENT_REQUESTS = registry.counter(
+    "idempotent_requests_total", "Requests carrying an Idempotency-Key, by outcome.", ("outcome",)
+)
+
+
+class MemoryIdempotencyBackend:
+    """
+    Per-process backend; concurrent duplicates wait on an event instead of polling.
+
+    Entries are kept in the order they were last written. Each `acquire` drops expired ones
+    from the front and, past `max_entries`, the oldest ones, so keys that are never retried
+    don't pile up.
+    """
+
+    def __init__(self, max_entries: int = None):
+        self.max_entries = max_entries if max_entries is not None else settings.IDEMPOTENCY_MAX_ENTRIES
+        self._entries: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self._done: Dict[str, asyncio.Event] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _set(self, key: str, record: dict, ttl: float):
+        self._entries[key] = (time.monotonic() + ttl, record)
+        self._entries.move_to_end(key)
+
+    def _sweep(self):
+        now = time.monotonic()
+        while self._entries:
+            key, (expires_at, _) = next(iter(self._entries.items()))
+            if expires_at > now and len(self._entries) < self.max_entries:
+                break
+            del self._entries[key]
+
+    def _live(self, key: str) -> Optional[dict]:
+        expires_at, record = self._entries.get(key, (0, None))
+        if expires_at <= time.monotonic():
+            self._entries.pop(key, None)
+            return None
+        return record
+
+    async def get(self, key: str) -> Optional[dict]:
+        return self._live(key)
+
+    async def acquire(self, key: str, fingerprint: str, ttl: float) -> bool:
+        if self._live(key) is not None:
+            return False
+        self._sweep()
+        self._set(key, {"state": "running", "fingerprint": fingerprint}, ttl)
+        self._done[key] = asyncio.Event()
+        return True
+
+    async def complete(self, key: str, record: dict, ttl: float):
+        self._set(key, record, ttl)
+        self._wake(key)
+
+    async def release(self, key: str):
+        self._entries.pop(key, None)
+        self._wake(key)
+
+    def _wake(self, key: str):
+        event = self._done.pop(key, None)
+        if event is not None:
+            event.set()
+
+    async def wait(self, key: str) -> Optional[dict]:
+        event = self._done.get(key)
+        if event is not None:
+            await event.wait()
+        return self._live(key)
+
+
+class RedisIdempotencyBackend:
+    """Shared by all workers: the lock is `SET NX` with the lock TTL, so a crashed holder can't block a key forever."""
+
+    POLL_INTERVAL = 0.05
+    MAX_POLL_INTERVAL = 0.5
+
+    async def _redis(self):
+        from app.utils.redis_cache import redis_cache
+
+        return await redis_cache.get_redis()
+
+    async def get(self, key: str) -> Optional[dict]:
+        raw = await (await self._redis()).get(key)
+        return json.loads(raw) if raw else None
+
+    async def acquire(self, key: str, fingerprint: str, ttl: float) -> bool:
+        record = json.dumps({"state": "running", "fingerprint": fingerprint})
+        return bool(await (await self._redis()).set(key, record, nx=True, px=int(ttl * 1000)))
+
+    async def complete(self, key: str, record: dict, ttl: float):
+        await (await self._redis()).set(key, json.dumps(record), px=int(ttl * 1000))
+
+    async def release(self, key: str):
+        await (await self._redis()).delete(key)
+
+    async def wait(self, key: str) -> Optional[dict]:
+        interval = self.POLL_INTERVAL
+        while True:
+            record = await self.get(key)
+            if record is None or record["state"] != "running":
+                return record
+            await asyncio.sleep(interval)
+            interval = min(interval * 2, self.MAX_POLL_INTERVAL)
+
+
+class IdempotencyStore:
+    def __init__(self, backend=None):
+        self._backend = backend
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            if settings.IDEMPOTENCY_BACKEND == "redis":
+                self._backend = RedisIdempotencyBackend()
+            else:
+                self._backend = MemoryIdempotencyBackend()
+        return self._backend
+
+
+idempotency_store = IdempotencyStore()
+
+
+def fingerprint_of(request: Request, body: bytes) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (request.method, request.url.path, request.url.query, request.headers.get("content-type", "")):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    digest.update(body)
+    return digest.hexdigest()
+
+
+def _record(response: Response, fingerprint: str) -> dict:
+    return {
+        "state": "done",
+        "fingerprint": fingerprint,
+        "status": response.status_code,
+        "headers": [
+            [name.decode("latin-1"), value.decode("latin-1")]
+            for name, value in response.raw_headers if name.decode("latin-1").lower() not in _SKIPPED_HEADERS
+        ],
+        "body": response.body.decode("latin-1"),
+    }
+
+
+def _replay(record: dict) -> Response:
+    response = Response(content=record["body"].encode("latin-1"), status_code=record["status"])
+    response.raw_headers = [
+        (name.encode("latin-1"), value.encode("latin-1")) for name, value in record["headers"]
+    ] + [(b"content-length", str(len(response.body)).encode())]
+    response.headers[REPLAYED_HEADER] = "true"
+    return response
+
+
+def scope_of(request: Request) -> str:
+    """Whose key space a key lives in: the caller's credentials, or the client address for anonymous callers."""
+    principal = principal_of(request)
+    if principal == "anonymous":
+        return f"anonymous@{request.client.host if request.client else 'unknown'}"
+    return principal
+
+
+def _error(status_code: int, detail: str, **headers) -> Response:
+    return PlainTextResponse(detail, status_code=status_code, headers=headers)
+
+
+def idempotent(ttl: float = None, lock_ttl: float = None, required: bool = False, store: IdempotencyStore = None):
+    """
+    Endpoint decorator honouring the `Idempotency-Key` header (requires a router using AppRoute).
+
+    The first request with a key runs normally and its response is kept for `ttl` seconds;
+    retries with the same key and the same request get that response back, marked with
+    `Idempotent-Replayed: true`, without resolving dependencies or running the endpoint. A
+    retry that arrives while the first is still running waits for it rather than running
+    twice. Reusing a key for a different request is a `422`. Keys are scoped to the caller's
+    credentials (to the client address for anonymous callers), which aren't re-validated on
+    replay, so don't use this on responses carrying secrets. `5xx` responses and exceptions aren't kept, so a retry runs again.
+
+    `lock_ttl` bounds how long a crashed or stuck request holds the key.
+    """
+    def wrap(handler: Callable) -> Callable:
+        async def idempotent_handler(request: Request) -> Response:
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not key:
+                if required:
+                    return _error(400, f"{IDEMPOTENCY_HEADER} header is required")
+                return await handler(request)
+            if len(key) > MAX_KEY_LENGTH:
+                return _error(400, f"{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters")
+
+            backend = (store or idempotency_store).backend
+            record_ttl = ttl if ttl is not None else settings.IDEMPOTENCY_TTL
+            running_ttl = lock_ttl if lock_ttl is not None else settings.IDEMPOTENCY_LOCK_TTL
+            scoped_key = f"{KEY_PREFIX}:{scope_of(request)}:{request.method}:{request.url.path}:{key}"
+            # Read once here; Starlette caches it on the request, so the endpoint still sees it
+            fingerprint = fingerprint_of(request, await request.body())
+
+            try:
+                record = await backend.get(scoped_key)
+                acquired = record is None and await backend.acquire(scoped_key, fingerprint, running_ttl)
+            except Exception as ex:
+                # Same as a request without the header: better than failing every write while the store is down
+                logger.warning(f"Idempotency store unavailable for {scoped_key}: {str(ex)}")
+                return await handler(request)
+            if acquired:
+                try:
+                    response = await handler(request)
+                except BaseException:
+                    await backend.release(scoped_key)
+                    raise
+                if response.status_code >= 500 or isinstance(response, StreamingResponse):
+                    await backend.release(scoped_key)
+                    return response
+                try:
+                    await backend.complete(scoped_key, _record(response, fingerprint), record_ttl)
+                except Exception as ex:
+                    logger.warning(f"Idempotency store failed for {scoped_key}: {str(ex)}")
+                IDEMPOTENT_REQUESTS.inc("executed")
+                return response
+
+            if record is not None and record["fingerprint"] != fingerprint:
+                IDEMPOTENT_REQUESTS.inc("mismatch")
+                return _error(422, f"{IDEMPOTENCY_HEADER} was already used for a different request")
+            if record is None or record["state"] == "running":
+                # A duplicate arrived while the first is running: wait for its response instead of running twice
+                async with deadline_stage("idempotency"):
+                    try:
+                        record = await asyncio.wait_for(backend.wait(scoped_key), running_ttl)
+                    except TimeoutError:
+                        record = None
+                if record is None or record["state"] == "running":
+                    # The first attempt failed (nothing was kept) or is still going; the client retries later
+                    IDEMPOTENT_REQUESTS.inc("conflict")
+                    return _error(409, "A request with this Idempotency-Key is in progress", **{"Retry-After": "1"})
+                if record["fingerprint"] != fingerprint:
+                    IDEMPOTENT_REQUESTS.inc("mismatch")
+                    return _error(422, f"{IDEMPOTENCY_HEADER} was already used for a different request")
+                IDEMPOTENT_REQUESTS.inc("coalesced")
+            else:
+                IDEMPOTENT_REQUESTS.inc("replayed")
+            return _replay(record)
+
+        return idempotent_handler
+
+    def decorator(endpoint: Callable) -> Callable:
+        return add_route_wrapper(endpoint, wrap)
+
+    return decorator
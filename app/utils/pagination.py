@@ -1,24 +1,170 @@
-from typing import List, TypeVar, Generic
-from pydantic.generics import GenericModel
-
-T = TypeVar('T')
-
-class PaginatedResponse(GenericModel, Generic[T]):
-    items: List[T]
-    total: int
-    page: int
-    size: int
-    pages: int
-
-def paginate(items: List[T], page: int, size: int) -> PaginatedResponse[T]:
-    total = len(items)
-    pages = (total + size - 1) // size
-    start = (page - 1) * size
-    end = start + size
-    return PaginatedResponse(
-        items=items[start:end],
-        total=total,
-        page=page,
-        size=size,
-        pages=pages
-    )
+"""
+Pagination done by the database: only one page of rows (plus one, to learn whether another
+page follows) is ever loaded. Totals cost a second `COUNT(*)` query, so they are only
+computed when the caller asks for them.
+
+    @router.get("", response_model=PaginatedResponse[UserSchema])
+    async def list_users(request: Request, cursor: str = None, db: AsyncSession = Depends(get_db)):
+        return await paginate_keyset(db, select(User), request, order_by=[(User.id, True)], cursor=cursor)
+
+Offset paging (`paginate`) allows jumping to page N but gets slower the deeper the page;
+keyset paging (`paginate_keyset`) costs the same on every page and is what list endpoints
+should use.
+"""
+import base64
+import json
+from typing import Any, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+from pydantic import BaseModel
+from sqlalchemy import Select, and_, false, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import Request
+
+T = TypeVar("T")
+
+
+class PaginatedResponse(BaseModel, Generic[T]):
+    results: List[T]
+    count: Optional[int] = None  # Total rows; None unless the caller asked for it
+    next: Optional[str] = None
+    previous: Optional[str] = None
+
+
+class Page(Generic[T]):
+    """One page of rows as loaded from the database."""
+
+    __slots__ = ("items", "has_next", "has_previous", "count", "next_cursor")
+
+    def __init__(self, items: List[T], has_next: bool, has_previous: bool,
+                 count: Optional[int] = None, next_cursor: Optional[str] = None):
+        self.items = items
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.count = count
+        self.next_cursor = next_cursor
+
+
+def encode_keyset(values: Sequence[Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode()).decode().rstrip("=")
+
+
+def decode_keyset(cursor: str, size: int) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+async def count_rows(db: AsyncSession, statement: Select) -> int:
+    """`COUNT(*)` over `statement` with its ordering and paging stripped."""
+    subquery = statement.order_by(None).limit(None).offset(None).subquery()
+    return (await db.execute(select(func.count()).select_from(subquery))).scalar_one()
+
+
+async def fetch_page(db: AsyncSession, statement: Select, page: int = 1, per_page: int = 10,
+                     with_count: bool = False) -> Page:
+    """`LIMIT per_page + 1 OFFSET (page - 1) * per_page`; the extra row only tells whether there is a next page."""
+    if page < 1 or per_page < 1:
+        raise ValueError("page and per_page must be positive")
+    result = await db.execute(statement.limit(per_page + 1).offset((page - 1) * per_page))
+    items = list(result.scalars().all())
+    count = await count_rows(db, statement) if with_count else None
+    return Page(items[:per_page], has_next=len(items) > per_page, has_previous=page > 1, count=count)
+
+
+def _nullable(column) -> bool:
+    """Whether `column` may hold NULL; expressions that don't say are assumed to."""
+    return bool(getattr(getattr(column, "expression", column), "nullable", True))
+
+
+def _sort(column, ascending: bool):
+    clause = column.asc() if ascending else column.desc()
+    # SQLite and Postgres disagree on where NULLs go by default, so say it whenever there can be any
+    return clause.nulls_last() if _nullable(column) else clause
+
+
+def _after(order_by: Sequence[Tuple[Any, bool]], values: Sequence[Any]):
+    """Rows strictly after `values` in `order_by` order (directions may differ per column, NULLs sort last)."""
+    clauses = []
+    for index, (column, ascending) in enumerate(order_by):
+        equal = [prior.is_(None) if value is None else prior == value
+                 for (prior, _), value in zip(order_by[:index], values)]
+        value = values[index]
+        if value is None:
+            after = false()  # NULLs come last: nothing follows on this column
+        else:
+            after = column > value if ascending else column < value
+            if _nullable(column):
+                after = or_(after, column.is_(None))
+        clauses.append(and_(*equal, after))
+    return or_(*clauses)
+
+
+def _valid_key(column, value) -> bool:
+    if value is None:
+        return _nullable(column)
+    return isinstance(value, column.type.python_type)
+
+
+async def fetch_keyset_page(db: AsyncSession, statement: Select, order_by: Sequence[Tuple[Any, bool]],
+                            cursor: str = None, per_page: int = 10, with_count: bool = False) -> Page:
+    """
+    Rows after `cursor` in `order_by` order, found through the index instead of skipping rows.
+    `order_by` is `[(Model.column, ascending), ...]` and must end with a unique, non-null column
+    (usually the primary key) so no two rows share a position; its values must be JSON-encodable.
+    Nullable columns sort their NULLs last in either direction, and a NULL key is `null` in the cursor.
+    """
+    if per_page < 1:
+        raise ValueError("per_page must be positive")
+    order_by = list(order_by)
+    paged = statement
+    if cursor:
+        values = decode_keyset(cursor, len(order_by))
+        # A forged cursor with the wrong types would otherwise fail in the database, not here
+        if not all(_valid_key(column, value) for (column, _), value in zip(order_by, values)):
+            raise ValueError("Invalid cursor")
+        paged = paged.where(_after(order_by, values))
+    paged = paged.order_by(*(_sort(column, ascending) for column, ascending in order_by))
+    result = await db.execute(paged.limit(per_page + 1))
+    items = list(result.scalars().all())
+    has_next = len(items) > per_page
+    items = items[:per_page]
+    next_cursor = None
+    if has_next:
+        next_cursor = encode_keyset([getattr(items[-1], column.key) for column, _ in order_by])
+    count = await count_rows(db, statement) if with_count else None
+    return Page(items, has_next=has_next, has_previous=bool(cursor), count=count, next_cursor=next_cursor)
+
+
+def page_links(request: Request, page: int, has_next: bool) -> Tuple[Optional[str], Optional[str]]:
+    """Next/previous URLs: the request URL with only `page` replaced."""
+    next_url = str(request.url.include_query_params(page=page + 1)) if has_next else None
+    if page <= 1:
+        previous_url = None
+    elif page == 2:
+        previous_url = str(request.url.remove_query_params("page"))
+    else:
+        previous_url = str(request.url.include_query_params(page=page - 1))
+    return next_url, previous_url
+
+
+async def paginate(db: AsyncSession, statement: Select, request: Request, page: int = 1, per_page: int = 10,
+                   with_count: bool = False) -> PaginatedResponse:
+    result = await fetch_page(db, statement, page, per_page, with_count)
+    next_url, previous_url = page_links(request, page, result.has_next)
+    return PaginatedResponse(results=result.items, count=result.count, next=next_url, previous=previous_url)
+
+
+async def paginate_keyset(db: AsyncSession, statement: Select, request: Request,
+                          order_by: Sequence[Tuple[Any, bool]], cursor: str = None, per_page: int = 10,
+                          with_count: bool = False) -> PaginatedResponse:
+    return keyset_response(request, await fetch_keyset_page(db, statement, order_by, cursor, per_page, with_count))
+
+
+def keyset_response(request: Request, page: Page) -> PaginatedResponse:
+    """Keyset pages link forward only, so `previous` is always None."""
+    next_url = str(request.url.include_query_params(cursor=page.next_cursor)) if page.has_next else None
+    return PaginatedResponse(results=page.items, count=page.count, next=next_url)
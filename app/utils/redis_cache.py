@@ -1,24 +1,42 @@
-import aioredis
 import os
 from fastapi import Depends
 
+from app.core.deadline import deadline_stage
+
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 
+
+def _redis_client_module():
+    # Imported on first use so workers that never touch Redis don't pay for the client
+    try:
+        from redis import asyncio as aioredis
+    except ImportError:
+        import aioredis
+    return aioredis
+
+
 class RedisCache:
     def __init__(self):
         self.redis = None
 
     async def get_redis(self):
         if not self.redis:
-            self.redis = await aioredis.from_url(REDIS_URL, decode_responses=True)
+            self.redis = await _redis_client_module().from_url(REDIS_URL, decode_responses=True)
         return self.redis
 
     async def get(self, key: str):
-        redis = await self.get_redis()
-        return await redis.get(key)
+        async with deadline_stage("redis"):
+            redis = await self.get_redis()
+            return await redis.get(key)
 
     async def set(self, key: str, value: str, expire: int = 3600):
-        redis = await self.get_redis()
-        await redis.set(key, value, ex=expire)
+        async with deadline_stage("redis"):
+            redis = await self.get_redis()
+            await redis.set(key, value, ex=expire)
+
+    async def close(self):
+        if self.redis is not None:
+            await self.redis.close()
+            self.redis = None
 
 redis_cache = RedisCache()
@@ -0,0 +1,77 @@
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# pg_trgm's default pg_trgm.word_similarity_threshold, so both backends agree on what matches
+WORD_SIMILARITY_THRESHOLD = 0.6
+
+_WORDS = re.compile(r"[^\W_]+")
+
+
+def trigrams(text: str) -> Set[str]:
+    """Trigrams the way pg_trgm builds them: per lower-cased word, padded with two spaces in front and one behind."""
+    grams = set()
+    for word in _WORDS.findall(text.lower()):
+        padded = f"  {word} "
+        grams.update(padded[index:index + 3] for index in range(len(padded) - 2))
+    return grams
+
+
+def after_cursor(rank: float, id: int, cursor: Optional[Tuple[float, int]]) -> bool:
+    """Results are ordered by rank descending, then id ascending."""
+    return cursor is None or rank < cursor[0] or (rank == cursor[0] and id > cursor[1])
+
+
+class TrigramIndex:
+    """
+    In-process stand-in for a pg_trgm GIN index, used where Postgres isn't available (SQLite
+    test runs). A document matches when it contains the query or shares enough of its trigrams.
+    """
+
+    def __init__(self, documents: Iterable[Tuple[int, str]] = ()):
+        self._documents: Dict[int, str] = {}
+        self._postings: Dict[str, Set[int]] = {}
+        for id, text in documents:
+            self.add(id, text)
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def add(self, id: int, text: str):
+        self.remove(id)
+        self._documents[id] = text.lower()
+        for gram in trigrams(text):
+            self._postings.setdefault(gram, set()).add(id)
+
+    def remove(self, id: int):
+        text = self._documents.pop(id, None)
+        if text is not None:
+            for gram in trigrams(text):
+                self._postings[gram].discard(id)
+
+    def search(self, query: str, limit: int = 20, cursor: Tuple[float, int] = None) -> List[Tuple[float, int]]:
+        """`(rank, id)` pairs, best first, starting after `cursor`."""
+        query_grams = trigrams(query)
+        needle = query.lower()
+        if not query_grams and not needle:
+            return []
+        counts: Dict[int, int] = {}
+        for gram in query_grams:
+            for id in self._postings.get(gram, ()):
+                counts[id] = counts.get(id, 0) + 1
+        candidates = set(counts) | self._containing(needle)
+        hits = []
+        for id in candidates:
+            rank = counts.get(id, 0) / len(query_grams) if query_grams else 0.0
+            if (rank >= WORD_SIMILARITY_THRESHOLD or needle in self._documents[id]) and after_cursor(rank, id, cursor):
+                hits.append((rank, id))
+        hits.sort(key=lambda hit: (-hit[0], hit[1]))
+        return hits[:limit]
+
+    def _containing(self, needle: str) -> Set[int]:
+        if _WORDS.fullmatch(needle) and len(needle) >= 3:
+            # A word inside a document has its inner trigrams posted, so only those documents can contain it
+            postings = [self._postings.get(needle[index:index + 3], set()) for index in range(len(needle) - 2)]
+            candidates = set.intersection(*postings)
+        else:
+            candidates = self._documents
+        return {id for id in candidates if needle in self._documents[id]}
@@ -0,0 +1,92 @@
+"""
+Compare JWT verification throughput across algorithms and libraries.
+
+    python -m benchmarks.jwt_algorithms --iterations 2000
+
+Rows are `library/algorithm`. `python-jose/RS256 (raw PEM)` passes the public PEM string on
+every call instead of a parsed key, to show what the key cache in `app.core.keys` saves.
+Libraries that aren't installed are skipped.
+"""
+import argparse
+import sys
+import time
+from typing import Callable, Dict
+
+from benchmarks.run import format_row, summarize
+from benchmarks.scenarios import time_micro
+
+CLAIMS = {"sub": "bench-user", "type": "access", "jti": "0" * 32, "exp": 4102444800}
+
+
+def generate_keys() -> Dict[str, object]:
+    from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+
+    return {
+        "RS256": rsa.generate_private_key(public_exponent=65537, key_size=2048),
+        "ES256": ec.generate_private_key(ec.SECP256R1()),
+        "EdDSA": ed25519.Ed25519PrivateKey.generate(),
+    }
+
+
+def private_pem(private_key) -> bytes:
+    from cryptography.hazmat.primitives import serialization
+
+    return private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption(),
+    )
+
+
+def verifiers(secret: str = "bench-secret") -> Dict[str, Callable[[], object]]:
+    from app.core.keys import JWTKey
+
+    keys = generate_keys()
+    cases = {}
+
+    # The app's own key path: python-jose with parsed keys, PyJWT for EdDSA
+    app_keys = [JWTKey.from_secret("hs", secret)] + [JWTKey.from_pem(alg, private_pem(key)) for alg, key in keys.items()]
+    for key in app_keys:
+        token = key.encode(CLAIMS)
+        library = "PyJWT" if key.algorithm == "EdDSA" else "python-jose"
+        cases[f"{library}/{key.algorithm}"] = lambda key=key, token=token: key.decode(token)
+
+    from cryptography.hazmat.primitives import serialization
+    from jose import jwt as jose_jwt
+
+    rsa_token = jose_jwt.encode(CLAIMS, private_pem(keys["RS256"]).decode(), algorithm="RS256")
+    rsa_public_pem = keys["RS256"].public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo,
+    ).decode()
+    cases["python-jose/RS256 (raw PEM)"] = lambda: jose_jwt.decode(rsa_token, rsa_public_pem, algorithms=["RS256"])
+
+    try:
+        import jwt as pyjwt
+    except ImportError:
+        return cases
+    hs_token = pyjwt.encode(CLAIMS, secret, algorithm="HS256")
+    cases["PyJWT/HS256"] = lambda: pyjwt.decode(hs_token, secret, algorithms=["HS256"])
+    for algorithm in ("RS256", "ES256"):
+        token = pyjwt.encode(CLAIMS, keys[algorithm], algorithm=algorithm)
+        public_key = keys[algorithm].public_key()
+        cases[f"PyJWT/{algorithm}"] = lambda token=token, public_key=public_key, algorithm=algorithm: pyjwt.decode(
+            token, public_key, algorithms=[algorithm],
+        )
+    return cases
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark JWT verification per algorithm and library.")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    for name, verify in sorted(verifiers().items()):
+        verify()
+        # Re-parsing a PEM per call is slow enough that a few samples tell the story
+        iterations = max(10, args.iterations // 50) if "raw PEM" in name else args.iterations
+        start = time.perf_counter()
+        samples = time_micro(verify, iterations)
+        print(format_row(name, summarize(samples, time.perf_counter() - start)), flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
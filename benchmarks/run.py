@@ -0,0 +1,171 @@
+"""
+Offline performance suite for the auth and CRUD hot paths.
+
+Runs the app in-process against SQLite (aiosqlite) through an ASGI client, so no
+server, Postgres or Redis is needed:
+
+    python -m benchmarks.run --concurrency 20 --requests 500
+    python -m benchmarks.run --save-baseline            # refresh benchmarks/baseline.json
+    python -m benchmarks.run --compare --tolerance 0.25 # exit 1 on regressions
+
+Absolute numbers depend on the machine; compare against a baseline recorded on the same one.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def percentile(sorted_samples: List[float], fraction: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    index = max(0, math.ceil(fraction * len(sorted_samples)) - 1)
+    return sorted_samples[index]
+
+
+def summarize(samples: List[float], elapsed: float) -> dict:
+    ordered = sorted(samples)
+    return {
+        "operations": len(samples),
+        "throughput": round(len(samples) / elapsed, 2) if elapsed > 0 else 0.0,
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 4),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 4),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 4),
+    }
+
+
+async def run_concurrently(operation, total: int, concurrency: int) -> dict:
+    samples = []
+    remaining = iter(range(total))
+
+    async def worker():
+        for _ in remaining:
+            start = time.perf_counter()
+            await operation()
+            samples.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, total))))
+    return summarize(samples, time.perf_counter() - start)
+
+
+async def run_suite(args) -> Dict[str, dict]:
+    from benchmarks import scenarios
+
+    results = {}
+    await scenarios.setup_database()
+    try:
+        async with scenarios.asgi_client() as client:
+            for name, operation in scenarios.endpoint_scenarios(client).items():
+                if args.only and name not in args.only:
+                    continue
+                total = max(1, int(args.requests * scenarios.SCENARIO_WEIGHTS.get(name, 1)))
+                await operation()  # warm-up
+                results[name] = await run_concurrently(operation, total, args.concurrency)
+                print(format_row(name, results[name]), flush=True)
+    finally:
+        await scenarios.teardown_database()
+
+    for name, function in scenarios.micro_benchmarks().items():
+        if args.only and name not in args.only:
+            continue
+        function()
+        start = time.perf_counter()
+        samples = scenarios.time_micro(function, args.iterations)
+        results[name] = summarize(samples, time.perf_counter() - start)
+        print(format_row(name, results[name]), flush=True)
+    return results
+
+
+def format_row(name: str, result: dict) -> str:
+    return (
+        f"{name:<36} {result['throughput']:>12.1f} ops/s  p50 {result['p50_ms']:>9.3f} ms"
+        f"  p95 {result['p95_ms']:>9.3f} ms  p99 {result['p99_ms']:>9.3f} ms"
+    )
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    """Regressions are p95 latency or throughput worse than the baseline by more than `tolerance`."""
+    regressions = []
+    for name, expected in baseline.items():
+        actual = results.get(name)
+        if actual is None:
+            continue
+        if actual["p95_ms"] > expected["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {actual['p95_ms']:.3f} ms vs baseline {expected['p95_ms']:.3f} ms")
+        if actual["throughput"] < expected["throughput"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {actual['throughput']:.1f} vs baseline {expected['throughput']:.1f} ops/s")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the auth and CRUD hot paths in-process.")
+    parser.add_argument("--concurrency", type=int, default=10, help="Concurrent in-flight operations per scenario")
+    parser.add_argument("--requests", type=int, default=500, help="Operations per endpoint scenario (bcrypt-bound ones run fewer)")
+    parser.add_argument("--iterations", type=int, default=5000, help="Iterations per micro-benchmark")
+    parser.add_argument("--only", nargs="*", help="Run only the named scenarios")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Overwrite the baseline with these results")
+    parser.add_argument("--compare", action="store_true", help="Compare against the baseline and exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown before flagging a regression")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    database_dir = tempfile.mkdtemp(prefix="bench-")
+    # Assigned, not defaulted: the harness drops every table, so it must never reach a configured database
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(database_dir, 'bench.db')}?timeout=60"
+    os.environ.setdefault("SLOW_QUERY_THRESHOLD_MS", "10000")
+    os.environ.setdefault("LOOP_LAG_MONITOR_ENABLED", "false")
+    # Benchmarks measure raw capacity; shedding would turn saturation into 503s
+    os.environ.setdefault("LOAD_SHEDDING_ENABLED", "false")
+
+    try:
+        results = asyncio.run(run_suite(args))
+    finally:
+        shutil.rmtree(database_dir, ignore_errors=True)
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "iterations": args.iterations,
+        },
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as output:
+            json.dump(report, output, indent=2)
+        print(f"Baseline written to {args.baseline}")
+
+    if args.compare:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("Regressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print("No regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List
+
+import httpx
+
+from app.core.security import create_access_token, decode_access_token, get_password_hash
+from app.crud.crud_user import crud_user
+from app.db.base_class import Base
+from app.db.models.user import User
+from app.db.session import dispose_engine, get_engine, get_sessionmaker
+from app.main import app
+from app.schemas.user import UserCreate
+
+BENCH_USERNAME = "bench-user"
+BENCH_PASSWORD = "bench-password"
+SEED_USERS = 1000
+
+
+async def setup_database():
+    engine = get_engine()
+    if engine.dialect.name != "sqlite":
+        raise RuntimeError(f"Refusing to drop the tables of a {engine.dialect.name} database; benchmarks run on SQLite")
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+
+    hashed_password = get_password_hash(BENCH_PASSWORD)
+    async with get_sessionmaker()() as db:
+        db.add(User(
+            username=BENCH_USERNAME, first_name="Bench", last_name="User",
+            email="bench@example.com", hashed_password=hashed_password,
+        ))
+        db.add_all(
+            User(
+                username=f"seed-{index}", first_name=f"First{index}", last_name=f"Last{index}",
+                email=f"seed-{index}@example.com", hashed_password=hashed_password,
+            )
+            for index in range(SEED_USERS)
+        )
+        await db.commit()
+
+
+async def teardown_database():
+    await dispose_engine()
+
+
+def asgi_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+
+def endpoint_scenarios(client: httpx.AsyncClient) -> Dict[str, Callable[[], Awaitable]]:
+    """Each scenario performs one operation and raises if it didn't succeed."""
+    auth_headers = {"Authorization": f"Bearer {create_access_token({'sub': BENCH_USERNAME})}"}
+
+    async def login():
+        response = await client.post("/v1/auth/token", data={"username": BENCH_USERNAME, "password": BENCH_PASSWORD})
+        response.raise_for_status()
+
+    async def users_me():
+        response = await client.get("/v1/auth/users/me", headers=auth_headers)
+        response.raise_for_status()
+
+    async def paginate_users():
+        async with get_sessionmaker()() as db:
+            await User.get_objects_by_pagination(db, page=5, per_page=20, order_by=[(User.id, True)])
+
+    async def create_user():
+        async with get_sessionmaker()() as db:
+            await crud_user.create(db, UserCreate(
+                username=f"bench-{uuid.uuid4().hex}", first_name="Bench", last_name="Create",
+                email="create@example.com", password=BENCH_PASSWORD,
+            ))
+
+    return {
+        "auth_token": login,
+        "auth_users_me": users_me,
+        "model_get_objects_by_pagination": paginate_users,
+        "crud_user_create": create_user,
+    }
+
+
+# bcrypt dominates these scenarios, so they get fewer iterations than the cheap ones.
+SCENARIO_WEIGHTS = {"auth_token": 0.05, "crud_user_create": 0.05}
+
+
+def micro_benchmarks() -> Dict[str, Callable[[], object]]:
+    from sqlalchemy import select
+    from sqlalchemy.dialects import postgresql
+
+    token = create_access_token({"sub": BENCH_USERNAME})
+    dialect = postgresql.asyncpg.dialect()
+
+    def jwt_encode():
+        return create_access_token({"sub": BENCH_USERNAME})
+
+    def jwt_decode():
+        return decode_access_token(token)
+
+    def model_query_construction():
+        query = select(User).where(User.username == BENCH_USERNAME).where(User.role == "user")
+        query = query.order_by(User.id.desc()).limit(20).offset(40)
+        return query.compile(dialect=dialect)
+
+    return {
+        "jwt_encode": jwt_encode,
+        "jwt_decode": jwt_decode,
+        "model_query_construction": model_query_construction,
+    }
+
+
+def time_micro(function: Callable[[], object], iterations: int) -> List[float]:
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return samples
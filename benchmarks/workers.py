@@ -0,0 +1,146 @@
+"""
+Measure how throughput scales with the number of pre-forked workers (`app.server`).
+
+Starts a real server per worker count on a seeded SQLite database and drives it over HTTP:
+
+    python -m benchmarks.workers --workers 1 2 4 --scenario auth_users_me --requests 2000
+    python -m benchmarks.workers --scenario auth_token --requests 200   # bcrypt-bound
+
+The load generator is a single asyncio process; for cheap endpoints on many cores it can
+become the bottleneck, so read speed-ups next to its own CPU usage.
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.run import format_row, run_concurrently
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ("auth_users_me", "auth_token", "health")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def default_worker_counts() -> List[int]:
+    from app.server import default_workers
+
+    counts, count = [], 1
+    while count <= default_workers():
+        counts.append(count)
+        count *= 2
+    return counts
+
+
+async def seed():
+    from benchmarks import scenarios
+
+    await scenarios.setup_database()
+    await scenarios.teardown_database()
+
+
+def start_server(workers: int, port: int) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "app.server", "--workers", str(workers), "--port", str(port), "--log-level", "warning",
+         "--allow-per-worker-state"],
+        cwd=PROJECT_DIR, env=dict(os.environ),
+    )
+
+
+async def wait_until_ready(client: httpx.AsyncClient, workers: int, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/health")).status_code == 200:
+                # Give the remaining workers time to finish their lifespan startup
+                await asyncio.sleep(0.2 * workers)
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError("Server did not become ready")
+
+
+def operation_for(client: httpx.AsyncClient, scenario: str):
+    from app.core.security import create_access_token
+    from benchmarks.scenarios import BENCH_PASSWORD, BENCH_USERNAME
+
+    auth_headers = {"Authorization": f"Bearer {create_access_token({'sub': BENCH_USERNAME})}"}
+
+    async def users_me():
+        (await client.get("/v1/auth/users/me", headers=auth_headers)).raise_for_status()
+
+    async def login():
+        response = await client.post("/v1/auth/token", data={"username": BENCH_USERNAME, "password": BENCH_PASSWORD})
+        response.raise_for_status()
+
+    async def health():
+        (await client.get("/health")).raise_for_status()
+
+    return {"auth_users_me": users_me, "auth_token": login, "health": health}[scenario]
+
+
+async def measure(workers: int, args) -> dict:
+    port = free_port()
+    server = start_server(workers, port)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+            await wait_until_ready(client, workers)
+            operation = operation_for(client, args.scenario)
+            await run_concurrently(operation, args.concurrency, args.concurrency)  # warm-up
+            return await run_concurrently(operation, args.requests, args.concurrency)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+
+async def run_all(args) -> Dict[int, dict]:
+    await seed()
+    results = {}
+    for workers in args.workers:
+        results[workers] = await measure(workers, args)
+        speedup = results[workers]["throughput"] / results[args.workers[0]]["throughput"]
+        print(f"{format_row(f'{args.scenario} x{workers} workers', results[workers])}  speed-up {speedup:.2f}x", flush=True)
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark throughput against the number of server workers.")
+    parser.add_argument("--workers", type=int, nargs="*", help="Worker counts to try (default: powers of two up to the CPU count)")
+    parser.add_argument("--scenario", choices=SCENARIOS, default="auth_users_me")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args(argv)
+
+    database_dir = tempfile.mkdtemp(prefix="bench-workers-")
+    # Assigned, not defaulted: seeding drops every table, and the workers inherit this URL
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(database_dir, 'bench.db')}?timeout=60"
+    os.environ.setdefault("SLOW_QUERY_THRESHOLD_MS", "10000")
+    os.environ.setdefault("LOOP_LAG_MONITOR_ENABLED", "false")
+    # Benchmarks measure raw capacity; shedding would turn saturation into 503s
+    os.environ.setdefault("LOAD_SHEDDING_ENABLED", "false")
+    os.environ.setdefault("LOG_DIR", database_dir)
+    args.workers = args.workers or default_worker_counts()
+    try:
+        asyncio.run(run_all(args))
+    finally:
+        shutil.rmtree(database_dir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
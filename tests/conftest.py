@@ -1,3 +1,37 @@
+import os
+
 import pytest
+from fastapi.testclient import TestClient
+
+# Tests run against in-memory SQLite unless a database is configured explicitly.
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
 
 # Add global pytest fixtures here for future extension
+
+
+async def create_tables():
+    from app.db.base_class import Base
+    from app.db.session import get_engine
+
+    async with get_engine().begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+
+
+@pytest.fixture
+def client():
+    """Client with the app lifespan running, fresh tables and two registered users."""
+    from app.main import app
+
+    with TestClient(app) as client:
+        client.portal.call(create_tables)
+        for username in ("alice", "bob"):
+            client.post("/v1/auth/register", json={
+                "username": username, "first_name": username, "last_name": "Test",
+                "email": f"{username}@example.com", "password": "secret",
+            })
+        yield client
+
+
+def login(client, username: str) -> dict:
+    return client.post("/v1/auth/token", data={"username": username, "password": "secret"}).json()
+
@@ -0,0 +1,139 @@
+import asyncio
+import time
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+
+from app.api.api_key_auth import require_scopes
+from app.core.api_keys import MISS, ApiKeyCache, ApiKeyPrincipal, api_key_store, hash_api_key, parse_prefix
+from app.db.models.user import User
+from app.db.session import get_sessionmaker
+from tests.conftest import login
+
+
+def admin_headers(client) -> dict:
+    async def promote():
+        async with get_sessionmaker()() as db:
+            user = await User.get_single_object(db, username="alice")
+            await User.update(user.id, db, role="admin")
+
+    client.portal.call(promote)
+    return {"Authorization": f"Bearer {login(client, 'alice')['access_token']}"}
+
+
+def scoped_client(client) -> TestClient:
+    app = FastAPI()
+    app.state.limiter = Limiter(key_func=get_remote_address, storage_uri="memory://")
+
+    @app.get("/reports")
+    async def reports(principal: ApiKeyPrincipal = Depends(require_scopes("reports:read"))):
+        return {"name": principal.name}
+
+    return TestClient(app)
+
+
+def test_cache_expires_and_caches_rejections():
+    cache = ApiKeyCache(ttl=60, negative_ttl=0.05, max_entries=2)
+    principal = ApiKeyPrincipal("abc", "ci", ["debug"], expires_at=time.time() + 0.05)
+    cache.put("hash-a", "abc", principal)
+    cache.put("hash-b", "def", None)
+
+    assert cache.get("hash-a") is principal
+    assert cache.get("hash-b") is None
+    time.sleep(0.06)
+    # The key's own expiry caps the positive TTL
+    assert cache.get("hash-a") is MISS and cache.get("hash-b") is MISS
+
+    valid = ApiKeyPrincipal("ghi", "ci")
+    cache.put("hash-valid", "ghi", valid)
+    for key in ("hash-c", "hash-d", "hash-e"):
+        cache.put(key, "xyz", None)
+    # Rejections evict each other, never valid keys
+    assert cache.get("hash-c") is MISS and cache.get("hash-valid") is valid
+    cache.invalidate("ghi")
+    assert cache.get("hash-valid") is MISS
+
+
+def test_provisioned_keys_are_hashed_and_scoped(client):
+    headers = admin_headers(client)
+    assert client.post("/v1/api-keys", json=[{"name": "ci"}]).status_code == 401
+    assert client.post("/v1/api-keys", headers=headers, json=[{"name": "ci", "rate_limit": "often"}]).status_code == 400
+
+    response = client.post("/v1/api-keys", headers=headers, json=[
+        {"name": "reporting", "scopes": ["reports:read"]},
+        {"name": "ci", "scopes": ["debug"]},
+    ])
+    assert response.status_code == 201
+    reporting, ci = response.json()
+    assert parse_prefix(reporting["key"]) == reporting["prefix"]
+    assert "key_hash" not in reporting and hash_api_key(reporting["key"]) != reporting["key"]
+
+    reports = scoped_client(client)
+    assert reports.get("/reports", headers={"X-API-Key": reporting["key"]}).json() == {"name": "reporting"}
+    assert reports.get("/reports", headers={"X-API-Key": ci["key"]}).status_code == 403
+    assert reports.get("/reports", headers={"X-API-Key": reporting["key"] + "x"}).status_code == 401
+
+
+def test_cached_lookups_skip_the_database(client, monkeypatch):
+    headers = admin_headers(client)
+    key = client.post("/v1/api-keys", headers=headers, json=[{"name": "ci", "scopes": ["*"]}]).json()[0]["key"]
+    loads = []
+    load = api_key_store._load
+
+    async def counting_load(prefix, key_hash):
+        loads.append(prefix)
+        return await load(prefix, key_hash)
+
+    monkeypatch.setattr(api_key_store, "_load", counting_load)
+    api_key_store.cache.clear()
+    for _ in range(5):
+        assert client.portal.call(api_key_store.authenticate, key).name == "ci"
+        assert client.portal.call(api_key_store.authenticate, "sk_000000000000_unknown") is None
+        assert client.portal.call(api_key_store.authenticate, "garbage") is None
+    assert len(loads) == 2
+    # Only hashes are kept, and malformed keys are rejected before reaching the cache
+    assert key not in api_key_store.cache._entries and hash_api_key(key) in api_key_store.cache._entries
+    assert hash_api_key("garbage") not in api_key_store.cache._rejections
+
+
+def test_revoked_keys_stop_working_in_this_process(client):
+    headers = admin_headers(client)
+    created = client.post("/v1/api-keys", headers=headers, json=[{"name": "ci", "scopes": ["reports:read"]}]).json()[0]
+    reports = scoped_client(client)
+    assert reports.get("/reports", headers={"X-API-Key": created["key"]}).status_code == 200
+
+    assert client.delete(f"/v1/api-keys/{created['prefix']}", headers=headers).status_code == 204
+    assert client.delete(f"/v1/api-keys/{created['prefix']}", headers=headers).status_code == 404
+    assert reports.get("/reports", headers={"X-API-Key": created["key"]}).status_code == 401
+
+
+def test_per_key_rate_limit(client):
+    headers = admin_headers(client)
+    limited, other = client.post("/v1/api-keys", headers=headers, json=[
+        {"name": "limited", "scopes": ["reports:read"], "rate_limit": "2/minute"},
+        {"name": "other", "scopes": ["reports:read"], "rate_limit": "2/minute"},
+    ]).json()
+    reports = scoped_client(client)
+
+    statuses = [reports.get("/reports", headers={"X-API-Key": limited["key"]}).status_code for _ in range(3)]
+    assert statuses == [200, 200, 429]
+    assert reports.get("/reports", headers={"X-API-Key": other["key"]}).status_code == 200
+
+
+def test_bulk_provision_uses_one_insert():
+    class Session:
+        def __init__(self):
+            self.executed = []
+
+        async def execute(self, statement, rows=None):
+            self.executed.append(rows)
+
+        async def commit(self):
+            pass
+
+    session = Session()
+    created = asyncio.run(api_key_store.bulk_provision(session, [{"name": f"key-{n}"} for n in range(500)]))
+    assert len(created) == 500 and len({key["prefix"] for key in created}) == 500
+    assert len(session.executed) == 1 and len(session.executed[0]) == 500
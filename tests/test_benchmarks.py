@@ -0,0 +1,17 @@
+from benchmarks.run import compare, percentile, summarize
+
+
+def test_percentiles_use_nearest_rank():
+    samples = [i / 1000 for i in range(1, 101)]
+    assert percentile(samples, 0.50) == 0.05
+    assert percentile(samples, 0.99) == 0.099
+    summary = summarize(samples, elapsed=2.0)
+    assert summary["throughput"] == 50.0
+    assert summary["p95_ms"] == 95.0
+
+
+def test_compare_flags_latency_and_throughput_regressions():
+    baseline = {"users_me": {"p95_ms": 10.0, "throughput": 1000.0}}
+    assert compare({"users_me": {"p95_ms": 11.0, "throughput": 950.0}}, baseline, tolerance=0.2) == []
+    regressions = compare({"users_me": {"p95_ms": 20.0, "throughput": 500.0}}, baseline, tolerance=0.2)
+    assert len(regressions) == 2
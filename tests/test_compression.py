@@ -0,0 +1,96 @@
+import gzip
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.middleware.compression import CompressionMiddleware, CompressedBodyCache, select_encoding
+
+PAYLOAD = "x" * 2048
+
+
+def build_client(cache=None):
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=500, cache=cache or CompressedBodyCache())
+
+    @app.get("/large")
+    async def large():
+        return PlainTextResponse(PAYLOAD, headers={"ETag": '"v1"'})
+
+    @app.get("/small")
+    async def small():
+        return PlainTextResponse("tiny")
+
+    @app.get("/image")
+    async def image():
+        return Response(PAYLOAD.encode(), media_type="image/png")
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for _ in range(4):
+                yield PAYLOAD.encode()
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    return TestClient(app)
+
+
+def test_select_encoding_honours_quality():
+    assert select_encoding("gzip, br;q=0.5", ("br", "gzip")) == "gzip"
+    assert select_encoding("br, gzip", ("br", "gzip")) == "br"
+    assert select_encoding("identity", ("br", "gzip")) is None
+    assert select_encoding("*;q=0.1", ("gzip",)) == "gzip"
+
+
+def test_large_body_is_gzipped():
+    client = build_client()
+    response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"] == 'W/"v1"'
+    assert response.text == PAYLOAD
+
+
+def test_small_and_precompressed_bodies_are_untouched():
+    client = build_client()
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/image", headers={"Accept-Encoding": "gzip"}).headers
+
+
+def test_streaming_response_is_compressed():
+    client = build_client()
+    response = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.text == PAYLOAD * 4
+
+
+def test_etag_responses_are_served_from_cache():
+    cache = CompressedBodyCache()
+    client = build_client(cache)
+    client.get("/large", headers={"Accept-Encoding": "gzip"})
+    cached = cache.get(CompressedBodyCache.key("GET", "/large", b"", '"v1"'), "gzip")
+    assert gzip.decompress(cached).decode() == PAYLOAD
+
+
+def test_cached_bodies_are_not_shared_between_urls_or_callers():
+    cache = CompressedBodyCache()
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=500, cache=cache)
+
+    @app.get("/items/{name}")
+    async def item(name: str):
+        # Same validator for different resources, as with version-only ETags
+        return PlainTextResponse(name * 1000, headers={"ETag": '"1"'})
+
+    @app.get("/me")
+    async def me(user: str):
+        return PlainTextResponse(user * 1000, headers={"ETag": '"1"', "Cache-Control": "private, max-age=0"})
+
+    client = TestClient(app)
+    headers = {"Accept-Encoding": "gzip"}
+    assert client.get("/items/a", headers=headers).text == "a" * 1000
+    assert client.get("/items/b", headers=headers).text == "b" * 1000
+    assert client.get("/items/a?x=1", headers=headers).text == "a" * 1000
+    assert client.get("/me?user=c", headers=headers).text == "c" * 1000
+    assert len(cache._entries) == 3
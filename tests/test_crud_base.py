@@ -0,0 +1,112 @@
+import pytest
+
+from app.core.custom_exception import ConflictError, NotFoundError
+from app.crud.base import model_info
+from app.crud.crud_user import crud_user
+from app.db.models.user import User
+from app.db.session import get_sessionmaker
+from app.schemas.user import UserUpdate
+from tests.conftest import login
+
+
+def run(client, operation):
+    async def with_session():
+        async with get_sessionmaker()() as db:
+            return await operation(db)
+
+    return client.portal.call(with_session)
+
+
+def test_model_metadata_is_precomputed():
+    info = model_info(User)
+    assert info is model_info(User)
+    assert info.primary_key == "id" and info.version_key == "version"
+    assert "hashed_password" in info.writable and not {"id", "version"} & info.writable
+
+
+def test_partial_update_only_touches_set_fields(client):
+    async def update(db):
+        user = await crud_user.get_by_username(db, "alice")
+        version = user.version
+        updated = await crud_user.update(db, user.id, UserUpdate(last_name="Liddell"))
+        return version, updated
+
+    version, updated = run(client, update)
+    assert updated.last_name == "Liddell" and updated.first_name == "alice"
+    assert updated.version == version + 1
+
+
+def test_concurrent_updates_conflict(client):
+    async def stale_write(db):
+        user = await crud_user.get_by_username(db, "bob")
+        user_id, version = user.id, user.version
+        async with get_sessionmaker()() as other:
+            await crud_user.update(other, user.id, {"email": "first@example.com"})
+        with pytest.raises(ConflictError):
+            await crud_user.update(db, user, {"email": "second@example.com"})
+        with pytest.raises(ConflictError):
+            await crud_user.update(db, user_id, {"email": "third@example.com"}, expected_version=version)
+
+    run(client, stale_write)
+    assert run(client, lambda db: crud_user.get_by_username(db, "bob")).email == "first@example.com"
+
+
+def test_batched_operations_and_filtered_counts(client):
+    async def batch(db):
+        created = await crud_user.create_many(db, [
+            {"username": f"batch-{index}", "first_name": "Batch", "last_name": str(index), "email": "b@example.com"}
+            for index in range(5)
+        ])
+        page, total = await crud_user.get_page(db, page=2, per_page=2, order_by=[(User.id, True)], first_name="Batch")
+        updated = await crud_user.update_many(db, {"role": "staff"}, first_name="Batch")
+        deleted = await crud_user.delete_many(db, [user.id for user in created[:3]])
+        remaining = await crud_user.get_multi(db, first_name="Batch")
+        return page, total, updated, deleted, remaining
+
+    page, total, updated, deleted, remaining = run(client, batch)
+    assert [user.username for user in page] == ["batch-2", "batch-3"] and total == 5
+    assert updated == 5 and deleted == 3
+    assert [(user.username, user.role) for user in remaining] == [("batch-3", "staff"), ("batch-4", "staff")]
+
+
+def test_model_mixin_delegates(client):
+    async def mixin(db):
+        with pytest.raises(ValueError):
+            await User.get_single_object(db, nickname="alice")
+        with pytest.raises(NotFoundError):
+            await User.delete(10_000, db)
+        return await User.exists(db, username="alice"), await User.exists(db, username="nobody")
+
+    assert run(client, mixin) == (True, False)
+
+
+def test_bulk_role_change_revokes_tokens(client):
+    token = login(client, "alice")["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/v1/auth/users/me", headers=headers).status_code == 200
+
+    assert run(client, lambda db: crud_user.update_many(db, {"role": "staff"}, username="alice")) == 1
+    assert client.get("/v1/auth/users/me", headers=headers).status_code == 401
+
+    # Rows whose role doesn't change keep their tokens
+    other = {"Authorization": f"Bearer {login(client, 'bob')['access_token']}"}
+    run(client, lambda db: crud_user.update_many(db, {"role": "user"}, username="bob"))
+    assert client.get("/v1/auth/users/me", headers=other).status_code == 200
+
+
+def test_failed_bulk_delete_rolls_back(client):
+    async def scenario(db):
+        alice = await crud_user.get_by(db, username="alice")
+        commit = db.commit
+
+        async def failing_commit():
+            raise RuntimeError("connection lost")
+
+        db.commit = failing_commit
+        with pytest.raises(RuntimeError):
+            await crud_user.delete_many(db, [alice.id])
+        db.commit = commit
+        # The session is usable again, and the uncommitted DELETE is gone with the transaction
+        return await crud_user.get_by(db, username="alice") is not None
+
+    assert run(client, scenario)
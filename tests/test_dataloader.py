@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from app.crud.crud_user import crud_user
+from app.db.session import get_sessionmaker
+from app.utils.dataloader import DataLoader
+
+
+def counting_loader(batches: list, delay: float = 0, **kwargs) -> DataLoader:
+    async def batch_fn(keys):
+        batches.append(sorted(keys))
+        await asyncio.sleep(delay)
+        return {key: key.upper() for key in keys if key != "missing"}
+
+    return DataLoader(batch_fn, **kwargs)
+
+
+def test_concurrent_loads_share_one_batch():
+    batches = []
+    loader = counting_loader(batches)
+
+    async def run():
+        return await asyncio.gather(*(loader.load(key) for key in ["a", "b", "a", "missing", "b", "a"]))
+
+    assert asyncio.run(run()) == ["A", "B", "A", None, "B", "A"]
+    assert batches == [["a", "b", "missing"]]
+
+
+def test_inflight_keys_are_not_fetched_twice():
+    batches = []
+    loader = counting_loader(batches, delay=0.02)
+
+    async def run():
+        first = asyncio.ensure_future(loader.load("a"))
+        await asyncio.sleep(0.01)
+        # "a" is being fetched; only "b" needs a new query
+        second = await loader.load_many(["a", "b"])
+        return await first, second
+
+    assert asyncio.run(run()) == ("A", ["A", "B"])
+    assert batches == [["a"], ["b"]]
+
+
+def test_batches_are_capped_and_errors_reach_every_caller():
+    batches = []
+    loader = counting_loader(batches, max_batch_size=2)
+    assert asyncio.run(loader.load_many(["a", "b", "c"])) == ["A", "B", "C"]
+    assert batches == [["a", "b"], ["c"]]
+
+    async def failing(keys):
+        raise ConnectionError("database unavailable")
+
+    broken = DataLoader(failing)
+
+    async def run():
+        return await asyncio.gather(broken.load("a"), broken.load("b"), return_exceptions=True)
+
+    assert all(isinstance(result, ConnectionError) for result in asyncio.run(run()))
+
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    batches = []
+    loader = counting_loader(batches, delay=0.02)
+
+    async def run():
+        impatient = asyncio.ensure_future(loader.load("a"))
+        patient = asyncio.ensure_future(loader.load("a"))
+        await asyncio.sleep(0.005)
+        impatient.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await impatient
+        return await patient
+
+    assert asyncio.run(run()) == "A"
+
+
+def test_crud_user_batches_lookups(client):
+    async def lookups():
+        by_name = await asyncio.gather(*(crud_user.load_by_username(name) for name in ["alice", "bob", "alice", "nobody"]))
+        async with get_sessionmaker()() as db:
+            by_id = await crud_user.get_many_by_id(db, [by_name[0].id, by_name[1].id])
+        return by_name, by_id
+
+    by_name, by_id = client.portal.call(lookups)
+    assert [user.username if user else None for user in by_name] == ["alice", "bob", "alice", None]
+    assert by_name[0] is by_name[2]
+    assert {user.username for user in by_id.values()} == {"alice", "bob"}
@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+
+from app.core.deadline import (
+    CLIENT_DEADLINE,
+    DEADLINES_EXCEEDED,
+    DeadlineExceeded,
+    deadline_stage,
+    end_deadline,
+    parse_timeout,
+    start_deadline,
+    tighten_deadline,
+    time_remaining,
+)
+from app.db.session import _apply_statement_timeout, _statement_timed_out
+from app.main import app
+from app.middleware.deadline import DeadlineMiddleware
+from tests.conftest import login
+
+
+class FakeConnection:
+    class dialect:
+        name = "postgresql"
+
+    def __init__(self):
+        self.statements = []
+
+    def exec_driver_sql(self, statement):
+        self.statements.append(statement)
+
+
+class FakeErrorContext:
+    class original_exception(Exception):
+        pgcode = "57014"
+
+    sqlalchemy_exception = RuntimeError("canceling statement due to statement timeout")
+
+
+def test_parse_timeout():
+    assert parse_timeout("2.5") == 2.5
+    assert parse_timeout("250ms") == 0.25
+    assert parse_timeout(" 3s ") == 3
+    assert parse_timeout("soon") is None and parse_timeout(None) is None
+
+
+def test_stages_time_out_against_the_request_deadline():
+    async def scenario():
+        async with deadline_stage("redis"):
+            await asyncio.sleep(0.01)  # no deadline outside a request
+
+        token = start_deadline(10)
+        try:
+            tighten_deadline(60)
+            assert time_remaining() <= 10
+            tighten_deadline(0.05)
+            before = DEADLINES_EXCEEDED.value("redis")
+            with pytest.raises(DeadlineExceeded) as error:
+                async with deadline_stage("redis"):
+                    await asyncio.sleep(1)
+            assert error.value.stage == "redis" and error.value.error_code == 504
+            assert DEADLINES_EXCEEDED.value("redis") == before + 1
+            with pytest.raises(DeadlineExceeded):
+                async with deadline_stage("pool"):
+                    pass
+        finally:
+            end_deadline(token)
+        assert time_remaining() is None
+
+    asyncio.run(scenario())
+
+
+def test_transactions_get_the_remaining_time_as_statement_timeout():
+    connection = FakeConnection()
+    _apply_statement_timeout(None, None, connection)
+    assert connection.statements == []
+
+    token = start_deadline(1.5)
+    try:
+        _apply_statement_timeout(None, None, connection)
+        (statement,) = connection.statements
+        assert statement.startswith("SET LOCAL statement_timeout = ") and 1400 < int(statement.rsplit(" ", 1)[1]) <= 1500
+        with pytest.raises(DeadlineExceeded):
+            _statement_timed_out(FakeErrorContext)
+    finally:
+        end_deadline(token)
+    assert _statement_timed_out(FakeErrorContext) is None
+
+
+def deadline_middleware(app) -> DeadlineMiddleware:
+    layer = app.middleware_stack
+    while not isinstance(layer, DeadlineMiddleware):
+        layer = layer.app
+    return layer
+
+
+def test_header_only_shortens_the_deadline(client):
+    middleware = deadline_middleware(app)
+    seen = []
+
+    async def record(scope, receive, send):
+        seen.append((time_remaining(), scope))
+
+    inner, middleware.app = middleware.app, record
+
+    async def call(timeout):
+        scope = {"type": "http", "headers": [(b"x-request-timeout", timeout.encode())]}
+        await middleware(scope, None, None)
+
+    try:
+        for timeout in ("1", "0", "3600"):
+            asyncio.run(call(timeout))
+    finally:
+        middleware.app = inner
+    (short, short_scope), (floored, floored_scope), (extended, extended_scope) = seen
+    assert short <= 1 and short_scope[CLIENT_DEADLINE]
+    assert 0 < floored <= middleware.min_timeout and floored_scope[CLIENT_DEADLINE]
+    assert extended <= middleware.default_timeout and CLIENT_DEADLINE not in extended_scope
+
+
+def test_request_past_its_deadline_gets_504(client, monkeypatch):
+    # Without the floor, "0" expires before the first stage
+    monkeypatch.setattr(deadline_middleware(app), "min_timeout", 0)
+    tokens = login(client, "alice")
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    assert client.get("/v1/auth/users/me", headers=headers).status_code == 200
+
+    before = DEADLINES_EXCEEDED.value("loader")
+    response = client.get("/v1/auth/users/me", headers={**headers, "X-Request-Timeout": "0ms"})
+    assert response.status_code == 504
+    assert response.json()["error"]["name"] == "DeadlineExceeded"
+    assert DEADLINES_EXCEEDED.value("loader") == before + 1
+
+    before = DEADLINES_EXCEEDED.value("pool")
+    response = client.post("/v1/auth/token/refresh", json={"refresh_token": tokens["refresh_token"]}, headers={"X-Request-Timeout": "0"})
+    assert response.status_code == 504 and DEADLINES_EXCEEDED.value("pool") == before + 1
@@ -6,3 +6,57 @@ def test_health_check():
     response = client.get("/health")
     assert response.status_code == 200
     assert response.json() == {"status": "healthy"}
+
+
+def test_lifespan_creates_and_disposes_resources():
+    from app.db import session
+
+    with TestClient(app) as client:
+        assert client.get("/health").status_code == 200
+        assert session._engine is not None
+    assert session._engine is None
+
+
+def test_readiness_is_served_from_the_probe_snapshot():
+    with TestClient(app) as client:
+        assert client.get("/health/live").json() == {"status": "alive"}
+        first = client.get("/health/ready")
+        assert first.status_code == 200
+        body = first.json()
+        assert body["ready"] and {"database", "pool", "event_loop"} <= set(body["checks"])
+        # Repeated probes don't re-run the checks
+        assert {client.get("/health/ready").json()["checked_at"] for _ in range(10)} == {body["checked_at"]}
+
+    # Not ready until the lifespan has probed the dependencies
+    assert TestClient(app).get("/health/ready").status_code == 503
+
+
+def test_failing_or_stale_probe_is_not_ready(monkeypatch):
+    import asyncio
+
+    from app.core import health
+
+    async def unreachable():
+        raise ConnectionRefusedError("connection refused")
+
+    async def hanging():
+        await asyncio.sleep(1)
+
+    prober = health.HealthProber(interval=1, timeout=0.05)
+    monkeypatch.setattr(health, "check_database", unreachable)
+    snapshot = asyncio.run(prober.probe())
+    assert not snapshot["ready"]
+    assert snapshot["checks"]["database"]["detail"] == "ConnectionRefusedError: connection refused"
+
+    monkeypatch.setattr(health, "check_database", hanging)
+    assert asyncio.run(prober.probe())["checks"]["database"]["detail"] == "no answer within 0.05s"
+
+    async def reachable():
+        return "reachable"
+
+    monkeypatch.setattr(health, "check_database", reachable)
+    asyncio.run(prober.probe())
+    assert prober.readiness()["ready"]
+    # A prober that stopped running (e.g. a blocked event loop) must not keep reporting ready
+    prober._probed_at -= 10
+    assert not prober.readiness()["ready"]
@@ -0,0 +1,97 @@
+import asyncio
+
+from fastapi import APIRouter, FastAPI, Request, Response
+from fastapi.testclient import TestClient
+
+from app.api.api_key_auth import API_KEY
+from app.api.routing import AppRoute
+from app.core.security import create_access_token
+from app.core.token_store import token_store
+from app.utils import http_cache
+from app.utils.http_cache import cache_response, etag_from_version, not_modified_since
+
+
+def build_client(calls: list, store_ttl: int = 0):
+    router = APIRouter(route_class=AppRoute)
+
+    @router.get("/items")
+    @cache_response(max_age=5, store_ttl=store_ttl)
+    async def items():
+        calls.append("items")
+        return {"items": [1, 2, 3]}
+
+    @router.get("/versioned")
+    @cache_response()
+    async def versioned(request: Request, response: Response):
+        etag = etag_from_version("items", 1, 7)
+        unchanged = not_modified_since(request, etag)
+        if unchanged is not None:
+            return unchanged
+        calls.append("versioned")
+        response.headers["etag"] = etag
+        return {"id": 1}
+
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+
+def test_conditional_get_returns_304():
+    client = build_client([])
+    first = client.get("/items")
+    assert first.status_code == 200
+    assert first.headers["etag"].startswith('W/"')
+    assert first.headers["cache-control"] == "private, max-age=5, must-revalidate"
+
+    second = client.get("/items", headers={"If-None-Match": first.headers["etag"]})
+    assert second.status_code == 304
+    assert second.content == b""
+
+
+def test_handler_supplied_etag_is_kept():
+    calls = []
+    client = build_client(calls)
+    response = client.get("/versioned")
+    assert response.headers["etag"] == etag_from_version("items", 1, 7)
+    unchanged = client.get("/versioned", headers={"If-None-Match": etag_from_version("items", 1, 7)})
+    assert unchanged.status_code == 304 and unchanged.headers["cache-control"] == "private, max-age=0, must-revalidate"
+    # The handler answered before building its body
+    assert calls == ["versioned"]
+
+
+def test_stored_body_skips_the_endpoint(monkeypatch):
+    store = {}
+
+    async def load_entry(key):
+        return store.get(key)
+
+    async def store_entry(key, response, etag, ttl):
+        store[key] = {"etag": etag, "status": 200, "media_type": response.media_type, "body": response.body.decode()}
+
+    monkeypatch.setattr(http_cache, "_load_entry", load_entry)
+    monkeypatch.setattr(http_cache, "_store_entry", store_entry)
+
+    calls = []
+    client = build_client(calls, store_ttl=30)
+    alice = {"Authorization": f"Bearer {create_access_token({'sub': 'cache-alice'})}"}
+    first = client.get("/items", headers=alice)
+    assert client.get("/items", headers=alice).json() == first.json()
+    assert client.get("/items", headers={**alice, "If-None-Match": first.headers["etag"]}).status_code == 304
+    assert calls == ["items"]
+
+    client.get("/items", headers={"Authorization": f"Bearer {create_access_token({'sub': 'cache-bob'})}"})
+    assert calls == ["items", "items"]
+
+    # Forged and revoked tokens never get the stored body
+    client.get("/items", headers={"Authorization": "Bearer forged"})
+    assert calls == ["items", "items", "items"]
+    client.get("/items", headers={"X-API-Key": API_KEY})
+    client.get("/items", headers={"X-API-Key": API_KEY})
+    assert calls == ["items", "items", "items", "items"]
+    asyncio.run(token_store.revoke_subject("cache-alice"))
+    client.get("/items", headers=alice)
+    assert calls == ["items", "items", "items", "items", "items"]
+
+
+def test_version_etags_differ_per_resource():
+    assert etag_from_version("users", 1, 1) != etag_from_version("api-keys", 1, 1)
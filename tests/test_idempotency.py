@@ -0,0 +1,113 @@
+import asyncio
+
+import httpx
+from fastapi import APIRouter, FastAPI
+
+from app.api.routing import AppRoute
+from app.utils.idempotency import IDEMPOTENT_REQUESTS, IdempotencyStore, MemoryIdempotencyBackend, idempotent
+
+NEW_USER = {
+    "username": "retrying", "first_name": "Retry", "last_name": "Storm",
+    "email": "retry@example.com", "password": "secret",
+}
+
+
+def test_register_retry_replays_the_first_response(client):
+    headers = {"Idempotency-Key": "signup-1"}
+    first = client.post("/v1/auth/register", json=NEW_USER, headers=headers)
+    assert first.status_code == 200 and "Idempotent-Replayed" not in first.headers
+
+    replayed = IDEMPOTENT_REQUESTS.value("replayed")
+    retry = client.post("/v1/auth/register", json=NEW_USER, headers=headers)
+    assert retry.status_code == 200 and retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.headers["content-type"] == "application/json"
+    assert IDEMPOTENT_REQUESTS.value("replayed") == replayed + 1
+
+    # Without the key the handler runs again and sees the duplicate
+    assert client.post("/v1/auth/register", json=NEW_USER).status_code == 400
+    # Same key, different payload
+    conflict = client.post("/v1/auth/register", json={**NEW_USER, "username": "other"}, headers=headers)
+    assert conflict.status_code == 422
+
+
+def test_concurrent_duplicates_run_once_and_failures_are_not_kept():
+    calls = []
+    router = APIRouter(route_class=AppRoute)
+
+    @router.post("/orders")
+    @idempotent(store=IdempotencyStore(MemoryIdempotencyBackend()), lock_ttl=5)
+    async def create_order(payload: dict):
+        calls.append(payload)
+        await asyncio.sleep(0.05)
+        return {"order": len(calls)}
+
+    @router.post("/flaky")
+    @idempotent(store=IdempotencyStore(MemoryIdempotencyBackend()))
+    async def flaky():
+        calls.append("flaky")
+        if len(calls) == 1:
+            raise RuntimeError("downstream failed")
+        return {"ok": True}
+
+    app = FastAPI()
+    app.include_router(router)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            headers = {"Idempotency-Key": "order-1"}
+            responses = await asyncio.gather(*(http.post("/orders", json={"sku": 1}, headers=headers) for _ in range(5)))
+            assert [response.json() for response in responses] == [{"order": 1}] * 5
+            assert sum("Idempotent-Replayed" in response.headers for response in responses) == 4
+            assert len(calls) == 1
+
+            calls.clear()
+            headers = {"Idempotency-Key": "flaky-1"}
+            assert (await http.post("/flaky", headers=headers)).status_code == 500
+            retry = await http.post("/flaky", headers=headers)
+            assert retry.status_code == 200 and "Idempotent-Replayed" not in retry.headers
+
+    asyncio.run(scenario())
+
+
+def test_memory_backend_drops_expired_and_oldest_keys():
+    async def scenario():
+        backend = MemoryIdempotencyBackend(max_entries=3)
+        assert await backend.acquire("expired", "f", ttl=-1)
+        for index in range(3):
+            assert await backend.acquire(f"key-{index}", "f", ttl=60)
+        # Swept although nobody touched it again
+        assert len(backend) == 3 and "expired" not in backend._entries
+        assert await backend.acquire("key-3", "f", ttl=60)
+        assert len(backend) == 3 and await backend.get("key-0") is None
+        # Completing a key makes it the newest
+        await backend.complete("key-1", {"state": "done", "fingerprint": "f"}, ttl=60)
+        assert await backend.acquire("key-4", "f", ttl=60)
+        assert await backend.get("key-1") is not None and await backend.get("key-2") is None
+
+    asyncio.run(scenario())
+
+
+def test_anonymous_keys_are_scoped_by_client_address():
+    calls = []
+    router = APIRouter(route_class=AppRoute)
+
+    @router.post("/signup")
+    @idempotent(store=IdempotencyStore(MemoryIdempotencyBackend()))
+    async def signup(payload: dict):
+        calls.append(payload)
+        return {"call": len(calls)}
+
+    app = FastAPI()
+    app.include_router(router)
+
+    async def post(address: str):
+        transport = httpx.ASGITransport(app=app, client=(address, 1234))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return (await http.post("/signup", json={"name": "a"}, headers={"Idempotency-Key": "1"})).json()
+
+    assert asyncio.run(post("10.0.0.1")) == {"call": 1}
+    # Another anonymous client picking the same key gets its own request run, not the first one's response
+    assert asyncio.run(post("10.0.0.2")) == {"call": 2}
+    assert asyncio.run(post("10.0.0.1")) == {"call": 1}
@@ -0,0 +1,67 @@
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+from fastapi.testclient import TestClient
+from jose import JWTError
+
+from app.core.keys import load_key_set
+from app.main import app
+
+CLAIMS = {"sub": "alice", "exp": 4102444800}
+
+
+def write_private_key(path, private_key):
+    path.write_bytes(private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption(),
+    ))
+
+
+def write_public_key(path, private_key):
+    path.write_bytes(private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo,
+    ))
+
+
+def test_rotation_keeps_old_tokens_valid(tmp_path):
+    old_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    write_private_key(tmp_path / "2026-01.pem", old_key)
+    old_token = load_key_set(str(tmp_path)).encode(CLAIMS)
+
+    # Rotate: the new key signs, the old one is kept as a public key for verification
+    write_public_key(tmp_path / "2026-01.pem", old_key)
+    write_private_key(tmp_path / "2026-02.pem", ed25519.Ed25519PrivateKey.generate())
+    key_set = load_key_set(str(tmp_path))
+
+    assert key_set.active.kid == "2026-02" and key_set.active.algorithm == "EdDSA"
+    assert key_set.decode(old_token)["sub"] == "alice"
+    assert key_set.decode(key_set.encode(CLAIMS))["sub"] == "alice"
+
+
+def test_jwks_publishes_public_keys_only(tmp_path):
+    write_private_key(tmp_path / "rsa.pem", rsa.generate_private_key(public_exponent=65537, key_size=2048))
+    write_private_key(tmp_path / "ed.pem", ed25519.Ed25519PrivateKey.generate())
+    jwks = load_key_set(str(tmp_path)).jwks()
+
+    assert {key["kid"]: key["alg"] for key in jwks["keys"]} == {"ed": "EdDSA", "rsa": "RS256"}
+    assert all("d" not in key for key in jwks["keys"])
+
+
+def test_unknown_kid_and_foreign_signatures_are_rejected(tmp_path):
+    write_private_key(tmp_path / "a.pem", rsa.generate_private_key(public_exponent=65537, key_size=2048))
+    other = tmp_path / "other"
+    other.mkdir()
+    write_private_key(other / "a.pem", rsa.generate_private_key(public_exponent=65537, key_size=2048))
+    write_private_key(other / "b.pem", rsa.generate_private_key(public_exponent=65537, key_size=2048))
+
+    key_set = load_key_set(str(tmp_path))
+    with pytest.raises(JWTError):
+        key_set.decode(load_key_set(str(other), active_kid="a").encode(CLAIMS))
+    with pytest.raises(JWTError):
+        key_set.decode(load_key_set(str(other), active_kid="b").encode(CLAIMS))
+
+
+def test_jwks_endpoint_is_empty_for_shared_secrets():
+    response = TestClient(app).get("/.well-known/jwks.json")
+    assert response.status_code == 200
+    assert response.json() == {"keys": []}
+    assert response.headers["cache-control"] == "public, max-age=300"
@@ -0,0 +1,121 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI, Response
+
+from app.core.deadline import DeadlineExceeded, deadline_stage
+from app.middleware.deadline import DeadlineMiddleware
+from app.middleware.load_shedding import AdaptiveConcurrencyLimit, LoadSheddingMiddleware
+
+
+def build_app(limiter: AdaptiveConcurrencyLimit, release: asyncio.Event) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(LoadSheddingMiddleware, limiter=limiter, low_priority_share=0.5, retry_after=3)
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    @app.get("/slow")
+    async def slow():
+        await release.wait()
+        return {}
+
+    @app.post("/v1/auth/token")
+    async def token():
+        await release.wait()
+        return {}
+
+    @app.post("/v1/auth/token/verify")
+    async def verify():
+        return {}
+
+    return app
+
+
+def test_limit_grows_while_healthy_and_backs_off_when_latency_inflates():
+    limiter = AdaptiveConcurrencyLimit(initial=10, min_limit=4, max_limit=12)
+    for _ in range(500):
+        assert limiter.try_acquire()
+        limiter.release("/fast", 0.01)
+    # One request at a time never tests the limit, so there's no evidence it can grow
+    assert limiter.limit == 10
+
+    for _ in range(200):
+        limiter.in_flight = 8
+        limiter.release("/fast", 0.01)
+    assert limiter.limit == 12
+
+    # A different route with a high but steady latency is judged against its own baseline
+    for _ in range(20):
+        limiter.in_flight = 8
+        limiter.release("/login", 0.3)
+    assert limiter.limit == 12
+
+    for _ in range(50):
+        limiter.in_flight = 8
+        limiter._last_decrease = 0
+        limiter.release("/fast", 0.2)
+    assert limiter.limit == 4
+
+
+def test_overload_status_backs_off_once_per_round_trip():
+    limiter = AdaptiveConcurrencyLimit(initial=20, backoff=0.5)
+    for _ in range(5):
+        limiter.in_flight = 1
+        limiter.release("/api", 0.5, overloaded=True)
+    assert limiter.limit == 10
+
+
+def test_excess_requests_are_shed_and_cheap_routes_keep_priority():
+    async def scenario():
+        release = asyncio.Event()
+        limiter = AdaptiveConcurrencyLimit(initial=4, min_limit=4, max_limit=4)
+        transport = httpx.ASGITransport(app=build_app(limiter, release))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            logins = [asyncio.create_task(client.post("/v1/auth/token")) for _ in range(3)]
+            await asyncio.sleep(0.05)
+            # Login may only use half the limit; the third one is shed straight away
+            shed_login = await logins[2]
+            assert shed_login.status_code == 503 and shed_login.headers["Retry-After"] == "3"
+
+            reads = [asyncio.create_task(client.get("/slow")) for _ in range(3)]
+            await asyncio.sleep(0.05)
+            shed_read = await reads[2]
+            assert shed_read.status_code == 503
+            assert (await client.get("/health")).status_code == 200
+
+            release.set()
+            assert [response.status_code for response in await asyncio.gather(*logins[:2], *reads[:2])] == [200] * 4
+            assert limiter.in_flight == 0
+            assert (await client.post("/v1/auth/token/verify")).status_code == 200
+
+    asyncio.run(scenario())
+
+
+def test_only_server_deadlines_count_as_overload():
+    async def scenario():
+        limiter = AdaptiveConcurrencyLimit(initial=50, min_limit=8, backoff=0.5)
+        app = FastAPI()
+        app.add_middleware(DeadlineMiddleware, default_timeout=0.05, min_timeout=0)
+        app.add_middleware(LoadSheddingMiddleware, limiter=limiter)
+
+        @app.get("/wait")
+        async def wait():
+            try:
+                async with deadline_stage("upstream"):
+                    await asyncio.sleep(1)
+            except DeadlineExceeded:
+                return Response(status_code=504)
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            # Clients that give up straight away can't talk the limit down
+            for _ in range(200):
+                assert (await client.get("/wait", headers={"X-Request-Timeout": "0"})).status_code == 504
+            assert limiter.limit == 50
+
+            assert (await client.get("/wait")).status_code == 504
+            assert limiter.limit == 25
+
+    asyncio.run(scenario())
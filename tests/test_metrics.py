@@ -0,0 +1,37 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.metrics import HTTP_REQUESTS, MetricsRegistry
+from app.middleware.metrics import MetricsMiddleware
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.5, "/a")
+    histogram.observe(5, "/a")
+
+    text = registry.render()
+    assert '# TYPE latency_seconds histogram' in text
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{route="/a",le="1.0"} 2' in text
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{route="/a"} 3' in text
+
+
+def test_middleware_labels_requests_by_route_template():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        return {"id": item_id}
+
+    client = TestClient(app)
+    before = HTTP_REQUESTS.value("GET", "/items/{item_id}", "200")
+    client.get("/items/1")
+    client.get("/items/2")
+    client.get("/missing")
+    assert HTTP_REQUESTS.value("GET", "/items/{item_id}", "200") == before + 2
+    assert HTTP_REQUESTS.value("GET", "unmatched", "404") >= 1
@@ -0,0 +1,95 @@
+import sqlite3
+
+from alembic import command
+from alembic.config import Config
+
+from app.db.migrations import ALEMBIC_INI, lint_sql, render_sql, split_statements
+
+RISKY_SCRIPT = """
+-- Running upgrade a1 -> b2
+
+CREATE TABLE orders (
+    id SERIAL NOT NULL,
+    PRIMARY KEY (id)
+);
+
+CREATE INDEX ix_orders_id ON orders (id);
+
+CREATE INDEX ix_users_email ON users (email);
+
+CREATE INDEX CONCURRENTLY ix_users_last_name ON users (last_name);
+
+ALTER TABLE users ADD COLUMN tenant INTEGER NOT NULL;
+
+ALTER TABLE users ADD COLUMN joined TIMESTAMP DEFAULT now() NOT NULL;
+
+ALTER TABLE users ALTER COLUMN email TYPE TEXT;
+
+ALTER TABLE users ADD CONSTRAINT fk_tenant FOREIGN KEY(tenant) REFERENCES tenants (id) NOT VALID;
+
+ALTER TABLE users ADD CONSTRAINT uq_email UNIQUE (email);
+
+UPDATE users SET role='user';
+
+UPDATE alembic_version SET version_num='b2' WHERE alembic_version.version_num = 'a1';
+
+-- Running upgrade b2 -> c3
+
+CREATE INDEX ix_orders_total ON orders (total);
+
+DO $$
+BEGIN
+  UPDATE users SET role='user' WHERE id < 10;
+  COMMIT;
+END $$;
+"""
+
+
+def test_lint_flags_operations_that_lock_existing_tables():
+    findings = lint_sql(RISKY_SCRIPT)
+    assert [(finding.revision, finding.rule) for finding in findings] == [
+        ("b2", "index-without-concurrently"),
+        ("b2", "add-not-null-column-without-default"),
+        ("b2", "add-column-volatile-default"),
+        ("b2", "alter-column-type"),
+        ("b2", "constraint-without-index"),
+        ("b2", "unbatched-dml"),
+        # "orders" was created by the previous revision, so it may hold data by now
+        ("c3", "index-without-concurrently"),
+    ]
+    assert str(findings[0]).startswith("b2: index-without-concurrently: CREATE INDEX ix_users_email")
+
+
+def test_split_statements_keeps_dollar_quoted_bodies_whole():
+    statements = [statement for _, statement in split_statements(RISKY_SCRIPT)]
+    assert statements[-1].startswith("DO $$") and statements[-1].endswith("END $$")
+
+
+def test_migration_history_is_lock_safe_offline():
+    sql = render_sql()
+    assert "SET lock_timeout = '5s'" in sql
+    assert "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_role ON users (role)" in sql
+    assert "DO $$" in sql
+    assert lint_sql(sql) == []
+
+
+def test_online_upgrade_backfills_in_batches(tmp_path):
+    database = tmp_path / "migrations.db"
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("script_location", str(ALEMBIC_INI.parent / "alembic"))
+    config.attributes["database_url"] = f"sqlite+aiosqlite:///{database}"
+    config.attributes["configure_logger"] = False
+
+    command.upgrade(config, "5c71e0a9d2f4")
+    with sqlite3.connect(database) as connection:
+        connection.executemany(
+            "INSERT INTO users (username, role, version) VALUES (?, ?, 1)",
+            [(f"user{index}", "admin" if index % 3 == 0 else None) for index in range(20)],
+        )
+    command.upgrade(config, "head")
+
+    with sqlite3.connect(database) as connection:
+        roles = dict(connection.execute("SELECT role, count(*) FROM users GROUP BY role").fetchall())
+        indexes = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert roles == {"admin": 7, "user": 13}
+    assert "ix_users_role" in indexes
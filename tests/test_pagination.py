@@ -0,0 +1,102 @@
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+from sqlalchemy import select
+from starlette.requests import Request
+
+from app.crud.crud_user import crud_user
+from app.db.models.user import User
+from app.db.session import get_sessionmaker
+from app.utils import get_pagination_urls
+from app.utils.pagination import decode_keyset, encode_keyset, fetch_keyset_page, paginate
+from tests.test_search import staff_headers
+
+
+def make_request(query: str) -> Request:
+    return Request({
+        "type": "http", "method": "GET", "scheme": "http", "server": ("testserver", 80),
+        "path": "/v1/users", "root_path": "", "query_string": query.encode(), "headers": [],
+    })
+
+
+def run(client, operation):
+    async def with_session():
+        async with get_sessionmaker()() as db:
+            return await operation(db)
+
+    return client.portal.call(with_session)
+
+
+def add_users(client, count: int, null_emails: bool = False):
+    run(client, lambda db: crud_user.create_many(db, [
+        {"username": f"page-{index:02}", "first_name": "Page", "last_name": str(index),
+         "email": None if null_emails and index % 2 else f"p{index}@example.com"}
+        for index in range(count)
+    ]))
+
+
+def test_links_only_replace_the_page_parameter():
+    request = make_request("q=a%20b&page=2&per_page=5")
+    next_url, previous_url = get_pagination_urls(request, total_count=11, page=2, per_page=5)
+    assert parse_qs(urlsplit(next_url).query) == {"q": ["a b"], "page": ["3"], "per_page": ["5"]}
+    assert parse_qs(urlsplit(previous_url).query) == {"q": ["a b"], "per_page": ["5"]}
+    assert get_pagination_urls(request, total_count=10, page=2, per_page=5)[0] is None
+    assert decode_keyset(encode_keyset([3, "x"]), 2) == [3, "x"]
+
+
+def test_offset_pages_are_limited_in_sql_and_count_on_request(client):
+    add_users(client, 5)
+    statement = select(User).where(User.first_name == "Page").order_by(User.id)
+
+    page = run(client, lambda db: paginate(db, statement, make_request("page=2"), page=2, per_page=2))
+    assert [user.username for user in page.results] == ["page-02", "page-03"]
+    assert page.count is None and page.next.endswith("page=3") and page.previous == "http://testserver/v1/users"
+
+    last = run(client, lambda db: paginate(db, statement, make_request("page=3"), page=3, per_page=2, with_count=True))
+    assert [user.username for user in last.results] == ["page-04"] and last.count == 5 and last.next is None
+
+
+def test_keyset_pages_follow_mixed_directions_and_null_keys(client):
+    # Every other user has no email, so the pages have NULL keys to step over
+    add_users(client, 5, null_emails=True)
+    statement = select(User).where(User.first_name == "Page")
+
+    async def walk(db, order_by):
+        seen, cursor = [], None
+        while True:
+            page = await fetch_keyset_page(db, statement, order_by, cursor=cursor, per_page=2)
+            seen += [user.username for user in page.items]
+            if not page.has_next:
+                return seen
+            cursor = page.next_cursor
+
+    # NULL emails come last in both directions, and a page may end on one
+    descending = run(client, lambda db: walk(db, [(User.email, False), (User.id, True)]))
+    assert descending == ["page-04", "page-02", "page-00", "page-01", "page-03"]
+    ascending = run(client, lambda db: walk(db, [(User.email, True), (User.id, False)]))
+    assert ascending == ["page-00", "page-02", "page-04", "page-03", "page-01"]
+
+    null_key = encode_keyset([None, 1])
+    page = run(client, lambda db: fetch_keyset_page(db, statement, [(User.email, True), (User.id, True)], null_key))
+    assert [user.username for user in page.items] == ["page-01", "page-03"]
+    # The primary key can't be NULL, so neither can its cursor value
+    with pytest.raises(ValueError):
+        run(client, lambda db: fetch_keyset_page(db, statement, [(User.id, True)], encode_keyset([None])))
+
+
+def test_list_endpoint_pages_by_cursor(client):
+    add_users(client, 3)
+    headers = staff_headers(client)
+    assert client.get("/v1/users").status_code == 401
+
+    first = client.get("/v1/users", params={"per_page": 3, "count": True}, headers=headers).json()
+    assert [user["username"] for user in first["results"]] == ["alice", "bob", "page-00"]
+    assert first["count"] == 5 and first["previous"] is None
+    second = client.get(first["next"], headers=headers).json()
+    assert [user["username"] for user in second["results"]] == ["page-01", "page-02"]
+    # The link keeps the other parameters, `count` included
+    assert second["next"] is None and second["count"] == 5
+
+    assert client.get("/v1/users", params={"cursor": "not-a-cursor"}, headers=headers).status_code == 400
+    forged = encode_keyset(["1 OR 1=1"])
+    assert client.get("/v1/users", params={"cursor": forged}, headers=headers).status_code == 400
@@ -0,0 +1,60 @@
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.rbac import require_permission, require_role
+from app.core.permissions import ROLE_MASKS, Permission, compile_roles, has_permissions, permission_claims
+from app.core.security import create_access_token, decode_access_token
+from app.db.models.user import User
+from app.db.session import get_sessionmaker
+from tests.conftest import login
+
+
+def test_roles_inherit_permissions():
+    assert has_permissions(ROLE_MASKS["admin"], ROLE_MASKS["user"])
+    assert has_permissions(ROLE_MASKS["superuser"], Permission.DEBUG | Permission.USERS_READ)
+    assert not has_permissions(ROLE_MASKS["staff"], Permission.USERS_WRITE)
+
+    with pytest.raises(ValueError):
+        compile_roles({"a": (("b",), Permission.DEBUG), "b": (("a",), Permission.DEBUG)})
+
+
+def test_checks_use_token_claims_only():
+    app = FastAPI()
+
+    @app.get("/users", dependencies=[Depends(require_permission(Permission.USERS_READ))])
+    async def list_users():
+        return []
+
+    @app.get("/admin", dependencies=[Depends(require_role("admin"))])
+    async def admin():
+        return {}
+
+    client = TestClient(app)
+
+    def headers(role: str) -> dict:
+        return {"Authorization": f"Bearer {create_access_token({'sub': role, **permission_claims(role)})}"}
+
+    assert client.get("/users", headers=headers("user")).status_code == 403
+    assert client.get("/users", headers=headers("staff")).status_code == 200
+    assert client.get("/admin", headers=headers("staff")).status_code == 403
+    assert client.get("/admin", headers=headers("superuser")).status_code == 200
+
+
+def test_role_change_revokes_older_access_tokens(client):
+    tokens = login(client, "alice")
+    assert decode_access_token(tokens["access_token"])["role"] == "user"
+
+    async def promote():
+        async with get_sessionmaker()() as db:
+            user = await User.get_single_object(db, username="alice")
+            await User.update(user.id, db, role="admin")
+
+    client.portal.call(promote)
+
+    me = client.get("/v1/auth/users/me", headers={"Authorization": f"Bearer {tokens['access_token']}"})
+    assert me.status_code == 401
+    refreshed = client.post("/v1/auth/token/refresh", json={"refresh_token": tokens["refresh_token"]}).json()
+    assert decode_access_token(refreshed["access_token"])["perm"] == ROLE_MASKS["admin"]
+    me = client.get("/v1/auth/users/me", headers={"Authorization": f"Bearer {refreshed['access_token']}"})
+    assert me.status_code == 200
@@ -0,0 +1,39 @@
+import asyncio
+import threading
+import time
+
+from app.core.profiler import EVENT_LOOP_STALLS, EventLoopLagMonitor, SamplingProfiler
+
+
+def busy_wait(seconds: float):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_sampling_profiler_collapses_stacks():
+    profiler = SamplingProfiler(threading.get_ident(), interval=0.001)
+    profiler.start()
+    busy_wait(0.1)
+    collapsed = profiler.stop()
+
+    assert "test_profiler.py:busy_wait" in collapsed
+    stack, count = collapsed.splitlines()[0].rsplit(" ", 1)
+    assert int(count) > 0
+    assert ";" in stack
+
+
+def test_loop_monitor_reports_blocking_calls():
+    async def run():
+        monitor = EventLoopLagMonitor(interval=0.02, threshold=0.05)
+        monitor.start()
+        await asyncio.sleep(0.05)
+        busy_wait(0.3)
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+        return monitor
+
+    before = EVENT_LOOP_STALLS.value()
+    monitor = asyncio.run(run())
+    assert EVENT_LOOP_STALLS.value() > before
+    assert not monitor.running
@@ -0,0 +1,27 @@
+from app.db.instrumentation import RequestQueryStats
+from app.db.query_inspector import N_PLUS_ONE, statement_shape
+
+
+def test_expanded_in_lists_share_a_shape():
+    assert statement_shape("SELECT * FROM users WHERE id IN (?, ?)") == statement_shape(
+        "SELECT * FROM users WHERE id IN (?, ?, ?)"
+    )
+    assert statement_shape("SELECT * FROM users WHERE id IN ($1, $2)") == "SELECT * FROM users WHERE id IN (?)"
+
+
+def test_repeated_statements_are_flagged_as_n_plus_one():
+    stats = RequestQueryStats()
+    for user_id in range(6):
+        stats.statements["SELECT * FROM users WHERE id = ?"] = user_id + 1
+    before = N_PLUS_ONE.value("/n-plus-one")
+    stats.finish("/n-plus-one")
+    assert N_PLUS_ONE.value("/n-plus-one") == before + 1
+
+
+def test_distinct_statements_are_not_flagged():
+    stats = RequestQueryStats()
+    stats.statements["SELECT * FROM users WHERE id = ?"] = 1
+    stats.statements["SELECT * FROM users WHERE username = ?"] = 1
+    before = N_PLUS_ONE.value("/distinct")
+    stats.finish("/distinct")
+    assert N_PLUS_ONE.value("/distinct") == before
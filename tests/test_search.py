@@ -0,0 +1,81 @@
+from sqlalchemy.dialects import postgresql
+
+from app.crud.base import _fallback_indexes
+from app.crud.crud_user import crud_user
+from app.db.models.user import User
+from app.db.session import get_sessionmaker
+from app.utils.pagination import encode_keyset
+from app.utils.search import TrigramIndex, trigrams
+from tests.conftest import login
+
+
+def staff_headers(client) -> dict:
+    async def promote():
+        async with get_sessionmaker()() as db:
+            user = await User.get_single_object(db, username="bob")
+            await User.update(user.id, db, role="staff")
+
+    client.portal.call(promote)
+    return {"Authorization": f"Bearer {login(client, 'bob')['access_token']}"}
+
+
+def test_trigrams_and_ranking_follow_pg_trgm():
+    assert trigrams("Cat") == {"  c", " ca", "cat", "at "}
+    index = TrigramIndex([(1, "jonathan smith"), (2, "joan smithers"), (3, "mary jones")])
+
+    # Typo: most of the query's trigrams are in "jonathan"
+    assert [id for _, id in index.search("jonathon")] == [1]
+    # Substrings match even when they share few trigrams
+    assert {id for _, id in index.search("mith")} == {1, 2}
+    first, second = index.search("smith")
+    assert first[1] == 1 and first[0] > second[0]
+
+    index.remove(1)
+    assert index.search("jonathon") == []
+
+
+def test_search_expression_inlines_literals_for_the_index():
+    compiled = str(crud_user.search_text().compile(dialect=postgresql.dialect()))
+    assert "%(" not in compiled
+    assert compiled.startswith("lower((((((coalesce(users.username, '') || ' ')")
+
+
+def test_search_endpoint_pages_by_cursor(client):
+    for index in range(5):
+        client.post("/v1/auth/register", json={
+            "username": f"searcher{index}", "first_name": "Grace", "last_name": "Hopper",
+            "email": f"grace{index}@navy.example", "password": "secret",
+        })
+    headers = staff_headers(client)
+    assert client.get("/v1/users/search", params={"q": "hopper"}, headers={
+        "Authorization": f"Bearer {login(client, 'alice')['access_token']}",
+    }).status_code == 403
+
+    found, url = [], "/v1/users/search?q=hoper&per_page=2"
+    while url:
+        page = client.get(url, headers=headers).json()
+        found += [user["username"] for user in page["results"]]
+        url = page["next"]
+    assert sorted(found) == [f"searcher{index}" for index in range(5)]
+    assert page["previous"] is None and page["count"] is None
+
+    exact = client.get("/v1/users/search", params={"q": "searcher3"}, headers=headers).json()["results"]
+    assert exact[0]["username"] == "searcher3"
+    assert client.get("/v1/users/search", params={"q": "grace", "cursor": "nope"}, headers=headers).status_code == 400
+    forged = encode_keyset(["0.5", 1])
+    assert client.get("/v1/users/search", params={"q": "grace", "cursor": forged}, headers=headers).status_code == 400
+
+
+def test_models_share_one_fallback_index(client):
+    async def search_both(db):
+        page = await User.search(db, "alice")
+        assert [user.username for user in page.items] == ["alice"] and not page.has_next
+        before = _fallback_indexes[User]
+        await crud_user.search(db, "alice")
+        return _fallback_indexes[User] is before
+
+    async def with_session():
+        async with get_sessionmaker()() as db:
+            return await search_both(db)
+
+    assert client.portal.call(with_session)
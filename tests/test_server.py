@@ -0,0 +1,142 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+
+from app.core.shared_counters import SharedCounters
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_shared_counters_are_visible_across_fork():
+    counters = SharedCounters(slots=64)
+    pid = os.fork()
+    if pid == 0:
+        for _ in range(3):
+            counters.incr("hits", 60)
+        os._exit(0)
+    os.waitpid(pid, 0)
+
+    assert counters.get("hits") == 3
+    assert counters.incr("hits", 60) == 4
+
+
+def test_shared_counters_expire_and_evict():
+    counters = SharedCounters(slots=4)
+    counters.incr("short", 0.05)
+    time.sleep(0.06)
+    assert counters.get("short") == 0
+    assert counters.incr("short", 60) == 1
+
+    for index in range(10):
+        counters.incr(f"key-{index}", 60)
+    assert counters.get("key-9") == 1
+    assert counters.reset() == 4
+
+
+def test_shm_storage_enforces_fixed_window_limits():
+    limiter = FixedWindowRateLimiter(storage_from_string("shm://", slots=64))
+    limit = parse("2/minute")
+
+    assert limiter.hit(limit, "client")
+    assert limiter.hit(limit, "client")
+    assert not limiter.hit(limit, "client")
+    assert limiter.hit(limit, "other-client")
+
+
+def test_warm_up_prepares_schemas_and_static_assets():
+    from app.main import create_app
+    from app.middleware.compression import compressed_cache
+    from app.server import warm_up
+
+    compressed_cache.clear()
+    app = create_app()
+    timings = warm_up(app)
+
+    assert set(timings) == {"statements", "openapi", "password_backend", "signing_keys", "static_assets"}
+    assert app.openapi_schema is not None
+    assert compressed_cache._entries
+
+
+def test_server_forks_workers_and_stops_on_sigterm(tmp_path):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    env = dict(os.environ, DATABASE_URL="sqlite+aiosqlite:///:memory:", LOG_DIR=str(tmp_path), LOOP_LAG_MONITOR_ENABLED="false")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "app.server", "--workers", "2", "--port", str(port), "--log-level", "warning",
+         "--allow-per-worker-state"],
+        cwd=PROJECT_DIR, env=env,
+    )
+    try:
+        deadline = time.monotonic() + 20
+        while True:
+            try:
+                response = httpx.get(f"http://127.0.0.1:{port}/health")
+                break
+            except httpx.TransportError:
+                assert time.monotonic() < deadline, "server did not start"
+                time.sleep(0.1)
+        assert response.json() == {"status": "healthy"}
+    finally:
+        server.send_signal(signal.SIGTERM)
+        assert server.wait(timeout=30) == 0
+
+
+def test_drain_delay_fails_readiness_before_closing(tmp_path):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    env = dict(os.environ, DATABASE_URL="sqlite+aiosqlite:///:memory:", LOG_DIR=str(tmp_path), LOOP_LAG_MONITOR_ENABLED="false")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "app.server", "--workers", "1", "--port", str(port), "--log-level", "warning",
+         "--drain-delay", "1"],
+        cwd=PROJECT_DIR, env=env,
+    )
+    try:
+        deadline = time.monotonic() + 20
+        while True:
+            try:
+                assert httpx.get(f"http://127.0.0.1:{port}/health/ready").status_code == 200
+                break
+            except httpx.TransportError:
+                assert time.monotonic() < deadline, "server did not start"
+                time.sleep(0.1)
+        server.send_signal(signal.SIGTERM)
+        time.sleep(0.3)
+        # Still serving while the load balancer notices readiness failing
+        assert httpx.get(f"http://127.0.0.1:{port}/health/ready").status_code == 503
+        assert httpx.get(f"http://127.0.0.1:{port}/health").status_code == 200
+        assert server.wait(timeout=30) == 0
+    finally:
+        if server.poll() is None:
+            server.kill()
+
+
+def test_several_workers_require_shared_backends(monkeypatch):
+    from app.core.config import Settings
+    from app.server import main, per_worker_backends
+
+    monkeypatch.setenv("RATELIMIT_STORAGE_URL", os.getenv("RATELIMIT_STORAGE_URL", "memory://"))
+    assert main(["--workers", "2", "--port", "0"]) == 2
+    assert per_worker_backends(Settings()) == ["TOKEN_STORE_BACKEND", "IDEMPOTENCY_BACKEND"]
+
+
+def test_kill_deadline_leaves_room_for_the_lifespan_shutdown():
+    from app.core.config import Settings
+    from app.core.logger_config import FLUSH_TIMEOUT
+    from app.server import KILL_MARGIN, Supervisor, lifespan_shutdown_timeout
+
+    settings = Settings()
+    assert lifespan_shutdown_timeout(settings) == FLUSH_TIMEOUT + settings.TASK_QUEUE_DRAIN_TIMEOUT
+    supervisor = Supervisor(None, [], 1, graceful_timeout=30, drain_delay=2, lifespan_timeout=15)
+    start = time.monotonic()
+    supervisor.handle_exit(signal.SIGTERM, None)
+    assert 2 + 30 + 15 + KILL_MARGIN <= supervisor.kill_deadline - start < 2 + 30 + 15 + KILL_MARGIN + 1
@@ -0,0 +1,46 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app.core.logger_config import flush_logging
+from app.core.shutdown import SHUTDOWN_PHASE_SECONDS, ShutdownCoordinator, shutdown
+from app.main import app
+from tests.conftest import login
+
+
+def test_phases_are_timed_and_failures_logged():
+    async def scenario():
+        coordinator = ShutdownCoordinator()
+        coordinator.begin_drain()
+        assert coordinator.draining
+
+        async with coordinator.phase("broken"):
+            raise RuntimeError("pool already closed")
+        async with coordinator.phase("fine"):
+            await asyncio.sleep(0.05)
+        assert list(coordinator.phases) == ["broken", "fine"]
+        assert coordinator.report() >= 0.05
+
+    asyncio.run(scenario())
+
+
+def test_draining_worker_fails_readiness_but_serves(client):
+    headers = {"Authorization": f"Bearer {login(client, 'alice')['access_token']}"}
+    assert flush_logging()
+
+    shutdown.begin_drain()
+    assert client.get("/v1/auth/users/me", headers=headers).status_code == 200
+    ready = client.get("/health/ready")
+    assert ready.status_code == 503 and ready.json()["detail"] == "shutting down"
+
+
+def test_lifespan_shutdown_reports_each_phase():
+    with TestClient(app) as client:
+        assert not shutdown.draining
+        assert client.get("/health").status_code == 200
+    assert list(shutdown.phases) == [
+        "logs", "health_prober", "tasks", "token_store", "loop_monitor", "redis", "database",
+    ]
+    assert SHUTDOWN_PHASE_SECONDS.value("total") >= SHUTDOWN_PHASE_SECONDS.value("database")
+    # A client without the lifespan isn't turned away by the previous shutdown
+    assert TestClient(app).get("/.well-known/jwks.json").status_code == 200
@@ -0,0 +1,144 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.core.logger_config import deliver_email
+from app.core.task_queue import Job, MemoryTaskBackend, Priority, QueueFull, RedisTaskBackend, TaskQueue, resolve_task
+
+calls = []
+
+
+def record(value):
+    calls.append(value)
+
+
+def make_queue(**kwargs) -> TaskQueue:
+    return TaskQueue(MemoryTaskBackend(), **{"concurrency": 1, "backoff": 0.01, **kwargs})
+
+
+def test_higher_priority_jobs_run_first():
+    order = []
+
+    async def run():
+        queue = make_queue()
+        await queue.start()
+        gate = asyncio.Event()
+        await queue.enqueue(gate.wait)
+        await asyncio.sleep(0)
+        for priority in (Priority.LOW, Priority.NORMAL, Priority.HIGH):
+            await queue.enqueue(order.append, priority.name, priority=priority)
+        gate.set()
+        await queue.stop()
+
+    asyncio.run(run())
+    assert order == ["HIGH", "NORMAL", "LOW"]
+
+
+def test_failures_are_retried_then_dropped():
+    attempts = {"flaky": 0, "broken": 0}
+
+    async def flaky():
+        attempts["flaky"] += 1
+        if attempts["flaky"] < 3:
+            raise ConnectionError("smtp down")
+
+    async def broken():
+        attempts["broken"] += 1
+        raise ValueError("bad payload")
+
+    async def run():
+        queue = make_queue(retries=2)
+        await queue.start()
+        await queue.enqueue(flaky)
+        await queue.enqueue(broken, retries=1)
+        await queue.stop(timeout=5)
+
+    asyncio.run(run())
+    assert attempts == {"flaky": 3, "broken": 2}
+
+
+def test_stop_drains_queued_jobs():
+    done = []
+
+    async def slow(index):
+        await asyncio.sleep(0.01)
+        done.append(index)
+
+    async def run():
+        queue = make_queue(concurrency=2)
+        await queue.start()
+        for index in range(10):
+            await queue.enqueue(slow, index)
+        await queue.stop(timeout=5)
+        with pytest.raises(RuntimeError):
+            await queue.enqueue(slow, 10)
+
+    asyncio.run(run())
+    assert sorted(done) == list(range(10))
+
+
+def test_submit_from_other_threads_and_inline():
+    calls.clear()
+    queue = make_queue()
+    queue.submit(record, "inline")
+    assert calls == ["inline"]
+
+    async def run():
+        await queue.start()
+        thread = threading.Thread(target=queue.submit, args=(record, "threaded"))
+        thread.start()
+        thread.join()
+        await asyncio.sleep(0.05)
+        await queue.stop()
+
+    asyncio.run(run())
+    assert calls == ["inline", "threaded"]
+
+
+def test_bounded_queue_rejects_when_full():
+    async def run():
+        queue = make_queue(max_size=2)
+        await queue.start()
+        gate = asyncio.Event()
+        await queue.enqueue(gate.wait)
+        await asyncio.sleep(0)
+        await queue.enqueue(record, 1)
+        await queue.enqueue(record, 2)
+        with pytest.raises(QueueFull):
+            await queue.enqueue(record, 3)
+        gate.set()
+        await queue.stop()
+
+    asyncio.run(run())
+
+
+def test_durable_jobs_must_be_importable():
+    queue = TaskQueue(RedisTaskBackend())
+    job = queue._job(deliver_email, ("body", "subject"), {}, Priority.NORMAL, None)
+    assert job.func is None and job.name == "app.core.logger_config:deliver_email"
+    assert resolve_task(Job.from_json(job.to_json()).name) is deliver_email
+    with pytest.raises(ValueError):
+        queue._job(lambda: None, (), {}, Priority.NORMAL, None)
+
+
+def test_redis_backend_pops_by_priority_and_requeues_retries(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    from app.utils.redis_cache import redis_cache
+
+    monkeypatch.setattr(redis_cache, "redis", fakeredis.FakeAsyncRedis(decode_responses=True))
+    backend = RedisTaskBackend(block_timeout=0.05)
+
+    async def run():
+        await backend.push(Job("tasks:low", (), {}, Priority.LOW, 3))
+        await backend.push(Job("tasks:high", (), {}, Priority.HIGH, 3))
+        first = await backend.pop(0)
+        await backend.retry(first, 0)
+        popped = [first.name, (await backend.pop(0)).name, (await backend.pop(0)).name]
+        return popped, await backend.pop(0), await redis_cache.redis.keys("*")
+
+    popped, empty, keys = asyncio.run(run())
+    assert popped == ["tasks:high", "tasks:high", "tasks:low"] and empty is None
+    # One hash slot for everything the script touches
+    assert all(key.startswith("{task-queue}:") for key in keys)
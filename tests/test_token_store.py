@@ -0,0 +1,99 @@
+import asyncio
+
+from app.core.security import create_access_token, decode_access_token
+from app.core.token_store import MemoryTokenBackend, TokenStore
+from app.utils.bloom import BloomFilter
+from tests.conftest import login
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    for index in range(1000):
+        bloom.add(f"jti-{index}")
+
+    assert all(f"jti-{index}" in bloom for index in range(1000))
+    false_positives = sum(f"other-{index}" in bloom for index in range(10000))
+    assert false_positives < 300
+
+
+def test_issued_at_is_never_after_issuing():
+    import time
+
+    for _ in range(200):
+        # A revocation right after issuing must still cover the token
+        issued = decode_access_token(create_access_token({"sub": "erin"}))["iat"]
+        assert issued <= time.time()
+
+
+def test_tokens_carry_type_and_jti():
+    tokens = asyncio.run(TokenStore(MemoryTokenBackend()).issue("alice"))
+    access = decode_access_token(tokens["access_token"])
+    refresh = decode_access_token(tokens["refresh_token"])
+
+    assert access["type"] == "access" and refresh["type"] == "refresh"
+    assert access["fam"] == refresh["fam"]
+    assert access["jti"] != refresh["jti"]
+
+
+def test_refresh_rotation_detects_reuse(client):
+    first = login(client, "alice")
+
+    rotated = client.post("/v1/auth/token/refresh", json={"refresh_token": first["refresh_token"]})
+    assert rotated.status_code == 200
+    assert rotated.json()["refresh_token"] != first["refresh_token"]
+
+    # Replaying the rotated-away token revokes the family, including the newest tokens
+    assert client.post("/v1/auth/token/refresh", json={"refresh_token": first["refresh_token"]}).status_code == 401
+    assert client.post("/v1/auth/token/refresh", json={"refresh_token": rotated.json()["refresh_token"]}).status_code == 401
+    assert client.post("/v1/auth/token/verify", json={"refresh_token": rotated.json()["access_token"]}).status_code == 401
+
+
+def test_access_tokens_are_not_refresh_tokens(client):
+    tokens = login(client, "bob")
+
+    assert client.post("/v1/auth/token/refresh", json={"refresh_token": tokens["access_token"]}).status_code == 401
+    assert client.get("/v1/auth/users/me", headers={"Authorization": f"Bearer {tokens['refresh_token']}"}).status_code == 401
+
+
+def test_revocations_reach_other_processes_through_sync():
+    backend = MemoryTokenBackend()
+    issuer, verifier = TokenStore(backend), TokenStore(backend)
+    payload = decode_access_token(create_access_token({"sub": "carol"}))
+
+    async def run():
+        await verifier.sync()
+        await issuer.revoke(payload["jti"], payload["exp"])
+        before = await verifier.is_revoked(payload)
+        await verifier.sync()
+        return before, await verifier.is_revoked(payload)
+
+    assert asyncio.run(run()) == (False, True)
+
+
+def test_unknown_family_is_invalid_not_reuse():
+    from app.core.token_store import REFRESH_REUSE
+
+    store = TokenStore(MemoryTokenBackend())
+    tokens = asyncio.run(store.issue("dave"))
+    # Another worker's (or another store's) family: rejected without revoking anything
+    before = REFRESH_REUSE.value()
+    assert asyncio.run(TokenStore(MemoryTokenBackend()).rotate(tokens["refresh_token"])) is None
+    assert REFRESH_REUSE.value() == before
+    assert asyncio.run(store.rotate(tokens["refresh_token"])) is not None
+
+
+def test_deferred_subject_revocation_keeps_its_cut_off():
+    import time
+
+    backend = MemoryTokenBackend()
+    store = TokenStore(backend)
+
+    async def run():
+        store.revoke_subject_soon("erin")
+        scheduled_at = time.time()
+        await asyncio.sleep(0.05)
+        await asyncio.gather(*store._pending)
+        return scheduled_at, await backend.revoked_at("sub:erin")
+
+    scheduled_at, revoked_at = asyncio.run(run())
+    assert revoked_at <= scheduled_at